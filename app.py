@@ -1,24 +1,89 @@
 import sys
+import time
+
+_START_TIME = time.perf_counter() # 尽早记录，用于统计启动耗时 (不含解释器自身的启动)
+
+from PySide6.QtCore import QObject, QEvent, QTimer
 from PySide6.QtWidgets import QApplication
 
-from model.model import TransactionModel
+from model.model import DATABASE_FILE, TransactionModel
+from model.instrumentation import profiler
 from view.view import MainWindow as MainView # 重命名以避免与主模块名冲突
 from controller.controller import Controller
 
+# 启动耗时目标: 从开始执行 app.py 到主窗口首次绘制
+STARTUP_TARGET_MS = 500
+
+
+def _argument_value(name, default=None):
+    """返回命令行中紧跟在 name 之后的值，例如 --db household.db。"""
+    if name in sys.argv[1:-1]:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+class StartupReporter(QObject):
+    """记录启动各阶段耗时，在第一次绘制事件时输出报告。
+
+    使用 --startup-report 运行时启用；加上 --quit-after-startup 会在报告后立即退出，
+    便于脚本反复测量。
+    """
+    def __init__(self, app, quit_after_report=False):
+        super().__init__()
+        self.app = app
+        self.quit_after_report = quit_after_report
+        self.phases = []
+        app.installEventFilter(self)
+
+    def mark(self, phase):
+        self.phases.append((phase, (time.perf_counter() - _START_TIME) * 1000))
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            self.app.removeEventFilter(self)
+            self.mark("首次绘制")
+            self.report()
+        return False
+
+    def report(self):
+        for phase, elapsed_ms in self.phases:
+            print(f"[启动] {phase}: {elapsed_ms:.1f} ms", file=sys.stderr)
+        first_paint_ms = self.phases[-1][1]
+        verdict = "达标" if first_paint_ms <= STARTUP_TARGET_MS else "未达标"
+        print(f"[启动] 首次绘制 {first_paint_ms:.1f} ms (目标 {STARTUP_TARGET_MS} ms, {verdict})", file=sys.stderr)
+        if self.quit_after_report:
+            QTimer.singleShot(0, self.app.quit)
+
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
+    reporter = None
+    if "--startup-report" in sys.argv or "--quit-after-startup" in sys.argv:
+        reporter = StartupReporter(app, quit_after_report="--quit-after-startup" in sys.argv)
+        reporter.mark("导入模块")
 
     # 1. 创建 Model
     # init_db() 在 TransactionModel 的 __init__ 中被调用，所以这里不需要显式调用
-    model = TransactionModel()
+    # --db 指定打开的账本，之后可以在窗口顶部切换到同一目录中的其他账本
+    model = TransactionModel(_argument_value("--db", DATABASE_FILE))
+    # 记录模型方法的耗时，在设置页的性能分析面板中查看
+    profiler.instrument(model, "TransactionModel")
+    if reporter:
+        reporter.mark("打开数据库")
 
-    # 2. 创建 View
+    # 2. 创建 View (只创建首页，其余标签页在第一次切换到时才创建)
     view = MainView()
 
-    # 3. 创建 Controller 并连接 Model 和 View
+    # 3. 创建 Controller 并连接 Model 和 View (数据在窗口首次绘制之后才开始加载)
     controller = Controller(model=model, view=view)
-    
+    if reporter:
+        reporter.mark("创建窗口")
+
     # 4. 显示主窗口 (由 View 控制)
     view.show()
-    
+
+    # 退出时先等待后台任务结束，再关闭模型持有的数据库长连接 (切换账本后为新账本的模型)
+    app.aboutToQuit.connect(controller.shutdown)
+    app.aboutToQuit.connect(lambda: controller.model.close())
+
     sys.exit(app.exec())
@@ -0,0 +1,90 @@
+import datetime
+import math
+import random
+
+from model.money import DEFAULT_CURRENCY
+
+# 可复现的合成账本生成器: 相同的 seed 和参数总是生成完全相同的数据，
+# 用于基准测试在不同代码版本之间对比。
+
+EXPENSE_CATEGORIES = {
+    "餐饮": (["早餐", "午餐", "晚餐", "咖啡", "外卖", "水果"], 3.2, 0.7),
+    "交通": (["地铁", "公交", "打车", "加油", "停车费"], 2.8, 0.8),
+    "购物": (["超市", "网购", "服装", "日用品", "数码产品"], 4.3, 1.0),
+    "居住": (["房租", "水费", "电费", "燃气费", "物业费"], 5.5, 1.1),
+    "娱乐": (["电影", "游戏", "演出", "旅行"], 4.0, 1.0),
+    "医疗": (["药店", "门诊", "体检"], 4.5, 0.9),
+    "通讯": (["话费", "宽带"], 4.2, 0.3),
+}
+INCOME_CATEGORIES = {
+    "工资": (["工资"], 9.3, 0.2),
+    "奖金": (["季度奖金", "年终奖"], 9.0, 0.6),
+    "理财": (["基金收益", "利息"], 5.0, 1.2),
+}
+# 每日支出笔数的星期权重 (周一到周日)，周末消费更多
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.0, 1.1, 1.3, 1.8, 1.6)
+INCOME_SHARE = 0.06  # 约 6% 的交易是收入
+
+
+def category_rows():
+    """返回 (name, type) 形式的全部类别。"""
+    return ([(name, "支出") for name in EXPENSE_CATEGORIES] +
+            [(name, "收入") for name in INCOME_CATEGORIES])
+
+
+def _weighted_days(start, days):
+    weights = [WEEKDAY_WEIGHTS[(start + datetime.timedelta(days=offset)).weekday()] for offset in range(days)]
+    total = sum(weights)
+    cumulative, running = [], 0.0
+    for weight in weights:
+        running += weight / total
+        cumulative.append(running)
+    return cumulative
+
+
+def generate_transactions(count, seed=20240101, years=5, end_date=datetime.date(2024, 12, 31)):
+    """按日期升序生成 count 条交易 (date, description, amount, type, currency, category)。
+
+    日期分布在 end_date 之前的 years 年内并按星期加权；金额服从对数正态分布，
+    以分计的整数；约 INCOME_SHARE 比例为收入。
+    """
+    rng = random.Random(seed)
+    days = years * 365
+    start = end_date - datetime.timedelta(days=days - 1)
+    cumulative = _weighted_days(start, days)
+    day_indexes = sorted(
+        min(_bisect(cumulative, rng.random()), days - 1) for _ in range(count)
+    )
+    expense_items = list(EXPENSE_CATEGORIES.items())
+    income_items = list(INCOME_CATEGORIES.items())
+    for day_index in day_indexes:
+        date = (start + datetime.timedelta(days=day_index)).isoformat()
+        if rng.random() < INCOME_SHARE:
+            category, (descriptions, mu, sigma) = rng.choice(income_items)
+            transaction_type = "收入"
+        else:
+            category, (descriptions, mu, sigma) = rng.choice(expense_items)
+            transaction_type = "支出"
+        amount = round(math.exp(rng.gauss(mu, sigma)) * 100) or 1
+        yield date, rng.choice(descriptions), amount, transaction_type, DEFAULT_CURRENCY, category
+
+
+def _bisect(cumulative, value):
+    low, high = 0, len(cumulative)
+    while low < high:
+        middle = (low + high) // 2
+        if cumulative[middle] < value:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def populate_model(model, count, seed=20240101, years=5, batch_size=20000):
+    """用合成数据填充 model：写入全部类别和 count 条交易，每条交易关联到它的类别。"""
+    for name, category_type in category_rows():
+        model.add_category(name, category_type)
+    rows = generate_transactions(count, seed=seed, years=years)
+    success, message = model.bulk_add_transactions(rows, batch_size)
+    if not success:
+        raise RuntimeError(message)
@@ -0,0 +1,219 @@
+"""PocketLedger 性能基准测试。
+
+用法:
+    python -m benchmarks.run_benchmarks --rows 10000 100000 --output bench.json
+    python -m benchmarks.run_benchmarks --rows 10000 100000 --baseline bench.json
+
+对每个账本规模生成可复现的合成数据，测量模型方法以及视图 (在 Qt offscreen
+平台下) 的耗时，并把结果以 JSON 写出，便于比较不同版本的运行结果。
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.ledger_generator import populate_model
+from model.model import TransactionModel
+
+
+def measure(fn, repeat=5, warmup=1, setup=None):
+    """执行 fn 若干次，返回每次耗时 (秒) 的统计。setup 在每次执行前调用，不计入耗时。"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "max": max(samples),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def model_benchmarks(model, repeat):
+    results = {}
+    counter = iter(range(10 ** 9))
+
+    def add_one():
+        model.add_transaction("2024-06-15", f"基准 {next(counter)}", 1234, "支出")
+
+    def cached_read(name, fn):
+        # 经过读缓存的方法: 不带后缀的条目每次执行前清空缓存，测量的是 SQL 查询；
+        # [cached] 条目测量缓存命中
+        results[name] = measure(fn, repeat=max(repeat, 20), setup=model._read_cache.clear)
+        results[name + "[cached]"] = measure(fn, repeat=max(repeat, 20))
+
+    results["TransactionModel.add_transaction"] = measure(add_one, repeat=max(repeat, 20))
+    results["TransactionModel.get_all_transactions"] = measure(model.get_all_transactions, repeat)
+    cached_read("TransactionModel.get_transactions_page[first]", lambda: model.get_transactions_page(None, 256))
+    middle_cursor = ("2022-06-30", 1 << 62)
+    cached_read("TransactionModel.get_transactions_page[middle]",
+                lambda: model.get_transactions_page(middle_cursor, 256))
+    cached_read("TransactionModel.get_summary_stats", model.get_summary_stats)
+    cached_read("TransactionModel.get_categories", model.get_categories)
+    return results
+
+
+def analytics_benchmarks(model, repeat):
+    """测量报表分析引擎的全量加载、增量刷新和报表计算；没有安装 numpy 时跳过。"""
+    try:
+        from model.analytics import LedgerAnalytics
+    except ImportError:
+        print("未安装 numpy，跳过报表分析基准测试。", file=sys.stderr)
+        return {}
+    results = {"LedgerAnalytics.refresh[full]": measure(lambda: LedgerAnalytics(model).refresh(), repeat)}
+    analytics = LedgerAnalytics(model)
+    analytics.refresh()
+    counter = iter(range(10 ** 9))
+
+    def add_and_refresh():
+        model.add_transaction("2024-06-15", f"基准 {next(counter)}", 1234, "支出")
+        analytics.refresh()
+
+    results["LedgerAnalytics.refresh[incremental]"] = measure(add_and_refresh, repeat=max(repeat, 20))
+    results["LedgerAnalytics.report[all]"] = measure(analytics.report, repeat)
+    results["LedgerAnalytics.report[year]"] = measure(
+        lambda: analytics.report("2024-01-01", "2024-12-31"), repeat)
+    return results
+
+
+def view_benchmarks(model, repeat):
+    """在 offscreen 平台下测量视图方法；没有安装 PySide6 时跳过。"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PySide6.QtWidgets import QApplication
+    except ImportError:
+        print("未安装 PySide6，跳过视图基准测试。", file=sys.stderr)
+        return {}
+    from view.view import DetailsTab, HomeTab
+
+    app = QApplication.instance() or QApplication([])
+    results = {}
+    details_tab = DetailsTab()
+    details_tab.resize(850, 600)
+    details_tab.show()
+
+    def populate_and_paint():
+        details_tab.populate_transaction_table(model.get_transactions_page)
+        table_model = details_tab.transactions_model
+        if table_model.canFetchMore():
+            table_model.fetchMore()
+        app.processEvents()
+
+    results["DetailsTab.populate_transaction_table"] = measure(populate_and_paint, repeat)
+
+    home_tab = HomeTab()
+    home_tab.resize(600, 800)
+    home_tab.show()
+    categories = model.get_categories()
+
+    def rebuild_cards():
+        home_tab.update_category_cards([])
+        home_tab.update_category_cards(categories)
+        app.processEvents()
+
+    results["HomeTab.update_category_cards"] = measure(rebuild_cards, repeat)
+    details_tab.close()
+    home_tab.close()
+    return results
+
+
+def run(row_counts, seed, repeat, include_views):
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "runs": [],
+    }
+    for rows in row_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            with TransactionModel(os.path.join(directory, "bench.db")) as model:
+                start = time.perf_counter()
+                populate_model(model, rows, seed=seed)
+                populate_seconds = time.perf_counter() - start
+                results = model_benchmarks(model, repeat)
+                results.update(analytics_benchmarks(model, repeat))
+                if include_views:
+                    results.update(view_benchmarks(model, repeat))
+        report["runs"].append({"rows": rows, "populate_seconds": populate_seconds, "results": results})
+        print(f"rows={rows}: 生成 {populate_seconds:.2f}s", file=sys.stderr)
+        for name, stats in results.items():
+            print(f"  {name:<60} median {stats['median'] * 1000:9.3f} ms", file=sys.stderr)
+    return report
+
+
+def compare(report, baseline, threshold):
+    """与基准结果比较中位数，返回变慢超过 threshold (比例) 的项目列表。"""
+    baseline_runs = {run["rows"]: run["results"] for run in baseline.get("runs", [])}
+    regressions = []
+    for run in report["runs"]:
+        previous = baseline_runs.get(run["rows"], {})
+        for name, stats in run["results"].items():
+            if name not in previous:
+                continue
+            before, after = previous[name]["median"], stats["median"]
+            if before > 0 and after > before * (1 + threshold):
+                regressions.append((run["rows"], name, before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PocketLedger 性能基准测试")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000],
+                        help="要测试的账本规模 (交易条数)，可指定多个")
+    parser.add_argument("--seed", type=int, default=20240101, help="合成数据的随机种子")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量的重复次数")
+    parser.add_argument("--no-views", action="store_true", help="跳过需要 Qt 的视图基准测试")
+    parser.add_argument("--output", help="把 JSON 结果写入该文件 (默认输出到标准输出)")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果比较，发现退化时以状态码 1 退出")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="中位数变慢超过该比例视为退化 (默认 0.2，即 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args.rows, args.seed, args.repeat, not args.no_views)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for rows, name, before, after in regressions:
+            print(f"退化: rows={rows} {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
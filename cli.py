@@ -0,0 +1,301 @@
+"""PocketLedger 命令行工具，不依赖 PySide6，适合脚本和定时任务。
+
+用法示例:
+    python cli.py add 2024-05-01 午餐 32.5 --type 支出
+    python cli.py list --from 2024-05-01 --to 2024-05-31 --format csv > may.csv
+    python cli.py delete 42
+    python cli.py summary
+    python cli.py range 2024-01-01 2024-12-31 --by month
+    python cli.py import statement.csv
+    python cli.py export --format jsonl > ledger.jsonl
+    python cli.py archive 2023
+    python cli.py consolidate household.db studio.db --by-month
+
+与图形界面同时打开同一个数据库是安全的: 数据库使用 WAL 模式，写入在
+BEGIN IMMEDIATE 事务中进行，遇到另一方持有写锁时等待 (busy_timeout) 而不是报错。
+"""
+import argparse
+import csv
+import os
+import sys
+
+from model.exporter import TRANSACTION_CSV_HEADER, csv_rows, export_ledger, jsonl_lines
+from model.model import DATABASE_FILE, TransactionModel
+from model.money import DEFAULT_CURRENCY, format_amount, to_minor_units
+
+# list 逐页读取的行数，输出是流式的，内存占用与总行数无关
+PAGE_SIZE = 1000
+
+TYPE_CHOICES = {"收入": "收入", "支出": "支出", "income": "收入", "expense": "支出"}
+
+
+def _transaction_type(value):
+    transaction_type = TYPE_CHOICES.get(value.strip().lower())
+    if transaction_type is None:
+        raise argparse.ArgumentTypeError(f"无法识别的收支类型: {value!r} (可用: 收入/支出/income/expense)")
+    return transaction_type
+
+
+def _amount(value):
+    try:
+        return to_minor_units(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def _date(value):
+    from model.importer import ImportRowError, normalize_date
+    try:
+        return normalize_date(value)
+    except ImportRowError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def iter_pages(model, limit=None, **filters):
+    """按日期和ID降序逐页生成交易记录列表，filters 同 TransactionModel.get_transactions_page。"""
+    cursor = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        page_size = PAGE_SIZE if remaining is None else min(PAGE_SIZE, remaining)
+        rows, cursor = model.get_transactions_page(cursor, page_size, **filters)
+        yield rows
+        if remaining is not None:
+            remaining -= len(rows)
+        if cursor is None:
+            return
+
+
+def write_transactions(batches, output_format, out, header=TRANSACTION_CSV_HEADER):
+    """把交易批次以 table (制表符分隔)、csv 或 jsonl 格式写到 out。
+
+    csv 的表头与导入器识别的列名一致，导出的内容可以直接重新导入；header 与批次中记录的列对应。
+    """
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(header)
+        writer.writerows(csv_rows(batches))
+    elif output_format == "jsonl":
+        out.writelines(jsonl_lines(batches))
+    else:
+        for batch in batches:
+            for transaction_id, date, description, amount, transaction_type, *details in batch:
+                amount_text = format_amount(amount, details[0] if details else DEFAULT_CURRENCY)
+                out.write(f"{transaction_id}\t{date}\t{transaction_type}\t{amount_text}\t{description or ''}\n")
+
+
+def _filters(args):
+    return {
+        "date_from": args.date_from, "date_to": args.date_to, "transaction_type": args.type,
+        "min_amount": args.min_amount, "max_amount": args.max_amount, "description": args.search,
+    }
+
+
+def cmd_add(model, args):
+    success, message, _ = model.add_transaction(args.date, args.description, args.amount, args.type)
+    return success, message
+
+
+def cmd_delete(model, args):
+    success, message, _ = model.delete_transaction(args.id)
+    return success, message
+
+
+def cmd_list(model, args):
+    # 分页查询的记录只有前五列
+    write_transactions(iter_pages(model, args.limit, **_filters(args)), args.format, sys.stdout,
+                       TRANSACTION_CSV_HEADER[:5])
+    return True, None
+
+
+def cmd_export(model, args):
+    """按日期升序导出；指定 -o 时写文件 (按扩展名决定格式和是否压缩)，否则流式写到标准输出。"""
+    if args.output:
+        def report_progress(count):
+            print(f"\r已导出 {count} 条交易...", end="", file=sys.stderr, flush=True)
+        success, message, _ = export_ledger(
+            model, args.output, args.format, True if args.gzip else None,
+            include_categories=not args.no_categories, date_from=args.date_from, date_to=args.date_to,
+            transaction_type=args.type, progress_callback=report_progress if sys.stderr.isatty() else None
+        )
+        if sys.stderr.isatty():
+            print(file=sys.stderr)
+        return success, message
+    batches = model.iter_transaction_batches(date_from=args.date_from, date_to=args.date_to,
+                                             transaction_type=args.type, min_amount=args.min_amount,
+                                             max_amount=args.max_amount, description=args.search, detailed=True)
+    try:
+        write_transactions(batches, args.format or "csv", sys.stdout)
+    finally:
+        # 输出中断 (如管道被关闭) 时也要在数据库关闭前释放游标
+        batches.close()
+    return True, None
+
+
+def cmd_summary(model, args):
+    total_income, total_expense, net_balance = model.get_summary_stats()
+    print(f"总收入\t{format_amount(total_income)}")
+    print(f"总支出\t{format_amount(total_expense)}")
+    print(f"净额\t{format_amount(net_balance)}")
+    if args.verify or args.repair:
+        drift = model.verify_summary_stats(repair=args.repair)
+        if drift:
+            for transaction_type, values in drift.items():
+                stored_total, stored_count = values["stored"]
+                actual_total, actual_count = values["actual"]
+                print(f"{transaction_type} 汇总不一致: 记录 {format_amount(stored_total)} / {stored_count} 笔，"
+                      f"实际 {format_amount(actual_total)} / {actual_count} 笔", file=sys.stderr)
+            return args.repair, "汇总表已修复。" if args.repair else "汇总表与交易不一致，可加 --repair 修复。"
+    return True, None
+
+
+def cmd_range(model, args):
+    """按天或按月输出区间内的收入、支出、净额和笔数。"""
+    totals = {}
+    for date, income, expense, count in model.get_daily_totals(args.date_from, args.date_to):
+        key = date[:7] if args.by == "month" else date
+        entry = totals.setdefault(key, [0, 0, 0])
+        entry[0] += income
+        entry[1] += expense
+        entry[2] += count
+    overall = [0, 0, 0]
+    print("期间\t收入\t支出\t净额\t笔数")
+    for key, (income, expense, count) in totals.items():
+        print(f"{key}\t{format_amount(income)}\t{format_amount(expense)}\t{format_amount(income - expense)}\t{count}")
+        overall = [overall[0] + income, overall[1] + expense, overall[2] + count]
+    print(f"合计\t{format_amount(overall[0])}\t{format_amount(overall[1])}\t"
+          f"{format_amount(overall[0] - overall[1])}\t{overall[2]}")
+    return True, None
+
+
+def cmd_import(model, args):
+    from model.importer import import_statement
+    success, message, errors = import_statement(model, args.path, args.file_format)
+    for line, reason in errors:
+        print(f"第 {line} 行: {reason}", file=sys.stderr)
+    return success, message
+
+
+def cmd_archive(model, args):
+    """把指定年份移到归档文件；不指定年份时列出已归档和可以归档的年份。"""
+    if args.year is not None:
+        success, message, _ = model.archive_year(args.year)
+        return success, message
+    print("年份\t文件\t收入\t支出\t笔数")
+    for year, file_name, income, income_count, expense, expense_count in model.get_archives():
+        print(f"{year}\t{file_name}\t{format_amount(income)}\t{format_amount(expense)}\t{income_count + expense_count}")
+    years = model.get_archivable_years()
+    return True, f"可以归档的年份: {', '.join(map(str, years))}" if years else "没有可以归档的年份。"
+
+
+def _print_totals(rows):
+    for key, income, expense, count in rows:
+        print(f"{key}\t{format_amount(income)}\t{format_amount(expense)}\t{format_amount(income - expense)}\t{count}")
+
+
+def cmd_consolidate(model, args):
+    """并行汇总多个账本；不指定账本时汇总 --db 所在目录中的所有账本。"""
+    from model.ledgers import consolidate, find_ledgers
+    paths = args.ledgers or find_ledgers(os.path.dirname(os.path.abspath(args.db)))
+    report = consolidate(paths, args.date_from, args.date_to, args.workers, args.processes)
+    print("账本\t收入\t支出\t净额\t笔数")
+    _print_totals(report["ledgers"] + [("合计", *report["totals"])])
+    if args.by_month:
+        print()
+        print("月份\t收入\t支出\t净额\t笔数")
+        _print_totals(report["months"])
+    for name, message in report["errors"]:
+        print(f"{name}: {message}", file=sys.stderr)
+    return not report["errors"], None
+
+
+def _add_filter_arguments(parser):
+    parser.add_argument("--from", dest="date_from", type=_date, help="起始日期 (含)")
+    parser.add_argument("--to", dest="date_to", type=_date, help="结束日期 (含)")
+    parser.add_argument("--type", type=_transaction_type, help="收入 或 支出")
+    parser.add_argument("--min", dest="min_amount", type=_amount, help="最小金额 (含)")
+    parser.add_argument("--max", dest="max_amount", type=_amount, help="最大金额 (含)")
+    parser.add_argument("--search", help="描述包含的文本")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="PocketLedger 命令行工具")
+    parser.add_argument("--db", default=DATABASE_FILE, help=f"数据库文件 (默认 {DATABASE_FILE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="添加一条交易")
+    add.add_argument("date", type=_date)
+    add.add_argument("description")
+    add.add_argument("amount", type=_amount)
+    add.add_argument("--type", type=_transaction_type, default="支出", help="收入 或 支出 (默认支出)")
+    add.set_defaults(handler=cmd_add)
+
+    delete = commands.add_parser("delete", help="按 ID 删除一条交易")
+    delete.add_argument("id", type=int)
+    delete.set_defaults(handler=cmd_delete)
+
+    listing = commands.add_parser("list", help="按日期降序列出交易")
+    _add_filter_arguments(listing)
+    listing.add_argument("--limit", type=int, help="最多输出的条数")
+    listing.add_argument("--format", choices=["table", "csv", "jsonl"], default="table")
+    listing.set_defaults(handler=cmd_list)
+
+    export = commands.add_parser("export", help="按日期升序导出交易 (CSV 可以重新导入)")
+    _add_filter_arguments(export)
+    export.add_argument("--format", choices=["csv", "jsonl"], help="默认根据输出文件扩展名判断，标准输出为 csv")
+    export.add_argument("-o", "--output", help="输出文件 (如 ledger.csv、ledger.jsonl.gz)，默认写到标准输出")
+    export.add_argument("--gzip", action="store_true", help="写文件时 gzip 压缩 (扩展名为 .gz 时自动压缩)")
+    export.add_argument("--no-categories", action="store_true", help="写文件时不导出类别")
+    export.set_defaults(handler=cmd_export)
+
+    summary = commands.add_parser("summary", help="总收入、总支出和净额")
+    summary.add_argument("--verify", action="store_true", help="从交易表重新计算并校验汇总")
+    summary.add_argument("--repair", action="store_true", help="校验汇总 (即隐含 --verify)，不一致时修复汇总表")
+    summary.set_defaults(handler=cmd_summary)
+
+    date_range = commands.add_parser("range", help="区间内按天或按月的收支汇总")
+    date_range.add_argument("date_from", type=_date)
+    date_range.add_argument("date_to", type=_date)
+    date_range.add_argument("--by", choices=["day", "month"], default="day")
+    date_range.set_defaults(handler=cmd_range)
+
+    importing = commands.add_parser("import", help="导入 CSV / OFX 银行账单或 export 导出的 CSV / JSON Lines (可 gzip 压缩)")
+    importing.add_argument("path")
+    importing.add_argument("--format", dest="file_format", choices=["csv", "ofx", "jsonl"])
+    importing.set_defaults(handler=cmd_import)
+
+    archive = commands.add_parser("archive", help="把已结束的年份移到单独的归档文件")
+    archive.add_argument("year", type=int, nargs="?", help="要归档的年份，省略时列出归档情况")
+    archive.set_defaults(handler=cmd_archive)
+
+    consolidation = commands.add_parser("consolidate", help="并行汇总多个账本的收支")
+    consolidation.add_argument("ledgers", nargs="*", help="账本文件，默认为 --db 所在目录中的所有账本")
+    consolidation.add_argument("--from", dest="date_from", type=_date, help="起始日期 (含)")
+    consolidation.add_argument("--to", dest="date_to", type=_date, help="结束日期 (含)")
+    consolidation.add_argument("--by-month", action="store_true", help="同时输出逐月合计")
+    consolidation.add_argument("--workers", type=int, help="并行数 (默认为 CPU 核数)")
+    consolidation.add_argument("--processes", action="store_true", help="使用进程池而不是线程池")
+    # 各账本由工作线程各自打开，不需要打开 --db
+    consolidation.set_defaults(handler=cmd_consolidate, open_model=False)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if getattr(args, "open_model", True):
+            with TransactionModel(args.db) as model:
+                success, message = args.handler(model, args)
+        else:
+            success, message = args.handler(None, args)
+    except BrokenPipeError:
+        # 输出被 head 等命令提前关闭: 把标准输出指向 /dev/null 后静默退出，
+        # 避免解释器在退出时刷新缓冲区再次报错
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    if message:
+        print(message, file=sys.stdout if success else sys.stderr)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
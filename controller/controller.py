@@ -1,88 +1,451 @@
-from PySide6.QtCore import QDate
-from PySide6.QtWidgets import QInputDialog
+import datetime
+import os
+import sqlite3
+
+from PySide6.QtCore import QDate, Qt, QTimer
+from PySide6.QtWidgets import QInputDialog, QFileDialog, QProgressDialog
 from model.model import TransactionModel # Updated import
+from model.instrumentation import profiler
+from model.backup import DEFAULT_KEEP, create_snapshot, list_snapshots, restore_snapshot
+from model.daily_totals import DailyTotalsCache, adjacent_months
+from model.ledgers import LEDGER_EXTENSION, consolidate, find_ledgers, ledger_name
+from model.money import format_amount
+from model.unit_of_work import UndoJournal, UnitOfWork
+from controller.worker import TaskRunner
 # view.py will be instantiated and passed in by app.py
 
 class Controller:
+    SEARCH_LIMIT = 200 # 搜索最多显示的结果条数
+    REPORT_TOP_N = 10 # 报表中列出的支出类别数
+    BULK_PATCH_LIMIT = 200 # 一次修改超过这个行数时重新加载表格，而不是逐行修补
+    CHANGE_POLL_MS = 500 # 检查其他进程 (命令行、同步任务、另一个窗口) 修改数据库的间隔
+    BACKUP_CHECK_MS = 10 * 60 * 1000 # 检查是否需要自动备份的间隔
+    BACKUP_STARTUP_DELAY_MS = 60 * 1000 # 启动后第一次检查自动备份的延迟，避开启动时的加载
+
     def __init__(self, model: TransactionModel, view):
         self.model = model
         self.view = view 
+        # 数据库操作在后台线程池中执行，结果通过信号回到界面线程
+        # 任务结束时交还其线程的只读连接；切换账本前会等待所有任务结束，这里的 self.model 就是任务使用的模型
+        self.tasks = TaskRunner(parent=view, thread_cleanup=lambda: self.model.release_reader())
+        self.analytics = None # 报表的列式分析引擎，第一次打开报表页时才创建
+        self.daily_totals = DailyTotalsCache(model) # 日历页按月缓存的每日汇总
+        # 明细页的修改以工作单元提交并记入撤销日志；有修改在后台执行时暂停撤销 / 重做
+        self.journal = UndoJournal()
+        self._pending_writes = 0
+        # 自动备份: 最新的快照超过 backup_interval_hours 时在后台创建新快照，保留 backup_keep 份
+        self.auto_backup_enabled = True
+        self.backup_interval_hours = 24
+        self.backup_keep = DEFAULT_KEEP
+        self._backup_running = False
+        self._restore_running = False
+        # 在绑定信号之前给入口方法加上计时，结果显示在设置页的性能分析面板
+        profiler.instrument(self, "Controller")
+        # 设置页可见时每秒刷新一次性能分析面板
+        self.profile_timer = QTimer(view)
+        self.profile_timer.setInterval(1000)
+        self.profile_timer.timeout.connect(self._refresh_profile_panel)
+        # 定时检查其他进程的修改，只刷新被修改的表对应的界面
+        self.change_timer = QTimer(view)
+        self.change_timer.setInterval(self.CHANGE_POLL_MS)
+        self.change_timer.timeout.connect(self._poll_external_changes)
+        self.change_timer.start()
+        self.backup_timer = QTimer(view)
+        self.backup_timer.setInterval(self.BACKUP_CHECK_MS)
+        self.backup_timer.timeout.connect(self._run_scheduled_backup)
+        self.backup_timer.start()
+        QTimer.singleShot(self.BACKUP_STARTUP_DELAY_MS, self._run_scheduled_backup)
         self._connect_signals()
-        self.load_initial_data()
+        # 窗口先完成首次绘制，再开始加载数据
+        QTimer.singleShot(0, self.load_initial_data)
 
     def _connect_signals(self):
-        """连接视图中的信号到控制器的方法。"""
-        self.view.details_tab.submit_button.clicked.connect(self.submit_transaction)
-        self.view.details_tab.delete_button.clicked.connect(self.delete_selected_transaction)
-        self.view.details_tab.edit_button.clicked.connect(self.start_edit_selected_transaction)
+        """连接视图中的信号到控制器的方法。除首页外的标签页在创建时才连接。"""
+        self.view.tab_created.connect(self._on_tab_created)
+        self.view.tab_widget.currentChanged.connect(self._on_tab_changed)
+        self.view.ledger_selected.connect(self.switch_ledger)
+        self.view.new_ledger_button.clicked.connect(self.prompt_new_ledger)
+        self.view.consolidate_button.clicked.connect(self.show_consolidated_report)
 
         # 连接首页标签页的信号
         if hasattr(self.view, 'home_tab') and hasattr(self.view.home_tab, 'add_category_button'):
             self.view.home_tab.add_category_button.clicked.connect(self.prompt_add_category)
 
+    def _on_tab_created(self, name):
+        """标签页第一次被切换到时才创建，这里连接它的信号并加载它需要的数据。"""
+        if name == "details_tab":
+            details_tab = self.view.details_tab
+            details_tab.submit_button.clicked.connect(self.submit_transaction)
+            details_tab.delete_button.clicked.connect(self.delete_selected_transactions)
+            details_tab.change_type_button.clicked.connect(self.change_selected_transactions_type)
+            details_tab.undo_button.clicked.connect(self.undo_last_change)
+            details_tab.redo_button.clicked.connect(self.redo_last_change)
+            details_tab.edit_button.clicked.connect(self.start_edit_selected_transaction)
+            details_tab.import_button.clicked.connect(self.import_statement_file)
+            details_tab.export_button.clicked.connect(self.export_ledger_file)
+            details_tab.search_requested.connect(self.search_transactions)
+            self.refresh_transactions_table()
+            self.update_summary_display()
+            self.refresh_home_tab_categories() # 同时填充表单的类别下拉框
+        elif name == "calendar_tab":
+            calendar_tab = self.view.calendar_tab
+            calendar_tab.calendar.currentPageChanged.connect(self.show_calendar_month)
+            self.show_calendar_month(*calendar_tab.shown_month())
+        elif name == "reports_tab":
+            self.view.reports_tab.range_changed.connect(self.refresh_reports)
+        elif name == "settings_tab":
+            # 连接设置页性能分析面板的信号
+            settings_tab = self.view.settings_tab
+            settings_tab.profiling_enabled_checkbox.setChecked(profiler.enabled)
+            settings_tab.slow_threshold_spin.setValue(profiler.slow_threshold_ms)
+            settings_tab.profiling_enabled_checkbox.toggled.connect(self._set_profiling_enabled)
+            settings_tab.slow_threshold_spin.valueChanged.connect(self._set_slow_threshold)
+            settings_tab.profiling_refresh_button.clicked.connect(self._refresh_profile_panel)
+            settings_tab.profiling_reset_button.clicked.connect(self._reset_profile)
+            settings_tab.profiling_export_button.clicked.connect(self.export_profile)
+            settings_tab.archive_button.clicked.connect(self.archive_selected_year)
+            self.refresh_archive_panel()
+            settings_tab.auto_backup_checkbox.setChecked(self.auto_backup_enabled)
+            settings_tab.backup_interval_spin.setValue(self.backup_interval_hours)
+            settings_tab.backup_keep_spin.setValue(self.backup_keep)
+            settings_tab.auto_backup_checkbox.toggled.connect(self._set_auto_backup_enabled)
+            settings_tab.backup_interval_spin.valueChanged.connect(self._set_backup_interval)
+            settings_tab.backup_keep_spin.valueChanged.connect(self._set_backup_keep)
+            settings_tab.backup_now_button.clicked.connect(lambda: self.backup_now())
+            settings_tab.restore_button.clicked.connect(self.restore_selected_snapshot)
+            settings_tab.set_backup_busy(self._backup_running or self._restore_running)
+            self.refresh_snapshot_list()
+
     def load_initial_data(self):
-        """加载初始数据，例如交易列表和汇总统计。"""
+        """加载当前可见标签页需要的数据；其余标签页在创建时各自加载。"""
+        self.refresh_ledger_list()
         self.refresh_transactions_table()
         self.update_summary_display()
         self.refresh_home_tab_categories()
 
+    def _ledger_directory(self):
+        return os.path.dirname(os.path.abspath(self.model.database_file))
+
+    def refresh_ledger_list(self):
+        """列出当前账本所在目录中的所有账本，并选中当前账本。"""
+        current_path = os.path.abspath(self.model.database_file)
+        self.view.set_ledgers([(ledger_name(path), os.path.abspath(path))
+                               for path in find_ledgers(self._ledger_directory())], current_path)
+
+    def switch_ledger(self, path):
+        """关闭当前账本并打开 path (不存在时创建)，所有页面改为显示新账本的数据。"""
+        if os.path.abspath(path) == os.path.abspath(self.model.database_file):
+            return
+        if self._pending_writes or self._restore_running:
+            self.view.show_message("提示", "有修改正在保存，请稍后再切换账本。", "warning")
+            self.refresh_ledger_list()
+            return
+        try:
+            model = TransactionModel(path)
+        except sqlite3.Error as e:
+            self.view.show_message("错误", f"打开账本失败: {e}", "critical")
+            self.refresh_ledger_list()
+            return
+        # 排队中的任务直接丢弃 (下面会重新提交)，取消旧账本的备份，等正在执行的任务结束后才关闭旧账本
+        self.tasks.cancel("backup")
+        self.tasks.clear()
+        self.tasks.wait_for_done()
+        if self._backup_running:
+            self._backup_running = False
+            self._set_backup_busy(False, "切换账本，备份已取消。")
+        old_model, self.model = self.model, model
+        old_model.close()
+        profiler.instrument(model, "TransactionModel")
+        self.daily_totals = DailyTotalsCache(model)
+        self._reload_all_views()
+        self.refresh_snapshot_list()
+
+    def _reload_all_views(self):
+        """账本被整体替换 (切换账本或从快照恢复) 后，丢弃依赖旧数据的状态并重新加载所有页面。"""
+        self.daily_totals.clear()
+        self.analytics = None
+        # 撤销日志记录的修改已不适用于新数据
+        self.journal.clear()
+        if self.view.details_tab is not None:
+            self.view.details_tab.clear_input_fields()
+            self._update_undo_state()
+        self.load_initial_data()
+        if self.view.calendar_tab is not None:
+            self.show_calendar_month(*self.view.calendar_tab.shown_month())
+        if self.view.current_tab_name() == "reports_tab":
+            self.refresh_reports()
+        self.refresh_archive_panel()
+
+    def prompt_new_ledger(self):
+        """输入名称后在当前账本所在目录创建一个新账本并切换到它。"""
+        name, ok = QInputDialog.getText(self.view, "新建账本", "账本名称:")
+        name = name.strip()
+        if not ok or not name:
+            return
+        if any(character in name for character in '\\/:*?"<>|'):
+            self.view.show_message("提示", "账本名称不能包含 \\ / : * ? \" < > | 等字符。", "warning")
+            return
+        path = os.path.join(self._ledger_directory(), name + LEDGER_EXTENSION)
+        if os.path.exists(path):
+            self.view.show_message("提示", f"账本 '{name}' 已存在。", "warning")
+            return
+        self.switch_ledger(path)
+
+    def show_consolidated_report(self):
+        """在后台并行汇总目录中的所有账本，完成后显示每个账本和合计的收支。"""
+        self.view.consolidate_button.setEnabled(False)
+
+        def summary_line(name, income, expense, count):
+            return (f"{name}: 收入 {format_amount(income)}，支出 {format_amount(expense)}，"
+                    f"净额 {format_amount(income - expense)}，{count} 笔")
+
+        def on_finished(report):
+            self.view.consolidate_button.setEnabled(True)
+            lines = [summary_line(*ledger) for ledger in report["ledgers"]]
+            lines.append(summary_line("合计", *report["totals"]))
+            lines.extend(f"{name}: 读取失败 ({message})" for name, message in report["errors"])
+            self.view.show_message("合并汇总", "\n".join(lines))
+
+        def on_error(message):
+            self.view.consolidate_button.setEnabled(True)
+            self.view.show_message("错误", f"合并汇总失败: {message}", "critical")
+
+        self.tasks.submit(consolidate, find_ledgers(self._ledger_directory()), key="consolidate",
+                          on_result=on_finished, on_error=on_error)
+
+    def shutdown(self):
+        """退出前取消排队中的任务并等待正在执行的任务结束，进行中的备份会被取消，恢复则等待其完成。"""
+        self.change_timer.stop()
+        self.backup_timer.stop()
+        self.tasks.cancel("backup")
+        self.tasks.clear(keep=("restore",))
+        self.tasks.wait_for_done()
+
+    def _poll_external_changes(self):
+        """其他进程修改了数据库时刷新受影响的界面；没有修改时只执行一条 PRAGMA。"""
+        changed = self.model.poll_changes()
+        if "transactions" in changed:
+            self.refresh_transactions_table()
+            self.update_summary_display()
+            self.daily_totals.clear()
+            if self.view.calendar_tab is not None:
+                self.show_calendar_month(*self.view.calendar_tab.shown_month())
+            if self.view.current_tab_name() == "reports_tab":
+                self.refresh_reports()
+        if "archives" in changed:
+            self.refresh_archive_panel()
+        if changed:
+            # 首页卡片显示各类别本月的金额，交易或类别变化都需要刷新
+            self.refresh_home_tab_categories()
+
     def refresh_transactions_table(self):
-        """从模型获取所有交易并更新视图中的表格。"""
-        transactions = self.model.get_all_transactions()
-        self.view.details_tab.populate_transaction_table(transactions)
+        """让视图中的表格从模型分页重新加载交易，只在滚动到时才查询后续页。"""
+        if self.view.details_tab is None:
+            return
+        if self.view.details_tab.search_query():
+            self.search_transactions(self.view.details_tab.search_query())
+            return
+        self.view.details_tab.populate_transaction_table(self.model.get_transactions_page)
+
+    def search_transactions(self, query):
+        """在后台搜索交易描述并在表格中显示结果；查询为空时恢复完整列表。"""
+        if not query:
+            self.tasks.cancel("search")
+            self.refresh_transactions_table()
+            return
+        self.tasks.submit(
+            self.model.search, query, self.SEARCH_LIMIT, key="search",
+            on_result=self.view.details_tab.show_search_results
+        )
+
+    def _refresh_after_changes(self, changes):
+        """交易变化后: 列表模式下只修补受影响的行，搜索模式下修补已显示的结果、必要时重新搜索，
+        修改的行数很多时直接重新加载表格和汇总；日历只失效新旧日期所在的月份。"""
+        details_tab = self.view.details_tab
+        if len(changes) > self.BULK_PATCH_LIMIT:
+            self.refresh_transactions_table()
+            self.update_summary_display()
+        else:
+            # 每条修改都要应用，不能在第一个需要重新搜索的修改处短路
+            needs_search = [details_tab.apply_transaction_change(*change) for change in changes]
+            if any(needs_search):
+                self.search_transactions(details_tab.search_query())
+            if not details_tab.has_summary():
+                # 汇总还未加载，或正在加载的结果可能早于这次修改，重新获取
+                self.update_summary_display()
+        self.refresh_home_tab_categories()
+        months = self.daily_totals.invalidate_dates(
+            *(record[1] for change in changes for record in change if record is not None)
+        )
+        if self.view.calendar_tab is not None and self.view.calendar_tab.shown_month() in months:
+            self.show_calendar_month(*self.view.calendar_tab.shown_month())
+
+    def show_calendar_month(self, year, month):
+        """显示日历某个月的每日汇总，并在后台预取前后两个月。
+
+        已缓存的月份直接显示；未缓存时在后台用一条分组查询加载。
+        """
+        calendar_tab = self.view.calendar_tab
+        if calendar_tab is None:
+            return
+        block = self.daily_totals.cached(year, month)
+        if block is not None:
+            calendar_tab.show_month_totals(year, month, block)
+        else:
+            self.tasks.submit(
+                self.daily_totals.get_month, year, month, key="calendar",
+                on_result=lambda day_totals: calendar_tab.show_month_totals(year, month, day_totals)
+            )
+        self.tasks.submit(self.daily_totals.load_months, adjacent_months(year, month), key="calendar-prefetch")
 
     def update_summary_display(self):
-        """从模型获取汇总统计并更新视图中的标签。"""
-        total_income, total_expense, net_balance = self.model.get_summary_stats()
-        self.view.details_tab.update_summary_labels(total_income, total_expense, net_balance)
+        """在后台获取汇总统计并更新视图中的标签；新的请求会取代尚未完成的旧请求。"""
+        if self.view.details_tab is None:
+            return
+        self.view.details_tab.invalidate_summary()
+        self.tasks.submit(
+            self.model.get_summary_stats, key="summary",
+            on_result=lambda stats: self.view.details_tab.update_summary_labels(*stats)
+        )
 
     def submit_transaction(self):
-        """处理添加或更新交易的逻辑。"""
+        """处理添加或更新交易的逻辑。写入在后台执行，完成前禁用提交按钮防止重复提交。"""
         input_data = self.view.details_tab.get_input_data()
         if not input_data:
             return 
 
+        fields = (input_data['date'], input_data['description'], input_data['amount'], input_data['type'])
         if self.view.details_tab.editing_transaction_id is not None:
-            success, message = self.model.update_transaction(
-                self.view.details_tab.editing_transaction_id,
-                input_data['date'],
-                input_data['description'],
-                input_data['amount'],
-                input_data['type']
-            )
+            submitted = self._run_unit_of_work(
+                UnitOfWork.update, self.view.details_tab.editing_transaction_id, *fields,
+                category_id=input_data['category_id'], on_success=self._on_transaction_saved)
         else:
-            success, message = self.model.add_transaction(
-                input_data['date'],
-                input_data['description'],
-                input_data['amount'],
-                input_data['type']
-            )
+            submitted = self._run_unit_of_work(UnitOfWork.add, *fields, category_id=input_data['category_id'],
+                                               on_success=self._on_transaction_saved)
+        if submitted:
+            self.view.details_tab.submit_button.setEnabled(False)
 
-        if success:
-            self.view.show_message("成功", message)
-            self.view.details_tab.clear_input_fields()
-            self.refresh_transactions_table()
-            self.update_summary_display()
+    def _on_transaction_saved(self, message):
+        self.view.show_message("成功", message)
+        self.view.details_tab.clear_input_fields()
+
+    def _run_unit_of_work(self, work_fn, *args, on_success=None, **kwargs):
+        """在后台以一个工作单元 (单个事务) 执行 work_fn，成功后记入撤销日志并只刷新受影响的部分。
+
+        正在从快照恢复时不提交，返回 False: 恢复期间持有写锁，排在后面的修改会写进恢复后的数据。
+        """
+        if self._restore_running:
+            self.view.show_message("提示", "正在从快照恢复，请在恢复完成后再修改。", "warning")
+            return False
+        self._pending_writes += 1
+        self._update_undo_state()
+
+        def on_finished(outcome):
+            self._finish_write()
+            success, message, work = outcome
+            if not success:
+                self.view.show_message("错误", message, "critical")
+            elif not work.changes:
+                self.view.show_message("提示", "选定的交易已不存在 (可能已被删除或归档)，已归档的交易不能修改。",
+                                       "warning")
+                self.refresh_transactions_table()
+            else:
+                self.journal.record(message, work.journal)
+                self._update_undo_state()
+                self._refresh_after_changes(work.changes)
+                if on_success is not None:
+                    on_success(message)
+
+        def on_error(message):
+            self._finish_write()
+            self._on_task_error(message)
+
+        self.tasks.submit(self.model.run_unit_of_work, work_fn, *args,
+                          on_result=on_finished, on_error=on_error, **kwargs)
+        return True
+
+    def _finish_write(self):
+        self._pending_writes -= 1
+        if not self._pending_writes:
+            self.view.details_tab.submit_button.setEnabled(True)
+        self._update_undo_state()
+
+    def _update_undo_state(self):
+        if self.view.details_tab is None:
+            return
+        if self._pending_writes:
+            self.view.details_tab.set_undo_state(None, None)
         else:
-            self.view.show_message("错误", message, "critical")
+            self.view.details_tab.set_undo_state(self.journal.undo_label(), self.journal.redo_label())
 
-    def delete_selected_transaction(self):
-        """删除表格中选定的交易。"""
-        transaction_id = self.view.details_tab.get_selected_transaction_id()
-        if not transaction_id:
-            return 
+    def undo_last_change(self):
+        """在后台撤销最近一次修改。"""
+        self._replay_journal_entry(self.journal.pop_undo, self.journal.push_redo, reverse=True)
+
+    def redo_last_change(self):
+        """在后台重做最近一次撤销的修改。"""
+        self._replay_journal_entry(self.journal.pop_redo, self.journal.push_undo, reverse=False)
+
+    def _replay_journal_entry(self, pop_entry, push_entry, reverse):
+        if self._pending_writes or self._restore_running:
+            return
+        entry = pop_entry()
+        if entry is None:
+            return
+        self._pending_writes += 1
+        self._update_undo_state()
 
-        if self.view.confirm_action("确认删除", f"您确定要删除ID为 {transaction_id} 的交易记录吗？"):
-            success, message = self.model.delete_transaction(transaction_id)
+        def on_finished(outcome):
+            success, message, work = outcome
             if success:
-                self.view.show_message("成功", message)
-                self.refresh_transactions_table()
-                self.update_summary_display()
+                push_entry(entry)
+                self._refresh_after_changes(work.changes)
             else:
-                self.view.show_message("错误", message, "critical")
+                # 冲突的修改无法再撤销或重做，从日志中丢弃
+                self.view.show_message("错误", f"{message}\n\n该修改已从撤销记录中移除。", "critical")
+            self._finish_write()
+
+        def on_error(message):
+            self._finish_write()
+            self._on_task_error(message)
+
+        self.tasks.submit(self.model.replay_journal, entry[1], reverse, on_result=on_finished, on_error=on_error)
+
+    def _on_task_error(self, message):
+        if self.view.details_tab is not None:
+            self.view.details_tab.submit_button.setEnabled(True)
+        self.view.show_message("错误", message, "critical")
+
+    def delete_selected_transactions(self):
+        """在一个事务中删除表格中选定的所有交易。"""
+        transaction_ids = self.view.details_tab.get_selected_transaction_ids()
+        if not transaction_ids:
+            return 
+
+        if len(transaction_ids) == 1:
+            prompt = f"您确定要删除ID为 {transaction_ids[0]} 的交易记录吗？"
+        else:
+            prompt = f"您确定要删除选定的 {len(transaction_ids)} 条交易记录吗？"
+        if self.view.confirm_action("确认删除", prompt):
+            self._run_unit_of_work(UnitOfWork.delete_many, transaction_ids,
+                                   on_success=lambda message: self.view.show_message("成功", message))
+
+    def change_selected_transactions_type(self):
+        """把表格中选定的所有交易改为用户选择的收支类型，在一个事务中完成。"""
+        transaction_ids = self.view.details_tab.get_selected_transaction_ids()
+        if not transaction_ids:
+            return
+
+        types = ["支出", "收入"]
+        transaction_type, ok = QInputDialog.getItem(
+            self.view, "更改类型", f"把选定的 {len(transaction_ids)} 条交易改为:", types, 0, False
+        )
+        if ok:
+            self._run_unit_of_work(UnitOfWork.update_many, transaction_ids, transaction_type=transaction_type,
+                                   on_success=lambda message: self.view.show_message("成功", message))
 
     def start_edit_selected_transaction(self):
-        """准备编辑选定的交易。"""
+        """在后台读取选定的交易及其类别，完成后填入编辑表单；新的编辑请求会取代尚未完成的旧请求。"""
         transaction_id_str = self.view.details_tab.get_selected_transaction_id()
         if not transaction_id_str:
             return
@@ -93,12 +456,104 @@ class Controller:
             self.view.show_message("错误", "无效的交易ID。", "critical")
             return
 
-        transaction_to_edit = self.model.get_transaction_by_id(transaction_id)
-        
-        if transaction_to_edit:
-            self.view.details_tab.populate_form_for_edit(transaction_to_edit)
-        else:
-            self.view.show_message("错误", f"未找到ID为 {transaction_id} 的交易记录。", "critical")
+        model = self.model
+
+        def fetch():
+            transaction = model.get_transaction_by_id(transaction_id)
+            return transaction, model.get_transaction_category(transaction_id) if transaction else None
+
+        def on_finished(result):
+            transaction_to_edit, category_id = result
+            if transaction_to_edit:
+                self.view.details_tab.populate_form_for_edit(transaction_to_edit, category_id)
+            else:
+                self.view.show_message("错误", f"未找到ID为 {transaction_id} 的交易记录。", "critical")
+
+        self.tasks.submit(fetch, key="edit", on_result=on_finished, on_error=self._on_task_error)
+
+    def import_statement_file(self):
+        """选择 CSV / OFX 银行账单 (或导出的 CSV / JSON Lines 账本) 并在后台批量导入，导入过程中显示可取消的进度对话框。"""
+        path, _ = QFileDialog.getOpenFileName(
+            self.view, "导入账单", "", "银行账单 (*.csv *.ofx *.qfx);;导出的账本 (*.csv *.csv.gz *.jsonl *.jsonl.gz);;所有文件 (*)"
+        )
+        if not path:
+            return
+        from model.importer import import_statement # 只在导入时才加载解析器
+
+        progress = QProgressDialog("正在导入账单...", "取消", 0, 0, self.view)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        progress.canceled.connect(lambda: self.tasks.cancel("import"))
+        self.view.details_tab.import_button.setEnabled(False)
+
+        def on_progress(imported_count):
+            progress.setLabelText(f"已导入 {imported_count} 条交易...")
+
+        def on_finished(outcome):
+            progress.close()
+            self.view.details_tab.import_button.setEnabled(True)
+            success, message, errors = outcome
+            if success:
+                if errors:
+                    details = "\n".join(f"第 {line} 行: {reason}" for line, reason in errors[:20])
+                    message = f"{message}\n\n{details}"
+                self.view.show_message("成功", message, "warning" if errors else "information")
+                self.refresh_transactions_table()
+                self.update_summary_display()
+                self.daily_totals.clear()
+                if self.view.calendar_tab is not None:
+                    self.show_calendar_month(*self.view.calendar_tab.shown_month())
+            else:
+                self.view.show_message("错误", message, "critical")
+
+        def on_error(message):
+            progress.close()
+            self.view.details_tab.import_button.setEnabled(True)
+            self.view.show_message("错误", message, "critical")
+
+        # 取消后 TaskRunner 会丢弃结果，这里只需恢复按钮
+        progress.canceled.connect(lambda: self.view.details_tab.import_button.setEnabled(True))
+        self.tasks.submit(
+            import_statement, self.model, path, key="import",
+            on_result=on_finished, on_error=on_error, on_progress=on_progress
+        )
+
+    def export_ledger_file(self):
+        """选择导出文件并在后台流式导出全部交易和类别，导出过程中显示可取消的进度对话框。"""
+        path, _ = QFileDialog.getSaveFileName(
+            self.view, "导出账本", "pocketledger.csv",
+            "CSV (*.csv);;CSV gzip 压缩 (*.csv.gz);;JSON Lines (*.jsonl);;JSON Lines gzip 压缩 (*.jsonl.gz)"
+        )
+        if not path:
+            return
+        from model.exporter import export_ledger # 只在导出时才加载
+
+        progress = QProgressDialog("正在导出账本...", "取消", 0, 0, self.view)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        progress.canceled.connect(lambda: self.tasks.cancel("export"))
+        self.view.details_tab.export_button.setEnabled(False)
+
+        def on_progress(exported_count):
+            progress.setLabelText(f"已导出 {exported_count} 条交易...")
+
+        def on_finished(outcome):
+            progress.close()
+            self.view.details_tab.export_button.setEnabled(True)
+            success, message, _ = outcome
+            self.view.show_message("成功" if success else "错误", message, "information" if success else "critical")
+
+        def on_error(message):
+            progress.close()
+            self.view.details_tab.export_button.setEnabled(True)
+            self.view.show_message("错误", message, "critical")
+
+        # 取消后导出器会删除临时文件，TaskRunner 丢弃结果，这里只需恢复按钮
+        progress.canceled.connect(lambda: self.view.details_tab.export_button.setEnabled(True))
+        self.tasks.submit(
+            export_ledger, self.model, path, key="export",
+            on_result=on_finished, on_error=on_error, on_progress=on_progress
+        )
 
     def prompt_add_category(self):
         """弹出对话框让用户输入新类别的名称和类型，然后尝试添加。"""
@@ -117,10 +572,14 @@ class Controller:
         if not ok2:
             return # 用户取消
 
-        # 3. 调用模型添加类别
-        success, message = self.model.add_category(category_name, category_type)
+        # 3. 在后台调用模型添加类别，完成后显示结果
+        self.tasks.submit(
+            self.model.add_category, category_name, category_type,
+            on_result=self._on_category_added, on_error=self._on_task_error
+        )
 
-        # 4. 显示结果
+    def _on_category_added(self, outcome):
+        success, message = outcome
         if success:
             self.view.show_message("成功", message)
             self.refresh_home_tab_categories()
@@ -128,7 +587,207 @@ class Controller:
             self.view.show_message("错误", message, "critical")
 
     def refresh_home_tab_categories(self):
-        """从模型获取类别数据并更新首页标签页的显示。"""
+        """在后台获取所有类别及其本月的金额和笔数，更新首页卡片和明细页表单的类别下拉框。
+
+        金额来自触发器维护的按月汇总表，查询代价只与类别数量有关。
+        """
         if hasattr(self.view, 'home_tab') and hasattr(self.view.home_tab, 'update_category_cards'):
-            all_categories = self.model.get_categories() # 获取所有类别
-            self.view.home_tab.update_category_cards(all_categories)
+            self.tasks.submit(
+                self.model.get_category_month_totals, QDate.currentDate().toString("yyyy-MM"), key="categories",
+                on_result=self._show_categories
+            )
+
+    def _show_categories(self, categories):
+        self.view.home_tab.update_category_cards(categories)
+        if self.view.details_tab is not None:
+            self.view.details_tab.set_categories(categories)
+
+    def refresh_reports(self):
+        """在后台同步分析引擎并计算所选区间的报表。
+
+        第一次计算需要把账本加载为列式数组，之后只读取新增和变更的行，
+        因此每次切换到报表页都重新计算也很快。
+        """
+        reports_tab = self.view.reports_tab
+        if reports_tab is None:
+            return
+        if self.analytics is None:
+            try:
+                from model.analytics import LedgerAnalytics # 只在打开报表时才加载 numpy
+            except ImportError as e:
+                reports_tab.show_status(f"报表需要 numpy，请先安装 (pip install numpy): {e}")
+                return
+            self.analytics = LedgerAnalytics(self.model)
+            profiler.instrument(self.analytics, "LedgerAnalytics", ["refresh", "report"])
+        reports_tab.show_status("正在计算...")
+        date_from, date_to = reports_tab.selected_range()
+        self.tasks.submit(
+            self.analytics.report, date_from, date_to, self.REPORT_TOP_N, key="reports",
+            on_result=reports_tab.show_report,
+            on_error=lambda message: reports_tab.show_status(f"计算报表失败: {message}")
+        )
+
+    def refresh_archive_panel(self):
+        """在后台读取可以归档的年份和已归档的年份，刷新设置页的归档面板。"""
+        if self.view.settings_tab is None:
+            return
+        self.tasks.submit(
+            lambda: (self.model.get_archivable_years(), self.model.get_archives()), key="archives",
+            on_result=lambda state: self.view.settings_tab.set_archive_state(*state),
+            on_error=self._on_task_error
+        )
+
+    def archive_selected_year(self):
+        """确认后在后台把选中的年份移到归档文件。"""
+        settings_tab = self.view.settings_tab
+        year = settings_tab.selected_archive_year()
+        if year is None:
+            return
+        if not self.view.confirm_action(
+                "归档年份", f"确定要把 {year} 年的交易移到单独的归档文件吗？\n"
+                           "归档后这些交易仍会出现在列表、搜索和报表中，但不能再修改或删除。"):
+            return
+        settings_tab.archive_button.setEnabled(False)
+
+        def on_finished(outcome):
+            success, message, _ = outcome
+            self.view.show_message("成功" if success else "错误", message, "information" if success else "critical")
+            # 读取透明地覆盖归档，列表、汇总和日历显示的内容不变，只需刷新归档面板；
+            # 撤销日志中涉及已归档交易的修改在撤销时会被检测为冲突
+            self.refresh_archive_panel()
+
+        def on_error(message):
+            self._on_task_error(message)
+            self.refresh_archive_panel()
+
+        self.tasks.submit(self.model.archive_year, year, on_result=on_finished, on_error=on_error)
+
+    def _set_auto_backup_enabled(self, enabled):
+        self.auto_backup_enabled = enabled
+
+    def _set_backup_interval(self, hours):
+        self.backup_interval_hours = hours
+
+    def _set_backup_keep(self, keep):
+        self.backup_keep = keep
+
+    def _set_backup_busy(self, busy, status=""):
+        if self.view.settings_tab is not None:
+            self.view.settings_tab.set_backup_busy(busy, status)
+
+    def refresh_snapshot_list(self):
+        """列出当前账本的快照 (只读取目录，不打开数据库)。"""
+        if self.view.settings_tab is not None:
+            self.view.settings_tab.set_snapshots(list_snapshots(self.model.database_file))
+
+    def _run_scheduled_backup(self):
+        """自动备份开启并且最新的快照已经超过备份间隔时，在后台创建快照。"""
+        if not self.auto_backup_enabled or self._backup_running or self._restore_running:
+            return
+        snapshots = list_snapshots(self.model.database_file)
+        if snapshots and datetime.datetime.now() - snapshots[0][1] < datetime.timedelta(hours=self.backup_interval_hours):
+            return
+        self.backup_now(scheduled=True)
+
+    def backup_now(self, scheduled=False):
+        """在后台为当前账本创建快照并轮换旧快照，进度显示在设置页。
+
+        备份不持有写锁，期间可以照常修改数据。自动备份成功时只更新状态文本，失败时才弹出提示。
+        """
+        if self._backup_running or self._restore_running:
+            return
+        self._backup_running = True
+        self._set_backup_busy(True, "正在备份...")
+
+        def on_progress(progress):
+            copied_pages, total_pages = progress
+            self._set_backup_busy(True, f"正在备份... {copied_pages * 100 // max(total_pages, 1)}%")
+
+        def on_finished(outcome):
+            self._backup_running = False
+            success, message, _ = outcome
+            self._set_backup_busy(False, message)
+            self.refresh_snapshot_list()
+            if not success or not scheduled:
+                self.view.show_message("成功" if success else "错误", message, "information" if success else "critical")
+
+        def on_error(message):
+            self._backup_running = False
+            self._set_backup_busy(False)
+            self.view.show_message("错误", f"备份失败: {message}", "critical")
+
+        self.tasks.submit(create_snapshot, self.model.database_file, self.backup_keep, key="backup",
+                          on_result=on_finished, on_error=on_error, on_progress=on_progress)
+
+    def restore_selected_snapshot(self):
+        """确认后在后台用选中的快照覆盖当前账本，恢复前当前数据会另存为一份快照。"""
+        path = self.view.settings_tab.selected_snapshot_path()
+        if path is None:
+            self.view.show_message("提示", "请先在列表中选择要恢复的快照。", "warning")
+            return
+        if self._backup_running or self._restore_running or self._pending_writes:
+            self.view.show_message("提示", "有备份或修改正在进行，请稍后再恢复。", "warning")
+            return
+        if not self.view.confirm_action(
+                "恢复快照", f"确定要用快照 {os.path.basename(path)} 覆盖当前账本吗？\n"
+                           "恢复前当前的数据会另存为一份快照。"):
+            return
+        self._restore_running = True
+        self._set_backup_busy(True, "正在恢复...")
+
+        def on_progress(progress):
+            copied_pages, total_pages = progress
+            self._set_backup_busy(True, f"正在恢复... {copied_pages * 100 // max(total_pages, 1)}%")
+
+        def on_finished(outcome):
+            self._restore_running = False
+            success, message = outcome
+            self._set_backup_busy(False, message)
+            self.view.show_message("成功" if success else "错误", message, "information" if success else "critical")
+            if success:
+                self._reload_all_views()
+            self.refresh_snapshot_list()
+
+        def on_error(message):
+            self._restore_running = False
+            self._set_backup_busy(False)
+            self.view.show_message("错误", f"恢复失败: {message}", "critical")
+
+        # 恢复使用单独的 key: 新的备份请求、切换账本和退出程序取消的是 "backup"，不会中断恢复
+        self.tasks.submit(restore_snapshot, self.model, path, key="restore",
+                          on_result=on_finished, on_error=on_error, on_progress=on_progress)
+
+    def _on_tab_changed(self, index):
+        current_tab = self.view.current_tab_name()
+        if current_tab == "settings_tab":
+            self._refresh_profile_panel()
+            self.profile_timer.start()
+        else:
+            self.profile_timer.stop()
+        if current_tab == "reports_tab":
+            self.refresh_reports()
+
+    def _refresh_profile_panel(self):
+        self.view.settings_tab.update_profile(profiler.snapshot())
+
+    def _set_profiling_enabled(self, enabled):
+        profiler.enabled = enabled
+
+    def _set_slow_threshold(self, threshold_ms):
+        profiler.slow_threshold_ms = threshold_ms
+
+    def _reset_profile(self):
+        profiler.reset()
+        self._refresh_profile_panel()
+
+    def export_profile(self):
+        """把性能统计导出为 JSON 文件，供离线分析。"""
+        path, _ = QFileDialog.getSaveFileName(self.view, "导出性能数据", "pocketledger-profile.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            profiler.dump_json(path)
+        except OSError as e:
+            self.view.show_message("错误", f"导出性能数据失败: {e}", "critical")
+            return
+        self.view.show_message("成功", f"性能数据已导出到 {path}。")
@@ -0,0 +1,146 @@
+import itertools
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+# 后台执行层: 把 TransactionModel 的调用放到 QThreadPool 中执行，结果通过 Qt 信号
+# 以排队连接的方式回到界面线程，界面线程只负责更新控件。
+
+class _TaskSignals(QObject):
+    """QRunnable 不是 QObject，信号需要挂在单独的对象上。"""
+    finished = Signal(int, object)  # task_id, 返回值
+    failed = Signal(int, str)  # task_id, 错误信息
+    progress = Signal(int, object)  # task_id, 进度值
+
+
+class _Task(QRunnable):
+    def __init__(self, task_id, fn, args, kwargs, signals, thread_cleanup=None):
+        super().__init__()
+        self.task_id = task_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = signals
+        self.thread_cleanup = thread_cleanup
+        self.cancelled = False
+
+    def report_progress(self, value):
+        """作为 progress_callback 传给模型方法；任务被取消后返回 False 让模型中止。"""
+        self.signals.progress.emit(self.task_id, value)
+        return not self.cancelled
+
+    def run(self):
+        if self.cancelled:
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(self.task_id, str(e))
+        else:
+            self.signals.finished.emit(self.task_id, result)
+        finally:
+            if self.thread_cleanup is not None:
+                self.thread_cleanup()
+
+
+class TaskRunner(QObject):
+    """在线程池中运行函数，并在界面线程中回调 on_result / on_error / on_progress。
+
+    提交任务时可以指定 key: 同一 key 的新任务会取代旧任务——尚未开始的旧任务直接
+    从队列中移除，已经在运行的旧任务被标记为取消，其结果被丢弃。这样连续的刷新请求
+    只有最后一次会更新界面。
+
+    thread_cleanup 在每个任务结束后于其工作线程中调用，用于释放线程局部的资源
+    (如 TransactionModel.release_reader)；线程池的线程每次运行任务时线程局部状态都是新的。
+    """
+    def __init__(self, max_threads=4, parent=None, thread_cleanup=None):
+        super().__init__(parent)
+        self.thread_cleanup = thread_cleanup
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._signals = _TaskSignals(self)
+        self._signals.finished.connect(self._on_finished)
+        self._signals.failed.connect(self._on_failed)
+        self._signals.progress.connect(self._on_progress)
+        self._ids = itertools.count(1)
+        self._tasks = {}  # task_id -> (task, key, on_result, on_error, on_progress)
+        self._latest = {}  # key -> 最新的 task_id
+
+    def submit(self, fn, *args, key=None, on_result=None, on_error=None, on_progress=None, **kwargs):
+        """提交 fn(*args, **kwargs) 到线程池，返回任务 ID。
+
+        指定 on_progress 时会以 progress_callback 关键字参数把进度回调传给 fn。
+        """
+        task_id = next(self._ids)
+        task = _Task(task_id, fn, args, kwargs, self._signals, self.thread_cleanup)
+        task.setAutoDelete(False)
+        if on_progress is not None:
+            kwargs["progress_callback"] = task.report_progress
+        if key is not None:
+            self.cancel(key)
+            self._latest[key] = task_id
+        self._tasks[task_id] = (task, key, on_result, on_error, on_progress)
+        self.pool.start(task)
+        return task_id
+
+    def cancel(self, key):
+        """取消 key 对应的最新任务 (如果还未完成)。"""
+        task_id = self._latest.pop(key, None)
+        entry = self._tasks.get(task_id)
+        if entry is None:
+            return
+        task = entry[0]
+        task.cancelled = True
+        if self.pool.tryTake(task):
+            del self._tasks[task_id]
+
+    def clear(self, keep=()):
+        """移除所有尚未开始的任务及其回调 (用于切换账本和退出程序前)，key 在 keep 中的任务除外。
+
+        正在运行的任务不受影响，结束后照常回调，并且仍可以按 key 取消。
+        """
+        for task_id, (task, key, *_) in list(self._tasks.items()):
+            if key in keep:
+                continue
+            if self.pool.tryTake(task):
+                del self._tasks[task_id]
+                if key is not None and self._latest.get(key) == task_id:
+                    del self._latest[key]
+
+    def wait_for_done(self, msecs=-1):
+        """等待所有已提交的任务结束 (用于退出程序前)。"""
+        return self.pool.waitForDone(msecs)
+
+    def _pop(self, task_id):
+        entry = self._tasks.pop(task_id, None)
+        if entry is None:
+            return None
+        task, key, on_result, on_error, _ = entry
+        if key is not None:
+            if self._latest.get(key) != task_id:
+                return None  # 已被更新的同 key 任务取代
+            del self._latest[key]
+        if task.cancelled:
+            return None
+        return on_result, on_error
+
+    @Slot(int, object)
+    def _on_finished(self, task_id, result):
+        callbacks = self._pop(task_id)
+        if callbacks and callbacks[0] is not None:
+            callbacks[0](result)
+
+    @Slot(int, str)
+    def _on_failed(self, task_id, message):
+        callbacks = self._pop(task_id)
+        if callbacks is None:
+            return
+        if callbacks[1] is not None:
+            callbacks[1](message)
+        else:
+            print(f"后台任务失败: {message}")
+
+    @Slot(int, object)
+    def _on_progress(self, task_id, value):
+        entry = self._tasks.get(task_id)
+        if entry is not None and not entry[0].cancelled and entry[4] is not None:
+            entry[4](value)
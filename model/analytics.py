@@ -0,0 +1,192 @@
+import threading
+
+import numpy as np
+
+# 报表使用的列式分析引擎: 把账本加载为紧凑的 NumPy 数组 (天数 int32、以分计的金额
+# int64、类型和类别编码为小整数)，月/周汇总、余额曲线和类别排行都用向量化运算完成。
+# 之后的刷新只读取新增的行和变更日志中记录的修改/删除，不再重新加载整个账本。
+# 类别排行按交易关联的类别统计，未关联类别的交易按描述归类。
+
+TYPE_INCOME = 0
+TYPE_EXPENSE = 1
+
+
+def to_day(date_string):
+    """把 yyyy-MM-dd 转换为 1970-01-01 起的天数。"""
+    return int(np.datetime64(date_string, "D").astype(np.int64))
+
+
+class LedgerAnalytics:
+    """维护账本的列式副本并计算报表数据。
+
+    数组按交易 ID 升序排列，因此可以用二分查找定位被修改或删除的行。所有公开方法
+    持有同一把锁，可在后台线程中调用。
+    """
+    LOAD_BATCH_SIZE = 50000
+    # 一次刷新中变更的行数超过账本的这个比例时直接全量重新加载
+    FULL_RELOAD_RATIO = 0.2
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._change_seq = 0
+        self._clear()
+
+    def _clear(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.days = np.empty(0, dtype=np.int32)
+        self.amounts = np.empty(0, dtype=np.int64)
+        self.types = np.empty(0, dtype=np.int8)
+        self.categories = np.empty(0, dtype=np.int32)
+        self._category_codes = {}  # 类别名 -> 编码，按插入顺序编码，因此 list(...) 即为编码表
+
+    def __len__(self):
+        return len(self.ids)
+
+    def refresh(self):
+        """把数组同步到数据库的当前状态，返回本次新增或变更的行数。"""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self):
+        # 先读取变更日志的位置再读数据: 这之间发生的修改会在下次刷新时重复应用，结果不变
+        latest_seq, changed_ids = self.model.get_changes_since(self._change_seq)
+        if not self._loaded or changed_ids is None:
+            self._clear()
+            self._change_seq = latest_seq
+            count = self._append(0)
+            self._loaded = True
+            return count
+
+        max_id = int(self.ids[-1]) if len(self.ids) else 0
+        changed_ids = [transaction_id for transaction_id in changed_ids if transaction_id <= max_id]
+        if len(changed_ids) > max(len(self.ids) * self.FULL_RELOAD_RATIO, self.LOAD_BATCH_SIZE):
+            self._loaded = False
+            return self._refresh()
+        self._change_seq = latest_seq
+        if changed_ids:
+            self._apply_changes(changed_ids)
+        return len(changed_ids) + self._append(max_id)
+
+    def _columns(self, rows):
+        ids, days, amounts, types, descriptions = zip(*rows)
+        codes = self._category_codes
+        return (
+            np.fromiter(ids, dtype=np.int64, count=len(rows)),
+            np.fromiter(days, dtype=np.int32, count=len(rows)),
+            np.fromiter(amounts, dtype=np.int64, count=len(rows)),
+            np.fromiter(types, dtype=np.int8, count=len(rows)),
+            np.fromiter((codes.setdefault(label or "", len(codes)) for label in descriptions),
+                        dtype=np.int32, count=len(rows)),
+        )
+
+    def _append(self, after_id):
+        batches = [self._columns(rows) for rows in
+                   self.model.iter_analytics_rows(after_id, self.LOAD_BATCH_SIZE)]
+        if not batches:
+            return 0
+        columns = [np.concatenate([current] + [batch[index] for batch in batches])
+                   for index, current in enumerate(
+                       (self.ids, self.days, self.amounts, self.types, self.categories))]
+        self.ids, self.days, self.amounts, self.types, self.categories = columns
+        return sum(len(batch[0]) for batch in batches)
+
+    def _apply_changes(self, changed_ids):
+        changed = np.unique(np.asarray(changed_ids, dtype=np.int64))
+        rows = self.model.get_analytics_rows(changed.tolist())
+        columns = self._columns(sorted(rows)) if rows else None
+        ids = columns[0] if rows else np.empty(0, dtype=np.int64)
+        positions = np.searchsorted(self.ids, ids)
+        if len(ids) == len(changed) and np.array_equal(self.ids[np.minimum(positions, len(self.ids) - 1)], ids):
+            # 只有修改: 原地更新
+            self.days[positions], self.amounts[positions], self.types[positions], self.categories[positions] = (
+                columns[1:])
+            return
+        # 有删除，或以旧 ID 重新插入的行 (撤销删除): 去掉所有变更的行，再按 ID 插回仍存在的行
+        keep = ~np.isin(self.ids, changed)
+        current = [column[keep] for column in (self.ids, self.days, self.amounts, self.types, self.categories)]
+        if rows:
+            positions = np.searchsorted(current[0], ids)
+            current = [np.insert(column, positions, values) for column, values in zip(current, columns)]
+        self.ids, self.days, self.amounts, self.types, self.categories = current
+
+    def report(self, date_from=None, date_to=None, top_n=10):
+        """刷新数组后计算 [date_from, date_to] 区间 (闭区间，yyyy-MM-dd，可为 None) 的报表。
+
+        金额均为以分计的整数。返回字典:
+            totals: {"income", "expense", "count", "opening_balance", "closing_balance"}
+            months: [(yyyy-MM, 收入, 支出, 月末余额)]
+            weeks: [(周一日期 yyyy-MM-dd, 收入, 支出, 周末余额)]
+            top_categories: [(类别, 支出, 笔数)]，按支出降序
+        余额从账本的第一笔交易开始累计，区间之前的交易计入期初余额。
+        """
+        with self._lock:
+            self._refresh()
+            return self._report(date_from, date_to, top_n)
+
+    def _report(self, date_from, date_to, top_n):
+        days, amounts, types = self.days, self.amounts, self.types
+        mask = np.ones(len(days), dtype=bool)
+        opening_balance = 0
+        if date_from:
+            start = to_day(date_from)
+            mask &= days >= start
+            before = days < start
+            opening_balance = int(np.where(types[before] == TYPE_EXPENSE, -amounts[before], amounts[before]).sum())
+        if date_to:
+            mask &= days <= to_day(date_to)
+        days, amounts, types = days[mask], amounts[mask], types[mask]
+        expense = types == TYPE_EXPENSE
+        total_expense = int(amounts[expense].sum())
+        total_income = int(amounts.sum()) - total_expense
+        report = {
+            "totals": {"income": total_income, "expense": total_expense, "count": int(len(days)),
+                       "opening_balance": opening_balance,
+                       "closing_balance": opening_balance + total_income - total_expense},
+            "months": [], "weeks": [], "top_categories": [],
+        }
+        if not len(days):
+            return report
+
+        months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        first_month = int(months.min())
+        month_income, month_expense = self._split_by_type(months - first_month, amounts, types)
+        month_net = month_income - month_expense
+        month_balance = opening_balance + np.cumsum(month_net)
+        month_labels = np.datetime_as_string(
+            np.arange(first_month, first_month + len(month_net)).astype("datetime64[M]"))
+        report["months"] = list(zip(month_labels.tolist(), month_income.tolist(),
+                                    month_expense.tolist(), month_balance.tolist()))
+
+        # 1970-01-01 是星期四，(day + 3) // 7 得到以星期一开始的周序号
+        weeks = (days.astype(np.int64) + 3) // 7
+        first_week = int(weeks.min())
+        week_income, week_expense = self._split_by_type(weeks - first_week, amounts, types)
+        week_labels = np.datetime_as_string(
+            (np.arange(first_week, first_week + len(week_income)) * 7 - 3).astype("datetime64[D]"))
+        week_balance = opening_balance + np.cumsum(week_income - week_expense)
+        report["weeks"] = list(zip(week_labels.tolist(), week_income.tolist(),
+                                   week_expense.tolist(), week_balance.tolist()))
+
+        if top_n:
+            categories = self.categories[mask][expense]
+            size = len(self._category_codes)
+            category_totals = np.bincount(categories, weights=amounts[expense], minlength=size)
+            category_counts = np.bincount(categories, minlength=size)
+            top = np.argsort(-category_totals, kind="stable")[:top_n]
+            labels = list(self._category_codes)
+            report["top_categories"] = [
+                (labels[code], int(round(category_totals[code])), int(category_counts[code]))
+                for code in top.tolist() if category_counts[code]
+            ]
+        return report
+
+    @staticmethod
+    def _split_by_type(bins, amounts, types):
+        """按 bins 分组分别汇总收入和支出，返回两个 int64 数组。"""
+        size = int(bins.max()) + 1
+        # bincount 的权重按 float64 累加，金额 (分) 的和低于 2**53 时结果是精确的
+        sums = np.bincount(bins * 2 + types, weights=amounts, minlength=size * 2)
+        sums = np.rint(sums).astype(np.int64).reshape(size, 2)
+        return sums[:, TYPE_INCOME], sums[:, TYPE_EXPENSE]
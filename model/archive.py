@@ -0,0 +1,117 @@
+import contextlib
+import heapq
+import os
+import sqlite3
+from collections import OrderedDict
+
+# 冷数据归档: 已经结束的年份可以整体移到主数据库旁边的年度文件 (pocketledger.2019.db 等)，
+# 主数据库只保留当前的热数据，日常的增删改、分页和汇总只涉及这个小文件。
+# 查询需要时才把年度文件 ATTACH 到读连接上，作为 archive_<年份> 模式查询；
+# 日期范围与某个年份不相交时，该年份的文件不会被打开。归档的交易只读。
+
+# 每个连接同时附加的归档文件上限 (SQLite 默认最多附加 10 个数据库)，超过时分离最久未用的。
+# 查询只在执行语句期间占用归档，读取任意多个年份的查询都逐个附加，不受这个上限限制
+MAX_ATTACHED_ARCHIVES = 8
+
+def archive_file_name(database_file, year):
+    """返回 year 的归档文件名 (不含目录)，例如 pocketledger.db -> pocketledger.2019.db。"""
+    root, extension = os.path.splitext(os.path.basename(database_file))
+    return f"{root}.{int(year)}{extension or '.db'}"
+
+def archive_schema(year):
+    """返回归档文件附加到连接时使用的模式名。"""
+    return f"archive_{int(year)}"
+
+def year_bounds(year):
+    """返回 year 的首尾日期 (yyyy-MM-dd)。"""
+    return f"{int(year):04d}-01-01", f"{int(year):04d}-12-31"
+
+def year_in_range(year, date_from=None, date_to=None):
+    """year 是否与闭区间 [date_from, date_to] 相交，未指定的一端不限。"""
+    first_day, last_day = year_bounds(year)
+    return (not date_from or last_day >= date_from) and (not date_to or first_day <= date_to)
+
+def create_archive_tables(conn, schema):
+    """在附加为 schema 的归档文件中创建交易表和分页索引 (已存在时不做任何事)。
+
+    列与主数据库的 transactions 相同，ID 原样保留；类别ID不设外键，类别被删除后由查询忽略。
+    """
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.transactions (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            description TEXT,
+            amount INTEGER NOT NULL CHECK(typeof(amount) = 'integer'),
+            currency TEXT NOT NULL DEFAULT 'CNY',
+            type TEXT NOT NULL CHECK(type IN ('收入', '支出')),
+            category_id INTEGER
+        )
+    ''')
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_date_id "
+                 "ON transactions (date DESC, id DESC)")
+
+class AttachedArchives:
+    """记录一个连接上已附加的归档文件，按最近使用排序，超过上限时分离最久未用的。
+
+    正在 using() 块中使用的归档不会被分离。只能在使用该连接的线程中使用。
+    """
+    def __init__(self, conn, directory, max_attached=MAX_ATTACHED_ARCHIVES):
+        self.conn = conn
+        self.directory = directory
+        self.max_attached = max_attached
+        self._attached = OrderedDict()
+        self._pins = {}  # year -> 正在使用它的 using() 块数
+
+    @contextlib.contextmanager
+    def using(self, year, file_name):
+        """确保 year 的归档已附加并在 with 块内固定，生成其模式名。"""
+        schema = self.schema(year, file_name)
+        self._pins[year] = self._pins.get(year, 0) + 1
+        try:
+            yield schema
+        finally:
+            self._pins[year] -= 1
+            if not self._pins[year]:
+                del self._pins[year]
+
+    def schema(self, year, file_name):
+        """确保 year 的归档文件已附加，返回其模式名。
+
+        文件不存在，或已达上限而附加的归档都在使用中时抛出 sqlite3.OperationalError。
+        返回的模式名在下一次附加其他归档时可能被分离，跨语句使用时应改用 using()。
+        """
+        if year in self._attached:
+            self._attached.move_to_end(year)
+            return self._attached[year]
+        path = os.path.join(self.directory, file_name)
+        # ATTACH 一个不存在的文件会创建空数据库，先检查
+        if not os.path.exists(path):
+            raise sqlite3.OperationalError(f"归档文件不存在: {path}")
+        if len(self._attached) >= self.max_attached:
+            self._detach_least_recent()
+        schema = archive_schema(year)
+        self.conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        self._attached[year] = schema
+        return schema
+
+    def _detach_least_recent(self):
+        # 固定的归档和仍有语句在读取的归档 (SQLite 拒绝分离) 都跳过，分离下一个
+        for year, schema in list(self._attached.items()):
+            if year in self._pins:
+                continue
+            try:
+                self.conn.execute(f"DETACH DATABASE {schema}")
+            except sqlite3.OperationalError:
+                continue
+            del self._attached[year]
+            return
+        raise sqlite3.OperationalError(f"同时使用的归档文件超过 {self.max_attached} 个，无法再附加")
+
+def merge_sorted(partitions, key, reverse=False):
+    """合并多个已按 key 排序的行序列，key 相同的行只保留第一个 (归档中断时可能有重复)。"""
+    previous = object()
+    for row in heapq.merge(*partitions, key=key, reverse=reverse):
+        current = key(row)
+        if current != previous:
+            yield row
+            previous = current
@@ -0,0 +1,177 @@
+import datetime
+import os
+import sqlite3
+
+# 在线备份: 用 SQLite 的备份 API 把正在使用的数据库分步复制到快照文件，可以在后台线程中执行。
+# 备份连接在整个复制期间持有一个读事务: WAL 模式下读事务不阻塞写入，其他连接照常提交，
+# 而备份看到的始终是开始时的一致快照，不会因为源数据库被修改而从头重来。备份不获取写锁。
+# 每一步只复制 pages_per_step 页，执行期间释放 GIL，步与步之间检查是否被取消。
+# 快照先写到临时文件，通过完整性检查后才改名为正式文件，并按保留份数轮换旧快照。
+# 账本的年度归档文件 (见 model.archive) 只在归档时写入一次，不包含在快照中。
+
+BACKUP_DIRECTORY = "backups"
+# 每一步复制的页数 (默认页大小 4KB 时约 4MB)
+PAGES_PER_STEP = 1024
+# 某一步遇到数据库忙或被锁时，重试前等待的秒数 (sqlite3 默认为 0.25 秒)
+STEP_RETRY_SLEEP = 0.005
+# 默认保留的快照份数
+DEFAULT_KEEP = 7
+
+# 快照名中的创建时间精确到微秒，连续创建的快照 (如恢复前紧接着备份的快照) 不会重名
+_TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S-%f"
+# 较早的快照名只精确到秒
+_TIMESTAMP_FORMATS = (_TIMESTAMP_FORMAT, "%Y%m%d-%H%M%S")
+
+class BackupCancelled(Exception):
+    """备份被进度回调取消。"""
+
+def backup_directory(database_file):
+    """返回数据库的快照目录: 数据库所在目录下的 backups。"""
+    return os.path.join(os.path.dirname(os.path.abspath(database_file)), BACKUP_DIRECTORY)
+
+def _snapshot_prefix(database_file):
+    return os.path.splitext(os.path.basename(database_file))[0] + "-"
+
+def list_snapshots(database_file):
+    """返回数据库的快照 [(路径, 创建时间, 字节数)]，最新的在前。未完成的临时文件不在其中。"""
+    directory = backup_directory(database_file)
+    prefix = _snapshot_prefix(database_file)
+    snapshots = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    for name in names:
+        if not (name.startswith(prefix) and name.endswith(".db")):
+            continue
+        created = _parse_timestamp(name[len(prefix):-3])
+        if created is None:
+            continue  # 名称相同前缀的其他账本的快照
+        path = os.path.join(directory, name)
+        snapshots.append((path, created, os.path.getsize(path)))
+    snapshots.sort(key=lambda snapshot: snapshot[1], reverse=True)
+    return snapshots
+
+def _parse_timestamp(text):
+    for timestamp_format in _TIMESTAMP_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, timestamp_format)
+        except ValueError:
+            pass
+    return None
+
+def _reserve_snapshot_path(database_file):
+    """返回一个尚未使用的快照路径，并创建其临时文件占住这个名称。"""
+    directory = backup_directory(database_file)
+    created = datetime.datetime.now()
+    while True:
+        path = os.path.join(directory, f"{_snapshot_prefix(database_file)}{created.strftime(_TIMESTAMP_FORMAT)}.db")
+        if not os.path.exists(path):
+            try:
+                # 时钟精度不到微秒时可能与刚创建的快照同名，独占创建失败就顺延一微秒
+                with open(path + ".part", "x"):
+                    return path
+            except FileExistsError:
+                pass
+        created += datetime.timedelta(microseconds=1)
+
+def verify_snapshot(path):
+    """对快照执行完整性检查，返回 (ok, message)。"""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            results = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return False, f"无法读取快照 {os.path.basename(path)}: {e}"
+    if results != ["ok"]:
+        return False, f"快照 {os.path.basename(path)} 未通过完整性检查: {'; '.join(results[:3])}"
+    return True, f"快照 {os.path.basename(path)} 完整性检查通过。"
+
+def copy_database(source_conn, target_conn, pages_per_step=PAGES_PER_STEP, progress_callback=None):
+    """用备份 API 把 source_conn 的数据库分步复制到 target_conn。
+
+    progress_callback((copied_pages, total_pages)) 在每一步之后调用，返回 False 时抛出 BackupCancelled。
+    """
+    def on_step(status, remaining, total):
+        if progress_callback is not None and progress_callback((total - remaining, total)) is False:
+            raise BackupCancelled()
+    source_conn.backup(target_conn, pages=pages_per_step, progress=on_step, sleep=STEP_RETRY_SLEEP)
+
+def create_snapshot(database_file, keep=DEFAULT_KEEP, pages_per_step=PAGES_PER_STEP, progress_callback=None):
+    """为 database_file 创建一个经过校验的快照，返回 (success, message, snapshot_path)。
+
+    progress_callback((copied_pages, total_pages)) 在每一步之后调用，返回 False 时取消。
+    keep 不为 None 时，成功后只保留最新的 keep 份快照。
+    """
+    try:
+        os.makedirs(backup_directory(database_file), exist_ok=True)
+        path = _reserve_snapshot_path(database_file)
+    except OSError as e:
+        return False, f"备份失败: {e}", None
+    partial_path = path + ".part"
+    try:
+        source = sqlite3.connect(f"file:{os.path.abspath(database_file)}?mode=ro", uri=True, timeout=5,
+                                 isolation_level=None)
+        target = sqlite3.connect(partial_path)
+        try:
+            # 读事务在复制完成前一直保持，各步读取的是同一个快照
+            source.execute("BEGIN")
+            source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            copy_database(source, target, pages_per_step, progress_callback)
+            source.execute("COMMIT")
+            # 快照不使用 WAL，单个文件即可完整复制或恢复
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+            source.close()
+        ok, message = verify_snapshot(partial_path)
+        if not ok:
+            _remove(partial_path)
+            return False, message, None
+        os.replace(partial_path, path)
+    except BackupCancelled:
+        _remove(partial_path)
+        return False, "备份已取消。", None
+    except (OSError, sqlite3.Error) as e:
+        _remove(partial_path)
+        return False, f"备份失败: {e}", None
+    removed = rotate_snapshots(database_file, keep) if keep is not None else []
+    suffix = f"，已删除 {len(removed)} 份旧快照" if removed else ""
+    return True, f"已备份到 {path}{suffix}。", path
+
+def rotate_snapshots(database_file, keep):
+    """只保留最新的 keep 份快照，返回被删除的快照路径。"""
+    removed = []
+    for path, _, _ in list_snapshots(database_file)[max(keep, 1):]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"删除旧快照 {path} 时出错: {e}")
+            continue
+        removed.append(path)
+    return removed
+
+def restore_snapshot(model, snapshot_path, progress_callback=None):
+    """校验快照，为当前数据库另存一份快照后，用 snapshot_path 覆盖 model 打开的数据库。
+
+    返回 (success, message)。另存的快照不参与本次轮换，恢复后仍可以再恢复回来。
+    """
+    ok, message = verify_snapshot(snapshot_path)
+    if not ok:
+        return False, message
+    success, message, safety_path = create_snapshot(model.database_file, keep=None)
+    if not success:
+        return False, f"恢复前备份当前数据库失败: {message}"
+    success, message = model.restore_from_snapshot(snapshot_path, progress_callback=progress_callback)
+    if success:
+        message += f" 恢复前的数据已备份到 {safety_path}。"
+    return success, message
+
+def _remove(path):
+    for leftover in (path, path + "-journal"):
+        try:
+            os.remove(leftover)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+
+# 日历页使用的按月缓存: 每个月的每日汇总作为一个块缓存，翻到已缓存的月份时
+# 不再查询数据库。交易增删改后只失效该交易新旧日期所在的月份。
+
+
+def month_of(date_string):
+    """返回 yyyy-MM-dd 所在的 (year, month)。"""
+    return int(date_string[:4]), int(date_string[5:7])
+
+
+def adjacent_months(year, month):
+    """返回 (year, month) 的上一个月和下一个月。"""
+    previous_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return previous_month, next_month
+
+
+def contiguous_runs(months):
+    """把 (year, month) 按时间顺序分成若干段连续的月份，返回 [(第一个月, 最后一个月)]。"""
+    runs = []
+    for key in sorted(set(months)):
+        if runs and adjacent_months(*runs[-1][1])[1] == key:
+            runs[-1] = (runs[-1][0], key)
+        else:
+            runs.append((key, key))
+    return runs
+
+
+class DailyTotalsCache:
+    """以月为单位缓存 TransactionModel.get_daily_totals 的结果，按 LRU 淘汰。
+
+    每个块是 {yyyy-MM-dd: (收入, 支出, 笔数)}。可在多个线程中同时使用: 查询在锁外
+    执行，查询期间该月被失效时丢弃查询结果，避免把过期数据放入缓存。
+    """
+    MAX_CACHED_MONTHS = 36
+
+    def __init__(self, model, max_months=MAX_CACHED_MONTHS):
+        self.model = model
+        self.max_months = max_months
+        self._blocks = OrderedDict()
+        self._generations = {}  # 每个月被失效的次数，用于识别过期的查询结果
+        self._epoch = 0  # clear() 的次数
+        self._lock = threading.Lock()
+
+    def cached(self, year, month):
+        """返回已缓存的月份块，未缓存时返回 None。"""
+        with self._lock:
+            block = self._blocks.get((year, month))
+            if block is not None:
+                self._blocks.move_to_end((year, month))
+            return block
+
+    def get_month(self, year, month):
+        """返回 (year, month) 的每日汇总块，未缓存时查询数据库。"""
+        block = self.cached(year, month)
+        if block is None:
+            block = self.load_months([(year, month)])[(year, month)]
+        return block
+
+    def load_months(self, months):
+        """加载 months 中尚未缓存的月份，返回 {(year, month): block}。
+
+        每段连续的未缓存月份用一条分组查询加载，不会重新读取夹在中间的已缓存月份。
+        """
+        result = {}
+        missing = []
+        for key in months:
+            block = self.cached(*key)
+            if block is None:
+                missing.append(key)
+            else:
+                result[key] = block
+        if not missing:
+            return result
+        with self._lock:
+            epoch = self._epoch
+            generations = {key: self._generations.get(key, 0) for key in missing}
+        blocks = {key: {} for key in missing}
+        for first, last in contiguous_runs(missing):
+            rows = self.model.get_daily_totals(f"{first[0]:04d}-{first[1]:02d}-01",
+                                               f"{last[0]:04d}-{last[1]:02d}-31")
+            for date, income, expense, count in rows:
+                block = blocks.get(month_of(date))
+                if block is not None:
+                    block[date] = (income, expense, count)
+        with self._lock:
+            for key, block in blocks.items():
+                if self._epoch == epoch and self._generations.get(key, 0) == generations[key]:
+                    self._blocks[key] = block
+                    self._blocks.move_to_end(key)
+            while len(self._blocks) > self.max_months:
+                self._blocks.popitem(last=False)
+        result.update(blocks)
+        return result
+
+    def invalidate_dates(self, *dates):
+        """失效这些日期 (yyyy-MM-dd，None 会被忽略) 所在的月份，返回受影响的 (year, month) 集合。"""
+        months = {month_of(date) for date in dates if date}
+        with self._lock:
+            for key in months:
+                self._blocks.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+        return months
+
+    def clear(self):
+        """失效所有月份，例如批量导入之后。"""
+        with self._lock:
+            self._epoch += 1
+            self._blocks.clear()
@@ -0,0 +1,136 @@
+import csv
+import gzip
+import json
+import os
+import sqlite3
+
+from model.money import DEFAULT_CURRENCY, format_amount
+
+# 账本导出: 从 TransactionModel 的服务端游标逐批读取交易和类别，经生成器转换为
+# CSV 或 JSON Lines 文本后写出 (可选 gzip 压缩)。内存中始终只有一批数据，
+# 数百万行的账本也能以固定内存导出。导出的 CSV 和 JSON Lines 文件 (包括 gzip 压缩的)
+# 都可以由 model.importer 重新导入: 币种原样保留，类别按名称关联 (类别ID只在原账本中
+# 有意义，导入时不使用)。
+
+EXPORT_FORMATS = ("csv", "jsonl")
+TRANSACTION_CSV_HEADER = ("id", "date", "description", "amount", "type", "currency", "category_id", "category")
+CATEGORY_CSV_HEADER = ("id", "name", "type")
+
+class ExportCancelled(Exception):
+    """导出被进度回调取消。"""
+
+def transaction_dict(record):
+    """把交易记录转换为可 JSON 序列化的字典，金额格式化为十进制字符串。
+
+    record 带有币种、类别ID和类别名称时 (见 iter_transaction_batches 的 detailed) 一并输出。
+    """
+    transaction_id, date, description, amount, transaction_type, *details = record
+    result = {"id": transaction_id, "date": date, "description": description,
+              "amount": format_amount(amount, details[0] if details else DEFAULT_CURRENCY),
+              "type": transaction_type}
+    if details:
+        result.update(zip(("currency", "category_id", "category"), details))
+    return result
+
+def csv_rows(batches):
+    """把交易批次展开为 CSV 行 (不含表头)，带币种的记录按其币种格式化金额。"""
+    for batch in batches:
+        for transaction_id, date, description, amount, transaction_type, *details in batch:
+            yield (transaction_id, date, description,
+                   format_amount(amount, details[0] if details else DEFAULT_CURRENCY), transaction_type, *details)
+
+def jsonl_lines(transaction_batches, category_batches=()):
+    """把类别和交易批次转换为 JSON Lines 文本行；record 字段区分 "category" 和 "transaction"。"""
+    for batch in category_batches:
+        for category_id, name, category_type in batch:
+            yield json.dumps({"record": "category", "id": category_id, "name": name, "type": category_type},
+                             ensure_ascii=False) + "\n"
+    for batch in transaction_batches:
+        for record in batch:
+            yield json.dumps({"record": "transaction", **transaction_dict(record)}, ensure_ascii=False) + "\n"
+
+def detect_export_format(path):
+    """根据扩展名返回 (格式, 是否 gzip 压缩)，如 "ledger.jsonl.gz" -> ("jsonl", True)。"""
+    name = path.lower()
+    compress = name.endswith(".gz")
+    if compress:
+        name = name[:-3]
+    file_format = os.path.splitext(name)[1].lstrip(".")
+    return ("jsonl" if file_format in ("jsonl", "ndjson", "json") else "csv"), compress
+
+def _counting(batches, counter, progress_callback):
+    """透传批次并累计行数，每批后调用 progress_callback，返回 False 时取消。"""
+    for batch in batches:
+        yield batch
+        counter[0] += len(batch)
+        if progress_callback is not None and progress_callback(counter[0]) is False:
+            raise ExportCancelled()
+
+def _open_output(path, compress, encoding):
+    if compress:
+        # 压缩级别 6 与 9 的体积相差很小，但速度快得多
+        return gzip.open(path, "wt", encoding=encoding, newline="", compresslevel=6)
+    return open(path, "w", encoding=encoding, newline="")
+
+def _write_csv(path, compress, header, rows):
+    # 带 BOM 的 UTF-8 便于 Excel 正确识别中文，导入器同样能识别
+    with _open_output(path, compress, "utf-8-sig") as out:
+        writer = csv.writer(out)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def export_ledger(model, path, file_format=None, compress=None, include_categories=True,
+                  date_from=None, date_to=None, transaction_type=None,
+                  batch_size=5000, progress_callback=None):
+    """把交易 (以及类别) 导出到 path，返回 (success, message, exported_count)。
+
+    file_format 为 "csv" 或 "jsonl"，compress 表示是否 gzip 压缩，未指定时根据扩展名判断。
+    date_from/date_to/transaction_type 筛选导出的交易。JSON Lines 中类别和交易写在同一文件；
+    CSV 的类别写到同目录的 <文件名>.categories.csv (压缩时为 .categories.csv.gz)。
+    progress_callback(exported_count) 在每批后调用，返回 False 时取消。数据先写到临时文件，
+    成功后才替换目标文件，取消或失败时不会留下不完整的文件。
+    """
+    detected_format, detected_compress = detect_export_format(path)
+    file_format = file_format or detected_format
+    compress = detected_compress if compress is None else compress
+    if file_format not in EXPORT_FORMATS:
+        return False, f"不支持的导出格式: {file_format}", 0
+
+    outputs = [path]
+    counter = [0]
+    transaction_batches = _counting(
+        model.iter_transaction_batches(batch_size, date_from=date_from, date_to=date_to,
+                                       transaction_type=transaction_type, detailed=True),
+        counter, progress_callback
+    )
+    try:
+        if file_format == "jsonl":
+            category_batches = model.iter_category_batches(batch_size) if include_categories else ()
+            with _open_output(path + ".part", compress, "utf-8") as out:
+                out.writelines(jsonl_lines(transaction_batches, category_batches))
+        else:
+            _write_csv(path + ".part", compress, TRANSACTION_CSV_HEADER, csv_rows(transaction_batches))
+            if include_categories:
+                root, extension = (path[:-3], ".csv.gz") if path.lower().endswith(".gz") else (path, ".csv")
+                categories_path = os.path.splitext(root)[0] + ".categories" + extension
+                outputs.append(categories_path)
+                _write_csv(categories_path + ".part", compress, CATEGORY_CSV_HEADER,
+                           (row for batch in model.iter_category_batches(batch_size) for row in batch))
+        for output in outputs:
+            os.replace(output + ".part", output)
+    except ExportCancelled:
+        _remove_partial(outputs)
+        return False, "导出已取消。", counter[0]
+    except (OSError, sqlite3.Error) as e:
+        _remove_partial(outputs)
+        return False, f"导出失败: {e}", counter[0]
+    finally:
+        transaction_batches.close()
+    return True, f"已导出 {counter[0]} 条交易到 {', '.join(outputs)}。", counter[0]
+
+def _remove_partial(outputs):
+    for output in outputs:
+        try:
+            os.remove(output + ".part")
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,234 @@
+import csv
+import datetime
+import functools
+import gzip
+import json
+import os
+import re
+
+from model.money import DEFAULT_CURRENCY, to_minor_units
+
+# 银行账单导入: 以生成器逐行读取 CSV / OFX 文件，校验并规范化为
+# (date, description, amount, type, currency, category) 元组，再交给
+# TransactionModel.bulk_add_transactions 在单个事务中分批写入。整个过程不会把文件一次性读入内存。
+# model.exporter 导出的 CSV 和 JSON Lines 文件 (包括 .gz 压缩的) 同样可以导入。
+
+# 表头别名 (小写) -> 字段名
+CSV_HEADER_ALIASES = {
+    "date": ("date", "日期", "交易日期", "记账日期", "交易时间", "posted date", "transaction date"),
+    "description": ("description", "描述", "摘要", "备注", "交易说明", "商品说明", "memo", "payee", "name"),
+    "amount": ("amount", "金额", "交易金额", "金额(元)", "发生额"),
+    "type": ("type", "类型", "收支", "收/支", "收支类型", "交易类型"),
+    "currency": ("currency", "币种", "货币"),
+    "category": ("category", "类别", "分类"),
+}
+
+# 收支类型映射 (小写)；不在表中的值视为错误
+TYPE_ALIASES = {
+    "收入": "收入", "收": "收入", "income": "收入", "credit": "收入", "cr": "收入", "in": "收入",
+    "dep": "收入", "int": "收入", "div": "收入", "directdep": "收入",
+    "支出": "支出", "支": "支出", "expense": "支出", "debit": "支出", "dr": "支出", "out": "支出",
+    "pos": "支出", "atm": "支出", "fee": "支出", "srvchg": "支出", "payment": "支出",
+    "check": "支出", "cash": "支出", "directdebit": "支出", "repeatpmt": "支出",
+}
+
+_DATE_RE = re.compile(r"^\s*(\d{4})[-/.年]?(\d{1,2})[-/.月]?(\d{1,2})")
+_AMOUNT_STRIP_RE = re.compile(r"[\s,¥￥$€£元]")
+_CURRENCY_RE = re.compile(r"^[A-Z]{3}$")
+_OFX_TAG_RE = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)")
+
+class ImportRowError(ValueError):
+    """某一行数据无法解析时抛出。"""
+
+@functools.lru_cache(maxsize=8192)
+def normalize_date(value):
+    """把 2024-01-31、2024/1/31、20240131、2024年1月31日 等格式规范为 yyyy-MM-dd。
+
+    账单中的日期高度重复，结果按原始文本缓存。
+    """
+    match = _DATE_RE.match(value or "")
+    if not match:
+        raise ImportRowError(f"无法识别的日期: {value!r}")
+    year, month, day = (int(part) for part in match.groups())
+    try:
+        return datetime.date(year, month, day).isoformat()
+    except ValueError:
+        raise ImportRowError(f"无效的日期: {value!r}") from None
+
+def parse_amount(value, currency=DEFAULT_CURRENCY):
+    """把金额文本解析为以最小货币单位计的整数，支持千分位、货币符号和会计格式的括号负数。"""
+    text = _AMOUNT_STRIP_RE.sub("", value or "")
+    negative = text.startswith("(") and text.endswith(")")
+    if negative:
+        text = text[1:-1]
+    try:
+        amount = to_minor_units(text, currency)
+    except ValueError:
+        raise ImportRowError(f"无效的金额: {value!r}") from None
+    return -amount if negative else amount
+
+def normalize_row(date, description, amount_text, type_text=None, currency=None, category=None):
+    """校验并规范化一行数据，返回 (date, description, amount, type, currency, category)。
+
+    没有类型列时根据金额正负判断收支；金额统一存为正数。没有币种时为默认币种，没有类别时为 None。
+    """
+    currency = (currency or "").strip().upper() or DEFAULT_CURRENCY
+    if not _CURRENCY_RE.match(currency):
+        raise ImportRowError(f"无效的币种: {currency!r}")
+    amount = parse_amount(amount_text, currency)
+    if type_text:
+        transaction_type = TYPE_ALIASES.get(type_text.strip().lower())
+        if transaction_type is None:
+            raise ImportRowError(f"无法识别的收支类型: {type_text!r}")
+    else:
+        transaction_type = "支出" if amount < 0 else "收入"
+    return (normalize_date(date), (description or "").strip(), abs(amount), transaction_type, currency,
+            (category or "").strip() or None)
+
+def _is_gzip(path):
+    return path.lower().endswith(".gz")
+
+def _open_text(path, encoding, errors=None):
+    """以文本方式打开账单文件，扩展名为 .gz 时边读边解压。"""
+    if _is_gzip(path):
+        return gzip.open(path, "rt", newline="", encoding=encoding, errors=errors)
+    return open(path, newline="", encoding=encoding, errors=errors)
+
+def detect_encoding(path, sample_size=65536):
+    """根据文件开头 (gzip 文件为解压后的开头) 判断编码：UTF-8 (含 BOM) 或国内银行常用的 GB18030。"""
+    with (gzip.open if _is_gzip(path) else open)(path, "rb") as f:
+        sample = f.read(sample_size)
+    if sample.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # 样本末尾可能截断了一个多字节字符
+        if e.start < len(sample) - 3:
+            return "gb18030"
+    return "utf-8"
+
+def _map_csv_header(header):
+    columns = {}
+    for index, name in enumerate(header):
+        key = name.strip().lower()
+        for field, aliases in CSV_HEADER_ALIASES.items():
+            if field not in columns and key in aliases:
+                columns[field] = index
+    missing = {"date", "amount"} - columns.keys()
+    if missing:
+        raise ImportRowError(f"CSV 表头缺少必需的列: {', '.join(sorted(missing))}")
+    return columns
+
+def iter_csv_rows(path, errors):
+    """逐行读取 CSV 账单，产出规范化的交易元组；无法解析的行以 (行号, 原因) 追加到 errors。"""
+    with _open_text(path, detect_encoding(path)) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = _map_csv_header(header)
+        date_col = columns["date"]
+        amount_col = columns["amount"]
+        description_col = columns.get("description")
+        type_col = columns.get("type")
+        currency_col = columns.get("currency")
+        category_col = columns.get("category")
+        for record in reader:
+            if not any(record):
+                continue
+            try:
+                yield normalize_row(
+                    record[date_col],
+                    record[description_col] if description_col is not None else "",
+                    record[amount_col],
+                    record[type_col] if type_col is not None else None,
+                    record[currency_col] if currency_col is not None else None,
+                    record[category_col] if category_col is not None else None,
+                )
+            except (ImportRowError, IndexError) as e:
+                errors.append((reader.line_num, str(e) if isinstance(e, ImportRowError) else "列数不足"))
+
+def iter_ofx_rows(path, errors):
+    """逐行读取 OFX (SGML 或 XML) 账单中的 <STMTTRN> 记录，产出规范化的交易元组。"""
+    with _open_text(path, detect_encoding(path), errors="replace") as f:
+        current = None
+        start_line = 0
+        for line_number, line in enumerate(f, 1):
+            for closing, tag, value in _OFX_TAG_RE.findall(line):
+                tag = tag.upper()
+                if tag == "STMTTRN":
+                    if not closing:
+                        current, start_line = {}, line_number
+                        continue
+                    if current is not None:
+                        try:
+                            yield normalize_row(
+                                current.get("DTPOSTED", ""),
+                                current.get("NAME") or current.get("MEMO") or current.get("PAYEE", ""),
+                                current.get("TRNAMT", ""),
+                            )
+                        except ImportRowError as e:
+                            errors.append((start_line, str(e)))
+                    current = None
+                elif current is not None and not closing:
+                    current[tag] = value.strip()
+
+def iter_jsonl_rows(path, errors):
+    """逐行读取 model.exporter 导出的 JSON Lines 文件，产出其中交易记录的规范化元组。
+
+    类别记录 (record 为 "category") 被跳过: 交易带有类别名称，导入时按名称关联或新建类别。
+    """
+    with _open_text(path, detect_encoding(path)) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                errors.append((line_number, "无效的 JSON"))
+                continue
+            if not isinstance(record, dict):
+                errors.append((line_number, "不是 JSON 对象"))
+                continue
+            if record.get("record", "transaction") != "transaction":
+                continue
+            try:
+                yield normalize_row(
+                    str(record.get("date") or ""),
+                    str(record.get("description") or ""),
+                    str(record.get("amount") or ""),
+                    record.get("type"),
+                    record.get("currency"),
+                    record.get("category"),
+                )
+            except (ImportRowError, AttributeError) as e:
+                errors.append((line_number, str(e) if isinstance(e, ImportRowError) else "字段类型无效"))
+
+def iter_statement_rows(path, errors, file_format=None):
+    """根据扩展名 (或 file_format: 'csv' / 'ofx' / 'jsonl') 选择解析器，.gz 文件按去掉 .gz 后的扩展名判断。"""
+    name = path[:-3] if _is_gzip(path) else path
+    file_format = (file_format or os.path.splitext(name)[1].lstrip(".")).lower()
+    if file_format == "csv":
+        return iter_csv_rows(path, errors)
+    if file_format in ("ofx", "qfx"):
+        return iter_ofx_rows(path, errors)
+    if file_format in ("jsonl", "ndjson"):
+        return iter_jsonl_rows(path, errors)
+    raise ImportRowError(f"不支持的账单格式: {file_format or '未知'}")
+
+def import_statement(model, path, file_format=None, batch_size=5000, progress_callback=None):
+    """把银行账单导入到 model 中，所有行在一个事务里分批写入。
+
+    progress_callback(imported_count) 在每批写入后调用，返回 False 时取消并回滚。
+    返回 (success, message, errors)，errors 为 [(行号, 原因), ...]。
+    """
+    errors = []
+    try:
+        rows = iter_statement_rows(path, errors, file_format)
+        success, message = model.bulk_add_transactions(rows, batch_size, progress_callback)
+    except (OSError, ImportRowError) as e:
+        return False, f"导入失败: {e}", errors
+    if success and errors:
+        message = f"{message} 另有 {len(errors)} 行无法解析，已跳过。"
+    return success, message, errors
@@ -0,0 +1,221 @@
+import bisect
+import collections
+import functools
+import json
+import re
+import sqlite3
+import threading
+import time
+
+# 运行时性能埋点: 记录模型/控制器方法和每条 SQL 的耗时直方图、返回行数以及超过阈值的
+# 慢查询。全局只有一个 profiler 实例，默认开启；所有记录操作都是线程安全的。
+
+# 直方图桶上界 (毫秒)，按约 1.5 倍等比增长，覆盖 10 微秒到 1 分钟
+BUCKET_BOUNDS_MS = tuple(round(0.01 * 1.5 ** i, 4) for i in range(39))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class LatencyHistogram:
+    """对数分桶的耗时直方图，额外记录次数、总耗时、最值和累计行数。"""
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)  # 最后一个桶为溢出桶
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = 0.0
+        self.rows = 0
+
+    def add(self, duration_ms, rows=None):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        self.min_ms = duration_ms if self.min_ms is None else min(self.min_ms, duration_ms)
+        self.max_ms = max(self.max_ms, duration_ms)
+        if rows is not None:
+            self.rows += rows
+
+    def percentile(self, fraction):
+        """返回近似分位数 (所在桶的上界，不超过实际最大值)。"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        running = 0
+        for index, bucket_count in enumerate(self.buckets):
+            running += bucket_count
+            if running >= target:
+                bound = BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total_ms,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "min_ms": self.min_ms or 0.0,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "rows": self.rows,
+            "buckets": {
+                (f"<={BUCKET_BOUNDS_MS[i]}" if i < len(BUCKET_BOUNDS_MS) else "overflow"): n
+                for i, n in enumerate(self.buckets) if n
+            },
+        }
+
+
+class Profiler:
+    """按类别 ("method" / "sql" / "request") 和名称汇总耗时，并保留最近的慢操作记录。
+
+    "request" 用于 HTTP 接口 (server.py) 按路由统计的请求耗时。
+    """
+    KINDS = ("method", "sql", "request")
+
+    def __init__(self, slow_threshold_ms=50.0, slow_log_size=200):
+        self.enabled = True
+        self.slow_threshold_ms = slow_threshold_ms
+        self._lock = threading.Lock()
+        self._histograms = {kind: {} for kind in self.KINDS}
+        self._slow_log = collections.deque(maxlen=slow_log_size)
+
+    def record(self, kind, name, duration_ms, rows=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms[kind].get(name)
+            if histogram is None:
+                histogram = self._histograms[kind][name] = LatencyHistogram()
+            histogram.add(duration_ms, rows)
+            if duration_ms >= self.slow_threshold_ms:
+                self._slow_log.append({
+                    "timestamp": time.time(),
+                    "kind": kind,
+                    "name": name,
+                    "duration_ms": duration_ms,
+                    "rows": rows,
+                })
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {kind: {} for kind in self.KINDS}
+            self._slow_log.clear()
+
+    def snapshot(self):
+        """返回当前统计数据的可 JSON 序列化副本。"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "slow_threshold_ms": self.slow_threshold_ms,
+                "methods": {name: h.to_dict() for name, h in self._histograms["method"].items()},
+                "sql": {name: h.to_dict() for name, h in self._histograms["sql"].items()},
+                "requests": {name: h.to_dict() for name, h in self._histograms["request"].items()},
+                "slow_queries": list(self._slow_log),
+            }
+
+    def dump_json(self, path):
+        """把当前统计写入 JSON 文件，供离线分析。"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+    def timed(self, name, fn):
+        """包装 fn，记录每次调用的耗时和返回的行数。"""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                duration_ms = (time.perf_counter() - start) * 1000
+            self.record("method", name, duration_ms, _result_rows(result))
+            return result
+        return wrapper
+
+    def instrument(self, obj, prefix, names=None):
+        """把对象的公开方法 (或 names 指定的方法) 替换为计时包装，返回 obj。
+
+        需要在方法被绑定为 Qt 槽或回调之前调用。
+        """
+        if names is None:
+            names = [name for name in dir(type(obj))
+                     if not name.startswith("_") and callable(getattr(type(obj), name))]
+        for name in names:
+            setattr(obj, name, self.timed(f"{prefix}.{name}", getattr(obj, name)))
+        return obj
+
+
+def _result_rows(result):
+    """从常见的返回值形式中推断行数: 行列表，或 (rows, next_cursor) 分页结果。"""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[0], list):
+        return len(result[0])
+    return None
+
+
+def normalize_sql(sql):
+    """压缩空白，使同一语句的不同排版归为一类。"""
+    return _WHITESPACE_RE.sub(" ", sql).strip()
+
+
+profiler = Profiler()
+
+
+# 慢查询记录中 executescript 脚本保留的最大长度
+SCRIPT_NAME_LENGTH = 120
+
+
+def _script_name(script):
+    name = normalize_sql(script)
+    return name if len(name) <= SCRIPT_NAME_LENGTH else name[:SCRIPT_NAME_LENGTH] + "..."
+
+
+def _timed_sql(method, sql, *args, count_rows=False, script=False):
+    """执行 method(sql, *args) 并记录耗时 (失败的语句同样记录)；count_rows 为 True 时记录游标的 rowcount。"""
+    if not profiler.enabled:
+        return method(sql, *args)
+    cursor = None
+    start = time.perf_counter()
+    try:
+        cursor = method(sql, *args)
+        return cursor
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        profiler.record("sql", _script_name(sql) if script else normalize_sql(sql), duration_ms,
+                        cursor.rowcount if count_rows and cursor is not None else None)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """记录 execute / executemany / executescript 耗时的游标类，由 InstrumentedConnection.cursor() 返回。"""
+    def execute(self, sql, parameters=()):
+        return _timed_sql(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return _timed_sql(super().executemany, sql, seq_of_parameters, count_rows=True)
+
+    def executescript(self, sql_script):
+        return _timed_sql(super().executescript, sql_script, script=True)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """记录每条 SQL 执行耗时的连接类 (作为 sqlite3.connect 的 factory)。
+
+    连接的 execute / executemany / executescript 在 C 层直接执行，不经过游标的方法，
+    因此连接和游标 (cursor() 默认返回 InstrumentedCursor，如迁移中使用的游标) 各自计时，
+    所有 SQL 都会出现在统计中。计时覆盖语句的准备和首次执行；对 SELECT 而言不包含之后
+    取回结果的时间，完整耗时体现在对应的模型方法上。
+    """
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return _timed_sql(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return _timed_sql(super().executemany, sql, seq_of_parameters, count_rows=True)
+
+    def executescript(self, sql_script):
+        return _timed_sql(super().executescript, sql_script, script=True)
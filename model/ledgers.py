@@ -0,0 +1,72 @@
+import concurrent.futures
+import glob
+import os
+import re
+
+from model.model import TransactionModel, merge_period_totals
+
+# 多账本: 每个账本 (家庭、工作室等) 是一个独立的 SQLite 文件，各由一个 TransactionModel 打开。
+# 合并报表把每个账本的按月汇总查询分发到线程池 (或进程池) 中并行执行，再合并结果。
+# 汇总以只读方式打开账本，不迁移、不写入，可以汇总界面或其他进程正在使用的账本。
+# SQLite 执行查询时释放 GIL，分组在 SQLite 中完成、只返回月份数量的行，因此线程池即可
+# 利用多核: 合并几十个账本的耗时接近其中最大的一个，而不是所有账本之和。
+
+LEDGER_EXTENSION = ".db"
+
+# 账本的年度归档文件名为 <账本名>.<年份>.db (见 model.archive)
+_ARCHIVE_NAME_RE = re.compile(r"^(?P<ledger>.+)\.\d{4}$")
+
+def ledger_name(path):
+    """返回账本的显示名称，即不含目录和扩展名的文件名。"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+def find_ledgers(directory):
+    """返回 directory 中的账本文件路径，按文件名排序。同一目录中账本的年度归档文件不算作账本。"""
+    paths = sorted(glob.glob(os.path.join(glob.escape(directory), "*" + LEDGER_EXTENSION)))
+    names = {ledger_name(path) for path in paths}
+    ledgers = []
+    for path in paths:
+        match = _ARCHIVE_NAME_RE.match(ledger_name(path))
+        if match is None or match.group("ledger") not in names:
+            ledgers.append(path)
+    return ledgers
+
+def ledger_rollup(database_file, date_from=None, date_to=None):
+    """打开一个账本并返回其按月汇总 [(yyyy-MM, 收入, 支出, 笔数)]。
+
+    参数和返回值都是普通对象，可以在进程池中执行。账本文件不存在时抛出 FileNotFoundError，
+    而不是创建一个空账本；账本的 schema 较旧时抛出 sqlite3.DatabaseError (见 TransactionModel 的 read_only)。
+    """
+    if not os.path.exists(database_file):
+        raise FileNotFoundError(f"账本文件不存在: {database_file}")
+    with TransactionModel(database_file, read_only=True) as model:
+        return model.get_monthly_totals(date_from, date_to)
+
+def consolidate(database_files, date_from=None, date_to=None, max_workers=None, use_processes=False):
+    """并行汇总多个账本 [date_from, date_to] (可以不限) 内的收支，返回合并报表:
+
+    {"ledgers": [(名称, 收入, 支出, 笔数)], "months": [(yyyy-MM, 收入, 支出, 笔数)],
+     "totals": (收入, 支出, 笔数), "errors": [(名称, 错误信息)]}
+
+    ledgers 与 database_files 顺序一致 (不含出错的账本)，months 为所有账本逐月相加。
+    默认使用线程池；use_processes 为 True 时使用进程池，适合账本很多、CPU 核数也多的场合。
+    """
+    database_files = list(database_files)
+    executor_class = (concurrent.futures.ProcessPoolExecutor if use_processes
+                      else concurrent.futures.ThreadPoolExecutor)
+    workers = min(max_workers or os.cpu_count() or 1, len(database_files)) or 1
+    with executor_class(max_workers=workers) as executor:
+        futures = [executor.submit(ledger_rollup, path, date_from, date_to) for path in database_files]
+        ledgers, partitions, errors = [], [], []
+        for path, future in zip(database_files, futures):
+            try:
+                months = future.result()
+            except Exception as e:
+                errors.append((ledger_name(path), str(e)))
+                continue
+            partitions.append(months)
+            ledgers.append((ledger_name(path), sum(row[1] for row in months), sum(row[2] for row in months),
+                            sum(row[3] for row in months)))
+    months = merge_period_totals(partitions) if partitions else []
+    totals = tuple(sum(values) for values in zip(*(ledger[1:] for ledger in ledgers))) or (0, 0, 0)
+    return {"ledgers": ledgers, "months": months, "totals": totals, "errors": errors}
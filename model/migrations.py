@@ -0,0 +1,343 @@
+import sqlite3
+
+# 需要逐行转换数据的迁移每批处理的行数，SQLite 逐批流式复制，不把整张表读入内存
+MIGRATION_BATCH_SIZE = 10000
+
+# 数据库 schema 迁移。
+# 每个迁移是 (版本号, 说明, 函数)，函数接收一个 cursor 并在事务中执行；
+# 数据库当前版本记录在 PRAGMA user_version 中，启动时按顺序执行所有更高版本的迁移。
+# 已发布的迁移不能再修改，schema 变更一律追加新的迁移。
+
+def _create_base_tables(cursor):
+    # 确保 type 字段的 CHECK 约束使用中文，与 UI 和插入逻辑一致
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            description TEXT, 
+            amount REAL NOT NULL,
+            type TEXT NOT NULL CHECK(type IN ('收入', '支出'))
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            type TEXT NOT NULL CHECK(type IN ('收入', '支出')) 
+        )
+    ''')
+
+def _create_query_indexes(cursor):
+    # 明细列表和键集分页按 (date, id) 降序遍历
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date_id ON transactions (date DESC, id DESC)")
+    # 按类型筛选和聚合时仍能按 (date, id) 顺序分页
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_type_date_id ON transactions (type, date DESC, id DESC)")
+    # 首页按类型分组、按名称排序列出类别
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_categories_type_name ON categories (type, name)")
+
+def _create_summary_totals(cursor):
+    # 按类型汇总的金额和笔数，由触发器随 transactions 的增删改同步维护
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_totals (
+            type TEXT PRIMARY KEY CHECK(type IN ('收入', '支出')),
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO transaction_totals (type, total, count)
+        SELECT t.type, COALESCE(SUM(transactions.amount), 0), COUNT(transactions.id)
+        FROM (SELECT '收入' AS type UNION ALL SELECT '支出') AS t
+        LEFT JOIN transactions ON transactions.type = t.type
+        GROUP BY t.type
+    ''')
+    _create_totals_triggers(cursor)
+
+def _create_totals_triggers(cursor):
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_totals_insert AFTER INSERT ON transactions
+        BEGIN
+            UPDATE transaction_totals SET total = total + NEW.amount, count = count + 1 WHERE type = NEW.type;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_totals_delete AFTER DELETE ON transactions
+        BEGIN
+            UPDATE transaction_totals SET total = total - OLD.amount, count = count - 1 WHERE type = OLD.type;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_totals_update AFTER UPDATE OF amount, type ON transactions
+        BEGIN
+            UPDATE transaction_totals SET total = total - OLD.amount, count = count - 1 WHERE type = OLD.type;
+            UPDATE transaction_totals SET total = total + NEW.amount, count = count + 1 WHERE type = NEW.type;
+        END
+    ''')
+
+def _create_description_fts(cursor):
+    # 描述全文索引: 外部内容 FTS5 表，只存索引不重复存储描述文本。trigram 分词器按
+    # 三个字符切分，不依赖空格，中文描述也能做子串匹配。SQLite 低于 3.34 没有 trigram，
+    # 此时跳过，搜索退回到 LIKE 扫描。
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+                description, content='transactions', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"当前 SQLite 不支持 FTS5 trigram，跳过全文索引: {e}")
+        return
+    cursor.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+    _create_fts_triggers(cursor)
+
+def _create_fts_triggers(cursor):
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_insert AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_delete AFTER DELETE ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_update AFTER UPDATE OF description ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+            INSERT INTO transactions_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END
+    ''')
+
+def _create_change_log(cursor):
+    # 记录被修改或删除的交易 ID，供分析引擎等缓存增量刷新。新增的交易 ID 单调递增，
+    # 读取 id 大于已加载最大 ID 的行即可，不需要记录。日志只保留最近的条目，
+    # 落后于保留范围的读者应全量重建。
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL
+        )
+    ''')
+    _create_change_log_triggers(cursor)
+
+def _create_change_log_triggers(cursor):
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_changes_update AFTER UPDATE ON transactions
+        BEGIN
+            INSERT INTO transaction_changes (transaction_id) VALUES (OLD.id);
+            INSERT INTO transaction_changes (transaction_id) SELECT NEW.id WHERE NEW.id != OLD.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_changes_delete AFTER DELETE ON transactions
+        BEGIN
+            INSERT INTO transaction_changes (transaction_id) VALUES (OLD.id);
+        END
+    ''')
+
+def _convert_amounts_to_minor_units(cursor):
+    # 金额由 REAL 改为以分计的 INTEGER，并增加币种列。SQLite 不能修改列类型，
+    # 因此按 ID 分批把数据复制到新表后替换原表；删除原表会同时删除其索引和触发器，
+    # 这里全部重建。ID 和 AUTOINCREMENT 计数保持不变，全文索引的 rowid 依然有效。
+    cursor.execute('''
+        CREATE TABLE transactions_minor_units (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            description TEXT,
+            amount INTEGER NOT NULL CHECK(typeof(amount) = 'integer'),
+            currency TEXT NOT NULL DEFAULT 'CNY',
+            type TEXT NOT NULL CHECK(type IN ('收入', '支出'))
+        )
+    ''')
+    last_id = 0
+    while True:
+        cursor.execute(
+            "INSERT INTO transactions_minor_units (id, date, description, amount, type) "
+            "SELECT id, date, description, CAST(ROUND(amount * 100) AS INTEGER), type "
+            "FROM transactions WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, MIGRATION_BATCH_SIZE)
+        )
+        if cursor.rowcount < MIGRATION_BATCH_SIZE:
+            break
+        last_id = cursor.execute("SELECT MAX(id) FROM transactions_minor_units").fetchone()[0]
+    sequence = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'").fetchone()
+    cursor.execute("DROP TABLE transactions")
+    cursor.execute("ALTER TABLE transactions_minor_units RENAME TO transactions")
+    if sequence is not None:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'transactions'", sequence)
+    _create_query_indexes(cursor)
+
+    cursor.execute("DROP TABLE transaction_totals")
+    cursor.execute('''
+        CREATE TABLE transaction_totals (
+            type TEXT PRIMARY KEY CHECK(type IN ('收入', '支出')),
+            total INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO transaction_totals (type, total, count)
+        SELECT t.type, COALESCE(SUM(transactions.amount), 0), COUNT(transactions.id)
+        FROM (SELECT '收入' AS type UNION ALL SELECT '支出') AS t
+        LEFT JOIN transactions ON transactions.type = t.type
+        GROUP BY t.type
+    ''')
+    _create_totals_triggers(cursor)
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'").fetchone():
+        _create_fts_triggers(cursor)
+    _create_change_log_triggers(cursor)
+
+# 维护修改计数的表。计数只增不减，读者据此判断缓存的数据是否仍然有效
+COUNTED_TABLES = ("transactions", "categories", "archives")
+
+def _create_change_counters(cursor):
+    # 每张表一个修改计数，由触发器在每次增删改时加一。连接上的 PRAGMA data_version
+    # 在其他连接 (包括其他进程) 提交后变化，再读一次计数即可知道具体是哪些表被修改。
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counters (
+            table_name TEXT PRIMARY KEY,
+            counter INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    tables = ("transactions", "categories")
+    cursor.executemany("INSERT OR IGNORE INTO change_counters (table_name) VALUES (?)",
+                       [(table,) for table in tables])
+    _create_change_counter_triggers(cursor, tables)
+
+def _create_change_counter_triggers(cursor, tables):
+    for table in tables:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_counter_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE change_counters SET counter = counter + 1 WHERE table_name = '{table}';
+                END
+            ''')
+
+def _link_transactions_to_categories(cursor):
+    # 交易通过 category_id 关联类别 (可以为空)，删除类别时交易保留、类别置空。
+    # 描述与某个同类型类别的名称完全相同的已有交易自动关联到该类别。
+    cursor.execute(
+        "ALTER TABLE transactions ADD COLUMN category_id INTEGER REFERENCES categories (id) ON DELETE SET NULL"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_category_date ON transactions (category_id, date)")
+    # 每个类别每月的金额和笔数，由触发器随交易的增删改同步维护，首页卡片只需读取类别数量的行
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_month_totals (
+            month TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, category_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        UPDATE transactions SET category_id = (
+            SELECT categories.id FROM categories
+            WHERE categories.name = transactions.description AND categories.type = transactions.type
+        )
+        WHERE description IN (SELECT name FROM categories)
+    ''')
+    cursor.execute('''
+        INSERT INTO category_month_totals (month, category_id, total, count)
+        SELECT substr(date, 1, 7), category_id, SUM(amount), COUNT(*) FROM transactions
+        WHERE category_id IS NOT NULL GROUP BY substr(date, 1, 7), category_id
+    ''')
+    _create_category_totals_triggers(cursor)
+
+def _create_category_totals_triggers(cursor):
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_category_insert AFTER INSERT ON transactions
+        WHEN NEW.category_id IS NOT NULL
+        BEGIN
+            INSERT INTO category_month_totals (month, category_id, total, count)
+            VALUES (substr(NEW.date, 1, 7), NEW.category_id, NEW.amount, 1)
+            ON CONFLICT (month, category_id) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_category_delete AFTER DELETE ON transactions
+        WHEN OLD.category_id IS NOT NULL
+        BEGIN
+            UPDATE category_month_totals SET total = total - OLD.amount, count = count - 1
+            WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_category_update
+        AFTER UPDATE OF date, amount, category_id ON transactions
+        WHEN OLD.category_id IS NOT NULL OR NEW.category_id IS NOT NULL
+        BEGIN
+            UPDATE category_month_totals SET total = total - OLD.amount, count = count - 1
+            WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id;
+            INSERT INTO category_month_totals (month, category_id, total, count)
+            SELECT substr(NEW.date, 1, 7), NEW.category_id, NEW.amount, 1 WHERE NEW.category_id IS NOT NULL
+            ON CONFLICT (month, category_id) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+    ''')
+
+def _create_archive_registry(cursor):
+    # 已归档年份的登记表: 归档文件名 (相对于主数据库所在目录) 以及归档时统计的收支金额和笔数。
+    # 总收支加上这里的合计即可覆盖全部年份，不需要打开归档文件。
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archives (
+            year INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            income INTEGER NOT NULL DEFAULT 0,
+            income_count INTEGER NOT NULL DEFAULT 0,
+            expense INTEGER NOT NULL DEFAULT 0,
+            expense_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO change_counters (table_name) VALUES ('archives')")
+    _create_change_counter_triggers(cursor, ("archives",))
+
+MIGRATIONS = [
+    (1, "创建 transactions 和 categories 表", _create_base_tables),
+    (2, "为明细列表、类型筛选和类别列表添加索引", _create_query_indexes),
+    (3, "添加由触发器维护的收支汇总表", _create_summary_totals),
+    (4, "为交易描述添加 FTS5 全文索引", _create_description_fts),
+    (5, "添加记录交易修改和删除的变更日志", _create_change_log),
+    (6, "金额改为以分计的整数并增加币种列", _convert_amounts_to_minor_units),
+    (7, "添加由触发器维护的各表修改计数", _create_change_counters),
+    (8, "交易关联类别，并添加按类别和月份汇总的金额表", _link_transactions_to_categories),
+    (9, "添加冷数据归档年份的登记表", _create_archive_registry),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    """返回数据库当前的 schema 版本 (PRAGMA user_version)。"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(conn, migrations=MIGRATIONS):
+    """按顺序执行所有高于当前版本的迁移，每个迁移在独立事务中执行。
+
+    某个迁移失败时回滚该迁移并抛出 sqlite3.Error，数据库停留在上一个成功的版本。
+    返回已执行的迁移版本号列表。
+    """
+    current_version = get_schema_version(conn)
+    if current_version > migrations[-1][0]:
+        print(f"警告: 数据库版本 ({current_version}) 高于程序支持的版本 ({migrations[-1][0]})。")
+        return []
+
+    applied = []
+    for version, description, migration in migrations:
+        if version <= current_version:
+            continue
+        cursor = conn.cursor()
+        try:
+            # 显式开启事务，使 DDL 与 user_version 的更新一起提交或回滚
+            cursor.execute("BEGIN IMMEDIATE")
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"数据库迁移 {version} ({description}) 失败: {e}")
+            raise
+        applied.append(version)
+    return applied
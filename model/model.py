@@ -1,162 +1,1052 @@
+import contextlib
+import datetime
+import heapq
+import itertools
+import operator
+import os
 import sqlite3
+import threading
+
+from model.backup import BackupCancelled, copy_database
+from model.archive import (AttachedArchives, archive_file_name, create_archive_tables, merge_sorted,
+                           year_bounds, year_in_range)
+from model.migrations import COUNTED_TABLES, LATEST_VERSION, apply_migrations, get_schema_version
+from model.money import DEFAULT_CURRENCY
+from model.instrumentation import InstrumentedConnection
+from model.read_cache import VersionedReadCache
+from model.unit_of_work import StaleRecordError, UnitOfWork
 
 DATABASE_FILE = "pocketledger.db"
 
-def init_db():
-    """初始化数据库，创建 transactions 表和 categories 表 (如果不存在)。"""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    # 确保 type 字段的 CHECK 约束使用中文，与 UI 和插入逻辑一致
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT NOT NULL,
-            description TEXT, 
-            amount REAL NOT NULL,
-            type TEXT NOT NULL CHECK(type IN ('收入', '支出'))
+# 每个连接缓存的预编译语句数量 (sqlite3 模块按 SQL 文本复用 prepared statement)
+STATEMENT_CACHE_SIZE = 256
+
+# release_reader() 交还后留待复用的只读连接数上限，超出的直接关闭
+MAX_IDLE_READERS = 4
+
+# 关闭数据库时变更日志 (transaction_changes) 保留的最近条目数
+CHANGE_LOG_RETENTION = 10000
+
+# 分析引擎读取的列: ID、1970-01-01 起的天数、以分计的整数金额、是否支出、类别名 (未关联类别时为描述)
+ANALYTICS_COLUMNS = (
+    "id, CAST(julianday(date) - 2440587.5 AS INTEGER), amount, type = '支出', "
+    "COALESCE((SELECT name FROM categories WHERE categories.id = category_id), description)"
+)
+
+# 交易行 (id, date, description, amount, type) 的排序键: 列表按 (date, id) 排序
+_date_id_key = operator.itemgetter(1, 0)
+
+def connect(database_file=DATABASE_FILE, read_only=False):
+    """打开一个 SQLite 连接并设置性能相关的 PRAGMA。
+
+    连接允许跨线程使用，调用方负责保证同一时刻只有一个线程在使用它。
+    read_only 为 True 时连接拒绝任何写操作。每条 SQL 的耗时记录到 instrumentation.profiler。
+    """
+    conn = sqlite3.connect(database_file, cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False, factory=InstrumentedConnection)
+    # 其他连接 (后台线程、其他进程) 持有写锁时等待而不是立即报错
+    conn.execute("PRAGMA busy_timeout=5000")
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    else:
+        # WAL 模式下读写互不阻塞，并且每次提交只需追加日志
+        conn.execute("PRAGMA journal_mode=WAL")
+        # 拒绝关联到不存在类别的交易，删除类别时把交易的类别置空
+        conn.execute("PRAGMA foreign_keys=ON")
+    # WAL 下 NORMAL 已能保证数据库一致性，只在检查点时 fsync
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-32000")  # 约 32MB 页缓存
+    conn.execute("PRAGMA mmap_size=268435456")  # 256MB 内存映射读取
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+def merge_period_totals(partitions):
+    """合并多个按期间升序排列的 (期间, 收入, 支出, 笔数) 列表，同一期间的金额和笔数相加。"""
+    if len(partitions) == 1:
+        return list(partitions[0])
+    rows = []
+    for row in heapq.merge(*partitions):
+        if rows and rows[-1][0] == row[0]:
+            rows[-1] = (row[0], *(total + value for total, value in zip(rows[-1][1:], row[1:])))
+        else:
+            rows.append(row)
+    return rows
+
+class ImportCancelled(Exception):
+    """批量导入被进度回调取消。"""
+
+def init_db(conn):
+    """初始化数据库：执行所有尚未应用的 schema 迁移。"""
+    apply_migrations(conn)
+
+def build_transaction_filters(date_from=None, date_to=None, transaction_type=None,
+                              min_amount=None, max_amount=None, description=None):
+    """把可选筛选条件转换为 SQL WHERE 子句列表和参数列表。"""
+    clauses, params = [], []
+    if date_from:
+        clauses.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("date <= ?")
+        params.append(date_to)
+    if transaction_type:
+        clauses.append("type = ?")
+        params.append(transaction_type)
+    if min_amount is not None:
+        clauses.append("amount >= ?")
+        params.append(min_amount)
+    if max_amount is not None:
+        clauses.append("amount <= ?")
+        params.append(max_amount)
+    if description:
+        escaped = description.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        clauses.append("description LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    return clauses, params
+
+class TransactionModel:
+    """处理所有与交易数据相关的数据库操作。
+
+    金额一律以最小货币单位 (分) 的整数传入和返回，显示时再由 model.money.format_amount 格式化。
+
+    模型持有长连接，避免每次操作都重新建立连接、解析 schema 和预热页缓存:
+    一个由锁串行化的写连接 self.conn，以及每个线程各自的只读连接。WAL 模式下
+    读连接不会被写事务阻塞，因此后台线程执行导入等长事务时，界面线程仍可读取。
+    线程池中的任务结束时应调用 release_reader() 交还只读连接，供之后的任务复用。
+    模型可以在多个线程中同时使用。使用完毕后应调用 close()，或以 with 语句管理其生命周期。
+
+    类别、汇总、交易分页和单条交易的读取经过 VersionedReadCache: 每次读取先检查读连接的
+    PRAGMA data_version，只有其他连接提交过之后才重新读取各表的修改计数，计数未变的
+    缓存条目直接返回，不查询数据库。poll_changes() 报告其他进程修改过的表。
+
+    read_only=True 时只打开只读连接: 不执行迁移，close() 也不整理变更日志或合并 WAL，
+    可以读取其他进程正在使用的账本 (如合并汇总)；修改方法一律失败。此时账本的 schema
+    必须已经是最新版本，否则抛出 sqlite3.DatabaseError。
+
+    archive_year() 把已结束的年份移到年度归档文件 (见 model.archive)。列表、汇总、搜索和
+    分析的读取方法透明地覆盖归档，只在日期范围涉及某个年份时才附加并查询它的文件。
+    """
+    # 全文搜索时参与相关度排序的最近匹配条数上限
+    SEARCH_CANDIDATES = 2000
+
+    def __init__(self, database_file=DATABASE_FILE, read_only=False):
+        self.database_file = database_file
+        self.read_only = read_only
+        self._fts_available = None
+        self.conn = None if read_only else connect(database_file)
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = []
+        # 交还的只读连接及其线程局部状态 (data_version、计数、附加的归档)
+        self._idle_readers = []
+        self._readers_lock = threading.Lock()
+        self._read_cache = VersionedReadCache()
+        if read_only:
+            version = get_schema_version(self._read_conn())
+            if version < LATEST_VERSION:
+                self.close()
+                raise sqlite3.DatabaseError(f"账本的 schema 版本 ({version}) 较旧，需要先以读写方式打开一次完成升级")
+        else:
+            init_db(self.conn)
+        # poll_changes 已经报告过 (或由本模型自己写入) 的各表修改计数
+        self._counters_lock = threading.Lock()
+        self._notified_counters = self._read_counters(self._read_conn() if read_only else self.conn)
+
+    def _read_conn(self):
+        """返回当前线程专用的只读连接，首次使用时取一个空闲的连接，没有时新建。"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._readers_lock:
+                state = self._idle_readers.pop() if self._idle_readers else None
+            if state is None:
+                conn = connect(self.database_file, read_only=True)
+                state = {"conn": conn}
+                with self._readers_lock:
+                    self._readers.append(conn)
+            vars(self._local).update(state)
+            conn = state["conn"]
+        return conn
+
+    def release_reader(self):
+        """交还当前线程的只读连接，之后在任意线程中首次读取时复用。
+
+        QThreadPool 的任务每次运行在新的 Python 线程状态上，线程局部的连接不会被下一个
+        任务找到；任务结束时调用本方法，连接数就不会随任务数增长。空闲连接已有
+        MAX_IDLE_READERS 个时直接关闭。交还前应当读完该线程中所有未完成的查询。
+        """
+        state = dict(vars(self._local))
+        vars(self._local).clear()
+        conn = state.get("conn")
+        if conn is None:
+            return
+        with self._readers_lock:
+            if conn not in self._readers:
+                return  # 模型已经关闭
+            if len(self._idle_readers) < MAX_IDLE_READERS:
+                self._idle_readers.append(state)
+                return
+            self._readers.remove(conn)
+        conn.close()
+
+    def _require_writer(self):
+        if self.conn is None:
+            raise sqlite3.OperationalError("账本以只读方式打开或已经关闭，不能修改")
+
+    @staticmethod
+    def _read_counters(conn):
+        return dict(conn.execute("SELECT table_name, counter FROM change_counters").fetchall())
+
+    def _table_versions(self):
+        """返回当前线程读连接看到的各表修改计数。
+
+        PRAGMA data_version 只在其他连接提交后变化，未变化时直接沿用上次读到的计数，
+        因此没有修改时每次检查只需一条不读取任何页的 PRAGMA。
+        """
+        conn = self._read_conn()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if getattr(self._local, "data_version", None) != data_version:
+            self._local.counters = self._read_counters(conn)
+            self._local.data_version = data_version
+        return self._local.counters
+
+    def _cached_read(self, key, tables, fetch):
+        """返回 fetch() 的结果，tables 中各表的修改计数与缓存时一致则直接返回缓存。"""
+        versions = self._table_versions()
+        version = tuple(versions.get(table) for table in tables)
+        hit, value = self._read_cache.get(key, version)
+        if not hit:
+            value = fetch()
+            self._read_cache.put(key, version, value)
+        return value
+
+    def poll_changes(self):
+        """返回自上次调用以来被其他连接或进程修改过的表名集合 (见 migrations.COUNTED_TABLES)。
+
+        本模型自己的写入在提交时即记为已报告，不会出现在结果中。没有任何提交时
+        只执行一条 PRAGMA，可以在界面线程中频繁调用。
+        """
+        with self._counters_lock:
+            versions = self._table_versions()
+            changed = set()
+            for table, counter in versions.items():
+                if counter > self._notified_counters.get(table, 0):
+                    changed.add(table)
+                    self._notified_counters[table] = counter
+            return changed
+
+    @contextlib.contextmanager
+    def _write_transaction(self, baseline=None):
+        """在写锁下执行一个 BEGIN IMMEDIATE 事务，正常结束时提交，抛出异常时回滚。
+
+        提交时如果某张表在事务开始前没有未报告的外部修改，就把本事务造成的计数变化
+        记为已报告，使 poll_changes 只报告其他连接的修改。baseline 为事务之前本模型
+        已经做过的修改开始前的计数 (见 restore_from_snapshot)，指定时代替事务开始时的计数。
+        """
+        with self._write_lock:
+            self._require_writer()
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                before = self._read_counters(self.conn) if baseline is None else baseline
+                yield
+                after = self._read_counters(self.conn)
+                # 提交和登记在同一把锁内，poll_changes 不会看到提交了却尚未登记的计数
+                with self._counters_lock:
+                    self.conn.commit()
+                    for table, counter in after.items():
+                        if self._notified_counters.get(table) == before.get(table):
+                            self._notified_counters[table] = counter
+            except BaseException:
+                self.conn.rollback()
+                raise
+
+    def close(self):
+        """关闭所有数据库连接。可重复调用。"""
+        with self._readers_lock:
+            for reader in self._readers:
+                reader.close()
+            self._readers.clear()
+            self._idle_readers.clear()
+        self._local = threading.local()
+        with self._write_lock:
+            if self.conn is not None:
+                try:
+                    with self.conn:
+                        self.conn.execute(
+                            "DELETE FROM transaction_changes WHERE seq <= "
+                            "(SELECT MAX(seq) FROM transaction_changes) - ?",
+                            (CHANGE_LOG_RETENTION,)
+                        )
+                    # 关闭前合并 WAL，避免日志文件无限增长
+                    self.conn.execute("PRAGMA optimize")
+                    self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except sqlite3.Error as e:
+                    print(f"关闭数据库前整理时出错: {e}")
+                self.conn.close()
+                self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _select_transaction(self, conn, transaction_id, schema="main"):
+        return conn.execute(
+            f"SELECT id, date, description, amount, type FROM {schema}.transactions WHERE id = ?",
+            (transaction_id,)
+        ).fetchone()
+
+    def _archives(self, date_from=None, date_to=None):
+        """返回与 [date_from, date_to] 相交的已归档年份 [(year, file)]，按年份降序。"""
+        archives = self._cached_read(
+            ("archives",), ("archives",),
+            lambda: tuple(self._read_conn().execute("SELECT year, file FROM archives ORDER BY year DESC").fetchall())
         )
-    ''')
-    # 创建 categories 表
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            type TEXT NOT NULL CHECK(type IN ('收入', '支出')) 
+        return [(year, file_name) for year, file_name in archives if year_in_range(year, date_from, date_to)]
+
+    @contextlib.contextmanager
+    def _using_schema(self, archive):
+        """生成 archive (year, file) 附加到当前线程读连接后的模式名，archive 为 None 时为 "main"。
+
+        归档在 with 块内固定，不会因为附加其他归档而被分离；块内执行的语句应当读完再退出。
+        """
+        if archive is None:
+            yield "main"
+            return
+        attached = getattr(self._local, "archives", None)
+        if attached is None:
+            attached = AttachedArchives(self._read_conn(), os.path.dirname(os.path.abspath(self.database_file)))
+            self._local.archives = attached
+        with attached.using(*archive) as schema:
+            yield schema
+
+    def _each_schema(self, date_from=None, date_to=None):
+        """依次生成需要查询的模式名: 主数据库以及与日期范围相交的各个归档 (按年份降序)。
+
+        每个归档轮到它时才附加，调用方取下一个模式名之前应当读完上一个的结果，
+        这样同时附加的归档不超过一个，任意多个年份都可以查询。
+        """
+        for archive in [None] + self._archives(date_from, date_to):
+            with self._using_schema(archive) as schema:
+                yield schema
+
+    @contextlib.contextmanager
+    def unit_of_work(self):
+        """在一个写事务中执行多项修改，生成 UnitOfWork。
+
+        with 块正常结束时一次性提交，抛出异常时回滚全部修改。不能嵌套使用。
+        """
+        # 先读后写: 事务以 BEGIN IMMEDIATE 开始，读到的旧记录在提交前不会被其他连接修改
+        with self._write_transaction():
+            yield UnitOfWork(self.conn)
+
+    def run_unit_of_work(self, work_fn, *args, **kwargs):
+        """在一个事务中执行 work_fn(work, *args, **kwargs)，返回 (success, message, work)。
+
+        work_fn 通常是 UnitOfWork 的方法，例如 run_unit_of_work(UnitOfWork.delete_many, ids)，
+        数千行的修改也只提交一次。失败时全部回滚，work 为 None。
+        """
+        try:
+            with self.unit_of_work() as work:
+                work_fn(work, *args, **kwargs)
+            return True, work.describe(), work
+        except StaleRecordError as e:
+            return False, str(e), None
+        except sqlite3.Error as e:
+            return False, f"修改交易失败: {e}", None
+
+    def replay_journal(self, journal, reverse=False):
+        """在一个事务中重放 (reverse 为 True 时撤销) UnitOfWork.journal，返回值同 run_unit_of_work。"""
+        return self.run_unit_of_work(UnitOfWork.replay, journal, reverse)
+
+    # 增删改方法返回 (success, message, change)，change 为 (旧记录, 新记录)：
+    # 新增时旧记录为 None，删除时新记录为 None，失败时 change 为 None。
+    # 调用方据此只更新受影响的行并按差额调整汇总，而不必重新查询整个账本。
+
+    def add_transaction(self, date, description, amount, transaction_type, currency=DEFAULT_CURRENCY,
+                        category_id=None):
+        """向数据库添加一条新的交易记录，amount 为以分计的整数，category_id 可以为空。"""
+        try:
+            with self.unit_of_work() as work:
+                change = work.add(date, description, amount, transaction_type, currency, category_id)
+            return True, "交易已成功添加。", change
+        except sqlite3.Error as e:
+            return False, f"添加交易失败: {e}", None
+
+    def bulk_add_transactions(self, rows, batch_size=5000, progress_callback=None):
+        """在单个事务中批量写入交易记录。
+
+        rows 为 (date, description, amount, type) 元组的可迭代对象 (可以是生成器，amount 以分计)，
+        元组后面可以再加上币种和类别名称: 类别按名称关联到本账本的类别，不存在时以该行的收支类型
+        新建，同名类别的类型不同时不关联。每 batch_size 行调用一次 executemany。progress_callback(inserted_count) 在每批后
+        调用，返回 False 时取消并回滚整个导入。
+
+        导入期间暂时移除逐行更新汇总表和全文索引的触发器，改为在 Python 中累加汇总、
+        导入结束后用一条 INSERT ... SELECT 补建新行的全文索引；触发器的删除与重建和
+        数据处于同一事务，其他连接不会看到中间状态。
+        """
+        inserted = 0
+        totals = {"收入": [0, 0], "支出": [0, 0]}
+        try:
+            # _write_transaction 显式开启事务，否则 DROP TRIGGER 会在首条 INSERT 之前自动提交
+            with self._write_transaction():
+                max_id_before = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+                suspended_triggers = self._suspend_insert_triggers()
+                category_ids = {}
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        inserted += self._insert_batch(batch, totals, category_ids)
+                        batch = []
+                        if progress_callback is not None and progress_callback(inserted) is False:
+                            raise ImportCancelled()
+                if batch:
+                    inserted += self._insert_batch(batch, totals, category_ids)
+                    if progress_callback is not None:
+                        progress_callback(inserted)
+                self.conn.executemany(
+                    "UPDATE transaction_totals SET total = total + ?, count = count + ? WHERE type = ?",
+                    [(total, count, type_) for type_, (total, count) in totals.items()]
+                )
+                if any("trg_transactions_fts_insert" in sql for sql in suspended_triggers):
+                    self.conn.execute(
+                        "INSERT INTO transactions_fts (rowid, description) "
+                        "SELECT id, description FROM transactions WHERE id > ?",
+                        (max_id_before,)
+                    )
+                # 逐行计数的触发器已暂停，整个导入只让修改计数加一
+                self.conn.execute(
+                    "UPDATE change_counters SET counter = counter + 1 WHERE table_name = 'transactions'"
+                )
+                for trigger_sql in suspended_triggers:
+                    self.conn.execute(trigger_sql)
+            return True, f"已成功导入 {inserted} 条交易。"
+        except ImportCancelled:
+            return False, "导入已取消，未写入任何交易。"
+        except sqlite3.Error as e:
+            return False, f"批量导入交易失败: {e}"
+
+    def _suspend_insert_triggers(self):
+        """删除 transactions 上逐行维护汇总表、全文索引和修改计数的 INSERT 触发器，返回用于重建的 SQL。"""
+        triggers = self.conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'transactions' "
+            "AND name IN ('trg_transactions_totals_insert', 'trg_transactions_fts_insert', "
+            "'trg_transactions_counter_insert')"
+        ).fetchall()
+        for name, _ in triggers:
+            self.conn.execute(f"DROP TRIGGER {name}")
+        return [sql for _, sql in triggers]
+
+    def _insert_batch(self, batch, totals, category_ids):
+        rows = []
+        for row in batch:
+            # 只有四个字段的行补上默认币种和空类别
+            date, description, amount, transaction_type, currency, category = (*row, None, None)[:6]
+            category_id = self._import_category_id(category, transaction_type, category_ids) if category else None
+            rows.append((date, description, amount, transaction_type, currency or DEFAULT_CURRENCY, category_id))
+            entry = totals[transaction_type]
+            entry[0] += amount
+            entry[1] += 1
+        self.conn.executemany(
+            "INSERT INTO transactions (date, description, amount, type, currency, category_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
         )
-    ''')
-    conn.commit()
-    conn.close()
+        return len(rows)
 
-class TransactionModel:
-    """处理所有与交易数据相关的数据库操作。"""
-    def __init__(self):
-        init_db()  
-
-    def add_transaction(self, date, description, amount, transaction_type):
-        """向数据库添加一条新的交易记录。"""
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                "INSERT INTO transactions (date, description, amount, type) VALUES (?, ?, ?, ?)",
-                (date, description, amount, transaction_type)
-            )
-            conn.commit()
-            return True, "交易已成功添加。"
-        except sqlite3.Error as e:
-            return False, f"添加交易失败: {e}"
-        finally:
-            conn.close()
+    def _import_category_id(self, name, transaction_type, category_ids):
+        """返回导入行的类别名称在本账本中的ID，结果缓存在 category_ids 中。"""
+        key = (name, transaction_type)
+        if key not in category_ids:
+            row = self.conn.execute("SELECT id, type FROM categories WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                category_ids[key] = self.conn.execute(
+                    "INSERT INTO categories (name, type) VALUES (?, ?)", (name, transaction_type)
+                ).lastrowid
+            else:
+                # 类别名称在账本中唯一，类型不同的同名类别不能关联
+                category_ids[key] = row[0] if row[1] == transaction_type else None
+        return category_ids[key]
 
     def get_all_transactions(self):
         """获取所有交易记录，按日期和ID降序排列。"""
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
         try:
-            cursor.execute("SELECT id, date, description, amount, type FROM transactions ORDER BY date DESC, id DESC")
-            return cursor.fetchall()
+            conn = self._read_conn()
+            partitions = [
+                conn.execute(f"SELECT id, date, description, amount, type FROM {schema}.transactions "
+                             "ORDER BY date DESC, id DESC").fetchall()
+                for schema in self._each_schema()
+            ]
+            return list(merge_sorted(partitions, _date_id_key, reverse=True))
         except sqlite3.Error as e:
             print(f"获取交易记录时出错: {e}")
             return []
+
+    def get_transactions_page(self, cursor=None, page_size=200, date_from=None, date_to=None,
+                              transaction_type=None, min_amount=None, max_amount=None, description=None):
+        """按日期和ID降序获取一页交易记录，可选按条件筛选。
+
+        cursor 为上一页最后一条记录的 (date, id)，为 None 时从头开始。翻页使用键集
+        条件 (date, id) < cursor 而非 OFFSET，配合索引每页只读取 page_size 行。
+        筛选条件: date_from/date_to 为闭区间日期 (yyyy-MM-dd)，transaction_type 为
+        '收入' 或 '支出'，min_amount/max_amount 为以分计的闭区间金额，description 为描述子串。
+        返回 (rows, next_cursor)，没有更多数据时 next_cursor 为 None。
+        """
+        clauses, params = build_transaction_filters(date_from, date_to, transaction_type,
+                                                    min_amount, max_amount, description)
+        if cursor is not None:
+            clauses.append("(date, id) < (?, ?)")
+            params.extend(cursor)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+
+        def select_page(schema):
+            return self._read_conn().execute(
+                f"SELECT id, date, description, amount, type FROM {schema}.transactions "
+                f"{where}ORDER BY date DESC, id DESC LIMIT ?",
+                (*params, page_size)
+            ).fetchall()
+
+        def fetch():
+            rows = select_page("main")
+            # 按年份从新到旧合并归档: 本页已满且最后一条比某年份的最后一天更新时，
+            # 该年份及更早的年份都不可能进入本页，不必打开它们的文件
+            for year, file_name in self._archives(date_from, cursor[0] if cursor is not None else date_to):
+                if len(rows) == page_size and rows[-1][1] > year_bounds(year)[1]:
+                    break
+                with self._using_schema((year, file_name)) as schema:
+                    archived = select_page(schema)
+                rows = list(itertools.islice(merge_sorted((rows, archived), _date_id_key, reverse=True), page_size))
+            return tuple(rows), ((rows[-1][1], rows[-1][0]) if len(rows) == page_size else None)
+        try:
+            key = ("page", tuple(cursor) if cursor is not None else None, page_size, *params)
+            rows, next_cursor = self._cached_read(key, ("transactions", "archives"), fetch)
+        except sqlite3.Error as e:
+            print(f"分页获取交易记录时出错: {e}")
+            return [], None
+        # 表格会修补返回的列表，交出副本以免改动缓存
+        return list(rows), next_cursor
+
+    def iter_transaction_batches(self, batch_size=5000, date_from=None, date_to=None, transaction_type=None,
+                                 min_amount=None, max_amount=None, description=None, detailed=False):
+        """按日期和ID升序逐批生成交易记录 (id, date, description, amount, type)，筛选条件同 get_transactions_page。
+
+        detailed 为 True 时每行后面多出币种、类别ID和类别名称 (没有类别时为 None)，供导出使用。
+
+        没有涉及归档时整个遍历只执行一条 SELECT，用 fetchmany 每次取 batch_size 行，内存占用与总行数无关，
+        并且所有批次读取的是同一个一致的快照。数据库错误以 sqlite3.Error 抛出，由调用方决定如何处理。
+        生成器必须在创建它的线程中消费完 (或关闭)。日期范围涉及归档年份时，主数据库和各个归档都以
+        键集条件逐批读取 (见 _iter_keyset_batches)，按 (date, id) 归并后重新分批；此时各批分别查询，
+        遍历期间其他连接提交的修改可能部分可见。
+        """
+        clauses, params = build_transaction_filters(date_from, date_to, transaction_type,
+                                                    min_amount, max_amount, description)
+        # 归档中的类别ID同样指向主数据库的 categories
+        columns = ("id, date, description, amount, type, currency, category_id, "
+                   "(SELECT name FROM categories WHERE categories.id = category_id)" if detailed
+                   else "id, date, description, amount, type")
+        archives = self._archives(date_from, date_to)
+        if not archives:
+            where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+            yield from self._iter_batches(f"SELECT {columns} FROM main.transactions {where}ORDER BY date, id",
+                                          params, batch_size)
+            return
+        main_rows = itertools.chain.from_iterable(
+            self._iter_keyset_batches(None, columns, clauses, params, batch_size))
+        # 各年份的日期互不相交，按年份升序依次读取即为有序，同一时刻只占用一个归档
+        archived_rows = (row for archive in reversed(archives)
+                         for batch in self._iter_keyset_batches(archive, columns, clauses, params, batch_size)
+                         for row in batch)
+        rows = merge_sorted([main_rows, archived_rows], _date_id_key)
+        while batch := list(itertools.islice(rows, batch_size)):
+            yield batch
+
+    def _iter_keyset_batches(self, archive, columns, clauses, params, batch_size):
+        """按 (date, id) 升序逐批读取一个分区 (archive 为 None 时为主数据库)。
+
+        每批一条以 (date, id) > 上一批最后一行 续读的语句，读完即结束，批与批之间不占用归档。
+        """
+        conn = self._read_conn()
+        cursor = ()
+        while True:
+            batch_clauses = clauses + ["(date, id) > (?, ?)"] if cursor else clauses
+            where = f"WHERE {' AND '.join(batch_clauses)} " if batch_clauses else ""
+            with self._using_schema(archive) as schema:
+                rows = conn.execute(
+                    f"SELECT {columns} FROM {schema}.transactions {where}ORDER BY date, id LIMIT ?",
+                    (*params, *cursor, batch_size)
+                ).fetchall()
+            if rows:
+                yield rows
+            if len(rows) < batch_size:
+                return
+            cursor = (rows[-1][1], rows[-1][0])
+
+    def iter_category_batches(self, batch_size=5000):
+        """按类型和名称逐批生成类别 (id, name, type)，方式同 iter_transaction_batches。"""
+        yield from self._iter_batches("SELECT id, name, type FROM categories ORDER BY type, name", (), batch_size)
+
+    def _iter_batches(self, sql, params, batch_size):
+        cursor = self._read_conn().execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
         finally:
-            conn.close()
+            cursor.close()
+
+    def search(self, query, limit=100):
+        """在交易描述中搜索，返回最多 limit 条记录 (id, date, description, amount, type)。
+
+        以空白分隔的多个词须同时出现。词长不少于 3 个字符时走 FTS5 trigram 索引，在最近的
+        SEARCH_CANDIDATES 条匹配中按 bm25 相关度排序 (相同时按日期降序)；更短的词无法使用
+        trigram 索引，退回到按 (date, id) 索引倒序扫描的 LIKE 匹配，找满 limit 条即停止。
+        主数据库的结果不足 limit 条时，再按年份从新到旧以 LIKE 匹配补充归档中的交易。
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        clauses, params = [], []
+        for term in terms:
+            term_clauses, term_params = build_transaction_filters(description=term)
+            clauses.extend(term_clauses)
+            params.extend(term_params)
+
+        def like_search(schema, count):
+            return conn.execute(
+                f"SELECT id, date, description, amount, type FROM {schema}.transactions "
+                f"WHERE {' AND '.join(clauses)} ORDER BY date DESC, id DESC LIMIT ?",
+                (*params, count)
+            ).fetchall()
+        try:
+            conn = self._read_conn()
+            if min(len(term) for term in terms) >= 3 and self._has_fts(conn):
+                match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+                rows = conn.execute(
+                    "SELECT t.id, t.date, t.description, t.amount, t.type FROM ("
+                    "    SELECT rowid, bm25(transactions_fts) AS score FROM transactions_fts "
+                    "    WHERE transactions_fts MATCH ? ORDER BY rowid DESC LIMIT ?"
+                    ") AS hits JOIN transactions AS t ON t.id = hits.rowid "
+                    "ORDER BY hits.score, t.date DESC, t.id DESC LIMIT ?",
+                    (match, self.SEARCH_CANDIDATES, limit)
+                ).fetchall()
+            else:
+                rows = like_search("main", limit)
+            for year, file_name in self._archives():
+                if len(rows) >= limit:
+                    break
+                seen = {row[0] for row in rows}
+                with self._using_schema((year, file_name)) as schema:
+                    rows.extend(row for row in like_search(schema, limit - len(rows)) if row[0] not in seen)
+            return rows
+        except sqlite3.Error as e:
+            print(f"搜索交易时出错: {e}")
+            return []
+
+    def _has_fts(self, conn):
+        if self._fts_available is None:
+            self._fts_available = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+            ).fetchone() is not None
+        return self._fts_available
 
     def delete_transaction(self, transaction_id):
         """根据ID删除一条交易记录。"""
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
         try:
-            cursor.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
-            conn.commit()
-            return True, f"交易记录 (ID: {transaction_id}) 已成功删除。"
+            with self.unit_of_work() as work:
+                change = work.delete(transaction_id)
+            if change is None:
+                return False, f"未找到ID为 {transaction_id} 的交易记录。", None
+            return True, f"交易记录 (ID: {transaction_id}) 已成功删除。", change
         except sqlite3.Error as e:
-            return False, f"删除交易记录失败: {e}"
-        finally:
-            conn.close()
-            
+            return False, f"删除交易记录失败: {e}", None
+
     def update_transaction(self, transaction_id, date, description, amount, transaction_type):
-        """根据ID更新一条现有的交易记录。"""
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                "UPDATE transactions SET date=?, description=?, amount=?, type=? WHERE id=?",
-                (date, description, amount, transaction_type, transaction_id)
-            )
-            conn.commit()
-            return True, f"交易 (ID: {transaction_id}) 已成功更新。"
-        except sqlite3.Error as e:
-            return False, f"更新交易失败: {e}"
-        finally:
-            conn.close()
+        """根据ID更新一条现有的交易记录，amount 为以分计的整数，币种保持不变。"""
+        try:
+            with self.unit_of_work() as work:
+                change = work.update(transaction_id, date, description, amount, transaction_type)
+            if change is None:
+                return False, f"未找到ID为 {transaction_id} 的交易记录。", None
+            return True, f"交易 (ID: {transaction_id}) 已成功更新。", change
+        except sqlite3.Error as e:
+            return False, f"更新交易失败: {e}", None
 
     def get_transaction_by_id(self, transaction_id):
-        """根据ID获取单条交易记录。"""
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
+        """根据ID获取单条交易记录，主数据库中没有时依次查找各个归档。"""
+        def fetch():
+            conn = self._read_conn()
+            row = self._select_transaction(conn, transaction_id)
+            for year, file_name in self._archives():
+                if row is not None:
+                    break
+                with self._using_schema((year, file_name)) as schema:
+                    row = self._select_transaction(conn, transaction_id, schema)
+            return row
         try:
-            cursor.execute("SELECT id, date, description, amount, type FROM transactions WHERE id = ?", (transaction_id,))
-            return cursor.fetchone() 
+            return self._cached_read(("transaction", transaction_id), ("transactions", "archives"), fetch)
         except sqlite3.Error as e:
             print(f"获取交易记录 (ID: {transaction_id}) 时出错: {e}")
             return None
-        finally:
-            conn.close()
+
+    def get_transaction_category(self, transaction_id):
+        """返回交易关联的类别ID，未关联类别或交易不存在时返回 None。"""
+        try:
+            row = self._read_conn().execute(
+                "SELECT category_id FROM transactions WHERE id = ?", (transaction_id,)
+            ).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"获取交易类别 (ID: {transaction_id}) 时出错: {e}")
+            return None
 
     def add_category(self, name, category_type):
         """向数据库添加一个新的类别。"""
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                "INSERT INTO categories (name, type) VALUES (?, ?)",
-                (name, category_type)
-            )
-            conn.commit()
+        try:
+            with self._write_transaction():
+                self.conn.execute(
+                    "INSERT INTO categories (name, type) VALUES (?, ?)",
+                    (name, category_type)
+                )
             return True, f"类别 '{name}' 已成功添加。"
         except sqlite3.IntegrityError: 
             return False, f"类别 '{name}' 已存在。"
         except sqlite3.Error as e:
             return False, f"添加类别失败: {e}"
-        finally:
-            conn.close()
 
     def get_categories(self, category_type=None):
         """获取类别列表，可选按类型（'收入' 或 '支出'）筛选。"""
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        try:
+        def fetch():
             if category_type:
-                cursor.execute("SELECT id, name, type FROM categories WHERE type = ? ORDER BY name ASC", (category_type,))
+                cursor = self._read_conn().execute("SELECT id, name, type FROM categories WHERE type = ? ORDER BY name ASC", (category_type,))
             else:
-                cursor.execute("SELECT id, name, type FROM categories ORDER BY type ASC, name ASC")
-            return cursor.fetchall()
+                cursor = self._read_conn().execute("SELECT id, name, type FROM categories ORDER BY type ASC, name ASC")
+            return tuple(cursor.fetchall())
+        try:
+            return list(self._cached_read(("categories", category_type), ("categories",), fetch))
         except sqlite3.Error as e:
             print(f"获取类别时出错: {e}")
             return []
-        finally:
-            conn.close()
+
+    def get_category_month_totals(self, month):
+        """返回所有类别及其在 month (yyyy-MM) 的金额和笔数: [(id, name, type, total, count)]。
+
+        读取触发器维护的 category_month_totals，一条查询的代价只与类别数量有关，与交易数量无关。
+        结果按类型和名称排序，没有交易的类别金额和笔数为 0。
+        """
+        def fetch():
+            return tuple(self._read_conn().execute(
+                "SELECT categories.id, categories.name, categories.type, "
+                "COALESCE(totals.total, 0), COALESCE(totals.count, 0) FROM categories "
+                "LEFT JOIN category_month_totals AS totals "
+                "ON totals.month = ? AND totals.category_id = categories.id "
+                "ORDER BY categories.type ASC, categories.name ASC",
+                (month,)
+            ).fetchall())
+        try:
+            return list(self._cached_read(("category_month_totals", month), ("categories", "transactions"), fetch))
+        except sqlite3.Error as e:
+            print(f"获取类别月度汇总时出错: {e}")
+            return []
 
     def get_summary_stats(self):
-        """计算并返回总收入、总支出和净额。"""
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        total_income = 0.0
-        total_expense = 0.0
-        try:
-            cursor.execute("SELECT amount, type FROM transactions")
-            records = cursor.fetchall()
-            for record in records:
-                amount, type_ = record
-                if type_ == "收入":
-                    total_income += amount
-                elif type_ == "支出":
-                    total_expense += amount
-            
-            net_balance = total_income - total_expense
-            return total_income, total_expense, net_balance
+        """返回以分计的总收入、总支出和净额。
+
+        直接读取触发器维护的汇总表，加上归档登记表中各年份的合计，不扫描交易，也不打开归档文件。
+        """
+        try:
+            # 汇总表随交易一起变化，以 transactions 的修改计数作为版本
+            totals = dict(self._cached_read(
+                ("summary",), ("transactions", "archives"),
+                lambda: tuple(self._read_conn().execute(
+                    "SELECT type, total + (SELECT COALESCE(SUM(CASE WHEN transaction_totals.type = '收入' "
+                    "THEN income ELSE expense END), 0) FROM archives) FROM transaction_totals"
+                ).fetchall())
+            ))
         except sqlite3.Error as e:
             print(f"计算汇总统计时出错: {e}")
-            return 0.0, 0.0, 0.0
-        finally:
-            conn.close()
+            return 0, 0, 0
+        total_income = totals.get("收入", 0)
+        total_expense = totals.get("支出", 0)
+        return total_income, total_expense, total_income - total_expense
+
+    def get_daily_totals(self, date_from, date_to):
+        """用一条分组查询返回 [date_from, date_to] 内每天的 (date, 收入, 支出, 笔数)。
+
+        没有交易的日期不出现在结果中，结果按日期升序排列。区间涉及归档年份时，
+        各个文件分别分组后按日期合并。
+        """
+        try:
+            conn = self._read_conn()
+            partitions = [conn.execute(
+                "SELECT date, "
+                "COALESCE(SUM(CASE WHEN type = '收入' THEN amount END), 0), "
+                "COALESCE(SUM(CASE WHEN type = '支出' THEN amount END), 0), "
+                f"COUNT(*) FROM {schema}.transactions WHERE date BETWEEN ? AND ? GROUP BY date ORDER BY date",
+                (date_from, date_to)
+            ).fetchall() for schema in self._each_schema(date_from, date_to)]
+        except sqlite3.Error as e:
+            print(f"获取每日汇总时出错: {e}")
+            return []
+        return merge_period_totals(partitions)
+
+    def get_monthly_totals(self, date_from=None, date_to=None):
+        """返回 [date_from, date_to] (可以不限) 内每月的 (yyyy-MM, 收入, 支出, 笔数)，按月份升序。
+
+        分组在 SQLite 中完成，只返回月份数量的行；涉及归档年份时各个文件分别分组后合并。
+        """
+        clauses, params = build_transaction_filters(date_from, date_to)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        try:
+            conn = self._read_conn()
+            partitions = [conn.execute(
+                "SELECT substr(date, 1, 7) AS month, "
+                "COALESCE(SUM(CASE WHEN type = '收入' THEN amount END), 0), "
+                "COALESCE(SUM(CASE WHEN type = '支出' THEN amount END), 0), "
+                f"COUNT(*) FROM {schema}.transactions {where}GROUP BY month ORDER BY month",
+                params
+            ).fetchall() for schema in self._each_schema(date_from, date_to)]
+        except sqlite3.Error as e:
+            print(f"获取每月汇总时出错: {e}")
+            return []
+        return merge_period_totals(partitions)
+
+    def verify_summary_stats(self, repair=False):
+        """从交易表重新计算汇总，与汇总表比较并返回偏差。
+
+        返回 {type: {"stored": (total, count), "actual": (total, count)}}，只包含
+        存在偏差的类型；repair 为 True 时用重新计算的结果覆盖汇总表。
+        """
+        try:
+            with self._write_transaction():
+                stored = {type_: (total, count) for type_, total, count in
+                          self.conn.execute("SELECT type, total, count FROM transaction_totals")}
+                actual = {type_: (total, count) for type_, total, count in self.conn.execute(
+                    "SELECT type, COALESCE(SUM(amount), 0), COUNT(*) FROM transactions GROUP BY type")}
+                drift = {}
+                for type_ in ("收入", "支出"):
+                    stored_total, stored_count = stored.get(type_, (0, 0))
+                    actual_total, actual_count = actual.get(type_, (0, 0))
+                    # 金额为整数，汇总没有舍入误差，可以精确比较
+                    if (stored_total, stored_count) != (actual_total, actual_count):
+                        drift[type_] = {"stored": (stored_total, stored_count),
+                                        "actual": (actual_total, actual_count)}
+                if repair and drift:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO transaction_totals (type, total, count) VALUES (?, ?, ?)",
+                        [(type_, *values["actual"]) for type_, values in drift.items()]
+                    )
+                    # 汇总表没有计数触发器，让缓存的汇总和其他进程随交易一起失效
+                    self.conn.execute(
+                        "UPDATE change_counters SET counter = counter + 1 WHERE table_name = 'transactions'"
+                    )
+            return drift
+        except sqlite3.Error as e:
+            print(f"校验汇总统计时出错: {e}")
+            return {}
+
+    def restore_from_snapshot(self, snapshot_path, progress_callback=None):
+        """用快照 (见 model.backup) 覆盖当前数据库，返回 (success, message)。
+
+        复制在写锁下分步进行，完成前其他连接看到的仍是原来的数据，取消或失败时原数据不变。
+        写连接就是复制的目标，写锁在整个复制期间保持 (这是有意的): 本模型的其他修改会等到
+        恢复结束后才执行，不会穿插在复制的各步之间；调用方应在恢复期间拒绝新的修改。
+        恢复后各表的修改计数调到高于恢复前的值并清空变更日志，读缓存和其他进程都会把恢复
+        当作一次修改，分析引擎等增量读者全量重建；与本模型自己的写入一样，恢复不会出现在
+        poll_changes 的结果中，由调用方刷新界面。快照的 schema 较旧时接着执行迁移。
+        progress_callback 同 model.backup.create_snapshot。
+        """
+        try:
+            snapshot = sqlite3.connect(f"file:{os.path.abspath(snapshot_path)}?mode=ro", uri=True)
+            try:
+                with self._write_lock:
+                    self._require_writer()
+                    counters = self._read_counters(self.conn)
+                    last_seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM transaction_changes").fetchone()[0]
+                    copy_database(snapshot, self.conn, progress_callback=progress_callback)
+                    init_db(self.conn)
+                    # 以恢复前的计数为基准登记，恢复本身不会被 poll_changes 当作外部修改再报告一次
+                    with self._write_transaction(baseline=counters):
+                        self.conn.executemany(
+                            "INSERT INTO change_counters (table_name, counter) VALUES (?, ?) "
+                            "ON CONFLICT (table_name) DO UPDATE SET counter = MAX(counter, excluded.counter)",
+                            [(table, counter + 1) for table, counter in counters.items()]
+                        )
+                        # 变更日志的序号越过恢复前的最大值并留出空档，读者据此判断需要全量重建
+                        self.conn.execute("DELETE FROM transaction_changes")
+                        self.conn.execute("INSERT INTO transaction_changes (seq, transaction_id) VALUES (?, 0)",
+                                          (last_seq + 2,))
+            finally:
+                snapshot.close()
+        except BackupCancelled:
+            return False, "恢复已取消，数据库未被修改。"
+        except sqlite3.Error as e:
+            return False, f"从快照恢复失败: {e}"
+        self._fts_available = None
+        self._read_cache.clear()
+        return True, f"已从快照 {os.path.basename(snapshot_path)} 恢复。"
+
+    def get_archives(self):
+        """返回已归档的年份: [(year, file, income, income_count, expense, expense_count)]，按年份降序。"""
+        try:
+            return self._read_conn().execute(
+                "SELECT year, file, income, income_count, expense, expense_count FROM archives ORDER BY year DESC"
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"获取归档列表时出错: {e}")
+            return []
+
+    def get_archivable_years(self):
+        """返回主数据库中仍有交易、并且已经结束的年份，按年份升序。
+
+        每个年份只需一次索引查找，不扫描交易。
+        """
+        years = []
+        try:
+            conn = self._read_conn()
+            current_year = datetime.date.today().year
+            year = 0
+            while True:
+                row = conn.execute("SELECT MIN(date) FROM transactions WHERE date >= ?",
+                                   (year_bounds(year)[0],)).fetchone()
+                if row[0] is None or int(row[0][:4]) >= current_year:
+                    return years
+                year = int(row[0][:4])
+                years.append(year)
+                year += 1
+        except (sqlite3.Error, ValueError) as e:
+            print(f"获取可归档年份时出错: {e}")
+            return years
+
+    def archive_year(self, year):
+        """把 year 年 (必须早于今年) 的交易移到年度归档文件，返回 (success, message, archived_count)。
+
+        分两步进行: 先把交易复制到归档文件并提交，再在一个事务中从主数据库删除已复制的交易、
+        登记归档年份及其收支合计。两个文件不在同一事务中，中途失败时交易可能同时存在于两边
+        (读取时去重)，但不会丢失；重新归档同一年份是安全的，会补齐遗漏的交易。
+        """
+        if year >= datetime.date.today().year:
+            return False, "只能归档已经结束的年份。", 0
+        file_name = archive_file_name(self.database_file, year)
+        path = os.path.join(os.path.dirname(os.path.abspath(self.database_file)), file_name)
+        date_from, date_to = year_bounds(year)
+        columns = "id, date, description, amount, currency, type, category_id"
+        try:
+            with self._write_lock:
+                self._require_writer()
+                self.conn.execute("ATTACH DATABASE ? AS archive_target", (path,))
+                try:
+                    # 归档文件使用回滚日志，提交即 fsync，确保删除主数据库中的交易之前数据已经落盘
+                    self.conn.execute("PRAGMA archive_target.synchronous=FULL")
+                    create_archive_tables(self.conn, "archive_target")
+                    with self.conn:
+                        self.conn.execute(
+                            f"INSERT OR IGNORE INTO archive_target.transactions ({columns}) "
+                            f"SELECT {columns} FROM main.transactions WHERE date BETWEEN ? AND ?",
+                            (date_from, date_to)
+                        )
+                    with self._write_transaction():
+                        archived = self.conn.execute(
+                            "DELETE FROM main.transactions WHERE date BETWEEN ? AND ? "
+                            "AND id IN (SELECT id FROM archive_target.transactions)",
+                            (date_from, date_to)
+                        ).rowcount
+                        totals = {type_: (total, count) for type_, total, count in self.conn.execute(
+                            "SELECT type, SUM(amount), COUNT(*) FROM archive_target.transactions GROUP BY type")}
+                        self.conn.execute(
+                            "INSERT OR REPLACE INTO archives "
+                            "(year, file, income, income_count, expense, expense_count) VALUES (?, ?, ?, ?, ?, ?)",
+                            (year, file_name, *totals.get("收入", (0, 0)), *totals.get("支出", (0, 0)))
+                        )
+                finally:
+                    self.conn.execute("DETACH DATABASE archive_target")
+        except sqlite3.Error as e:
+            return False, f"归档 {year} 年的交易失败: {e}", 0
+        return True, f"已将 {year} 年的 {archived} 条交易归档到 {file_name}。", archived
+
+    def iter_analytics_rows(self, after_id=0, batch_size=50000):
+        """按 ID 升序分批生成 id > after_id 的交易，供分析引擎构建列式数组。
+
+        每批是 (id, day, cents, is_expense, description) 元组的列表，日期和金额的换算在
+        SQLite 中完成: day 为 1970-01-01 起的天数，cents 为以分计的整数金额。
+        存在归档时，各个文件分别按 ID 分批读取后归并。数据库错误以 sqlite3.Error 抛出，
+        不会以不完整的数据结束。
+        """
+        archives = self._archives()
+        if not archives:
+            yield from self._iter_analytics_partition(None, after_id, batch_size)
+            return
+        rows = merge_sorted([itertools.chain.from_iterable(self._iter_analytics_partition(archive, after_id, batch_size))
+                             for archive in [None] + archives], operator.itemgetter(0))
+        while batch := list(itertools.islice(rows, batch_size)):
+            yield batch
+
+    def _iter_analytics_partition(self, archive, after_id, batch_size):
+        # 每批一条读完即结束的语句，批与批之间不占用归档，超过附加上限的多个归档也能交替读取
+        conn = self._read_conn()
+        while True:
+            with self._using_schema(archive) as schema:
+                rows = conn.execute(
+                    f"SELECT {ANALYTICS_COLUMNS} FROM {schema}.transactions WHERE id > ? ORDER BY id LIMIT ?",
+                    (after_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+
+    def get_analytics_rows(self, transaction_ids):
+        """按 ID 获取交易的分析列 (格式同 iter_analytics_rows)，已删除的 ID 不会出现在结果中。
+
+        主数据库中找不到的 ID 再到各个归档中查找 (归档刚完成时，被移走的交易会出现在变更日志中)。
+        数据库错误以 sqlite3.Error 抛出: 少返回的行会被当作已删除，不能以部分结果代替。
+        """
+        rows = []
+        ids = list(transaction_ids)
+        conn = self._read_conn()
+        for archive in [None] + self._archives():
+            if not ids:
+                break
+            found = []
+            with self._using_schema(archive) as schema:
+                # 分段查询，避免超过 SQLite 的参数个数上限
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    found.extend(conn.execute(
+                        f"SELECT {ANALYTICS_COLUMNS} FROM {schema}.transactions "
+                        f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                        chunk
+                    ).fetchall())
+            rows.extend(found)
+            found_ids = {row[0] for row in found}
+            ids = [transaction_id for transaction_id in ids if transaction_id not in found_ids]
+        return rows
+
+    def get_changes_since(self, seq):
+        """返回 (latest_seq, changed_ids)：变更日志中 seq 之后被修改或删除的交易 ID。
+
+        seq 之后的部分条目已被清理时 changed_ids 为 None，调用方应全量重新加载。
+        读取失败时同样返回 (seq, None)。
+        """
+        try:
+            conn = self._read_conn()
+            first_seq, latest_seq = conn.execute(
+                "SELECT MIN(seq), MAX(seq) FROM transaction_changes"
+            ).fetchone()
+            if latest_seq is None:
+                return seq, []
+            if first_seq > seq + 1:
+                return latest_seq, None
+            changed = conn.execute(
+                "SELECT DISTINCT transaction_id FROM transaction_changes WHERE seq > ? AND seq <= ?",
+                (seq, latest_seq)
+            ).fetchall()
+            return latest_seq, [row[0] for row in changed]
+        except sqlite3.Error as e:
+            print(f"读取变更日志时出错: {e}")
+            return seq, None
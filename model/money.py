@@ -0,0 +1,34 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# 金额在数据库和程序内部一律以最小货币单位 (人民币为分) 的整数表示，
+# 求和与比较都是精确的；只有在解析输入和显示时才与小数文本相互转换。
+
+DEFAULT_CURRENCY = "CNY"
+# 各币种最小单位对应的小数位数，未列出的币种按 2 位处理
+CURRENCY_EXPONENTS = {"JPY": 0, "KRW": 0}
+
+def currency_exponent(currency=DEFAULT_CURRENCY):
+    return CURRENCY_EXPONENTS.get(currency, 2)
+
+def to_minor_units(value, currency=DEFAULT_CURRENCY):
+    """把金额文本或数字转换为最小货币单位的整数，超出精度的部分四舍五入。
+
+    无法解析时抛出 ValueError。浮点数先转为其最短的十进制表示，避免 0.1 之类的误差。
+    """
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"无效的金额: {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"无效的金额: {value!r}")
+    return int(amount.scaleb(currency_exponent(currency)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def format_amount(minor_units, currency=DEFAULT_CURRENCY):
+    """把最小货币单位的整数格式化为显示文本，例如 123456 -> "1234.56"。"""
+    exponent = currency_exponent(currency)
+    minor_units = int(minor_units)
+    if exponent == 0:
+        return str(minor_units)
+    whole, fraction = divmod(abs(minor_units), 10 ** exponent)
+    sign = "-" if minor_units < 0 else ""
+    return f"{sign}{whole}.{fraction:0{exponent}d}"
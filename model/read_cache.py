@@ -0,0 +1,42 @@
+import threading
+from collections import OrderedDict
+
+# TransactionModel 热点读取的缓存。每个条目记录读取时所依赖各表的修改计数
+# (见 migrations.COUNTED_TABLES)，计数不变就说明数据没有变化，可以直接返回缓存，
+# 任何进程修改了这些表都会让条目自然失效，不需要显式清理。
+
+class VersionedReadCache:
+    """以表版本为有效性标记的 LRU 缓存，可在多个线程中同时使用。
+
+    值应当是不可变的 (元组等)，调用方需要可修改的结果时自行复制。
+    """
+    MAX_ENTRIES = 256
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (版本标记, 值)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        """返回 (命中, 值)；条目不存在或版本不一致时视为未命中。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,156 @@
+from collections import deque
+
+from model.money import DEFAULT_CURRENCY
+
+# 工作单元: 在一个 SQLite 事务中执行任意多条交易的增删改，只提交 (fsync) 一次，
+# 同时为每项修改记录 (旧行, 新行) 日志。日志可以反向重放以撤销修改，再正向重放以重做。
+
+TRANSACTION_ROW_COLUMNS = "id, date, description, amount, type, currency, category_id"
+
+# UnitOfWork.update 的 category_id 默认值: 保持原类别 (None 表示清除类别)
+KEEP = object()
+
+class StaleRecordError(Exception):
+    """重放日志时交易的当前状态与日志不符 (已被其他操作修改或删除)。"""
+
+class UnitOfWork:
+    """由 TransactionModel.unit_of_work() 创建，只能在其 with 块内、创建它的线程中使用。
+
+    changes 为 (旧记录, 新记录) 列表，格式同 TransactionModel 增删改方法返回的 change；
+    journal 为对应的 (旧行, 新行) 列表，行在记录之后多出币种和类别ID，足以原样重建被删除的交易。
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.changes = []
+        self.journal = []
+
+    def _select_row(self, transaction_id):
+        return self.conn.execute(
+            f"SELECT {TRANSACTION_ROW_COLUMNS} FROM transactions WHERE id = ?", (transaction_id,)
+        ).fetchone()
+
+    def _record(self, old_row, new_row):
+        self.journal.append((old_row, new_row))
+        self.changes.append((old_row and old_row[:5], new_row and new_row[:5]))
+        return self.changes[-1]
+
+    def add(self, date, description, amount, transaction_type, currency=DEFAULT_CURRENCY, category_id=None,
+            transaction_id=None):
+        """新增一条交易并返回 change。指定 transaction_id 时以该 ID 插入 (用于撤销删除)。"""
+        cursor = self.conn.execute(
+            "INSERT INTO transactions (id, date, description, amount, type, currency, category_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (transaction_id, date, description, amount, transaction_type, currency, category_id)
+        )
+        if transaction_id is not None:
+            # 变更日志的触发器只记录更新和删除，新增的行按 ID 大于已知最大值识别；
+            # 以旧 ID 重新插入的行需要显式记录，分析引擎才能发现它
+            self.conn.execute("INSERT INTO transaction_changes (transaction_id) VALUES (?)", (transaction_id,))
+        return self._record(None, self._select_row(cursor.lastrowid))
+
+    def update(self, transaction_id, date=None, description=None, amount=None, transaction_type=None,
+               category_id=KEEP):
+        """更新一条交易，参数为 None 的字段保持不变 (category_id 不传时保持不变，为 None 时清除)。
+
+        返回 change，交易不存在时返回 None。
+        """
+        old_row = self._select_row(transaction_id)
+        if old_row is None:
+            return None
+        values = tuple(old if new is None else new
+                       for old, new in zip(old_row[1:5], (date, description, amount, transaction_type)))
+        return self._update_row(old_row, values + (old_row[6] if category_id is KEEP else category_id,))
+
+    def _update_row(self, old_row, values):
+        """把 (date, description, amount, type, category_id) 写入 old_row 对应的交易。"""
+        self.conn.execute(
+            "UPDATE transactions SET date=?, description=?, amount=?, type=?, category_id=? WHERE id=?",
+            values + (old_row[0],)
+        )
+        return self._record(old_row, self._select_row(old_row[0]))
+
+    def delete(self, transaction_id):
+        """删除一条交易并返回 change，交易不存在时返回 None。"""
+        old_row = self._select_row(transaction_id)
+        if old_row is None:
+            return None
+        self.conn.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
+        return self._record(old_row, None)
+
+    def update_many(self, transaction_ids, **fields):
+        """以相同的字段值更新多条交易，跳过不存在的交易。"""
+        for transaction_id in transaction_ids:
+            self.update(transaction_id, **fields)
+
+    def delete_many(self, transaction_ids):
+        """删除多条交易，跳过不存在的交易。"""
+        for transaction_id in transaction_ids:
+            self.delete(transaction_id)
+
+    def replay(self, journal, reverse=False):
+        """重放另一个工作单元的日志；reverse 为 True 时按相反顺序撤销其中的修改。
+
+        每行修改前先与日志中的状态比较，不一致时抛出 StaleRecordError，由调用方回滚整个事务。
+        """
+        for old_row, new_row in (reversed(journal) if reverse else journal):
+            expected, target = (new_row, old_row) if reverse else (old_row, new_row)
+            transaction_id = (expected or target)[0]
+            current_row = self._select_row(transaction_id)
+            if current_row != expected:
+                raise StaleRecordError(f"交易 (ID: {transaction_id}) 已被其他操作修改或删除，无法撤销或重做。")
+            if target is None:
+                self.delete(transaction_id)
+            elif expected is None:
+                self.add(*target[1:], transaction_id=transaction_id)
+            else:
+                # 整行写回，描述为空 (None) 时也要还原
+                self._update_row(current_row, target[1:5] + target[6:])
+
+    def describe(self):
+        """返回本次修改的概要，例如 "已删除 3 条交易。"。"""
+        added = sum(1 for old_record, _ in self.changes if old_record is None)
+        deleted = sum(1 for _, new_record in self.changes if new_record is None)
+        parts = [f"{verb} {count} 条" for verb, count in
+                 (("添加", added), ("修改", len(self.changes) - added - deleted), ("删除", deleted)) if count]
+        return f"已{'、'.join(parts)}交易。" if parts else "没有修改任何交易。"
+
+class UndoJournal:
+    """撤销 / 重做栈，每项为 (描述, 日志)。只在界面线程中使用。
+
+    新的修改会清空重做栈；撤销栈最多保留 max_depth 项，最早的修改先被丢弃。
+    """
+    MAX_DEPTH = 100
+
+    def __init__(self, max_depth=MAX_DEPTH):
+        self._undo = deque(maxlen=max_depth)
+        self._redo = []
+
+    def record(self, label, journal):
+        """记录一次新的修改。"""
+        if journal:
+            self._undo.append((label, journal))
+            self._redo.clear()
+
+    def undo_label(self):
+        return self._undo[-1][0] if self._undo else None
+
+    def redo_label(self):
+        return self._redo[-1][0] if self._redo else None
+
+    def pop_undo(self):
+        """取出最近一次修改，撤销成功后应交给 push_redo。"""
+        return self._undo.pop() if self._undo else None
+
+    def pop_redo(self):
+        """取出最近一次撤销的修改，重做成功后应交给 push_undo。"""
+        return self._redo.pop() if self._redo else None
+
+    def push_redo(self, entry):
+        self._redo.append(entry)
+
+    def push_undo(self, entry):
+        self._undo.append(entry)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
@@ -0,0 +1,367 @@
+"""PocketLedger 本地 HTTP/JSON 接口，供同一台机器上的其他工具读写账本。
+
+用法:
+    python server.py --port 8765 --readers 4
+
+只使用标准库 (asyncio)，不依赖 PySide6。默认只监听 127.0.0.1。接口:
+    GET    /transactions?cursor=&page_size=&from=&to=&type=&min=&max=&q=   分页列出
+    GET    /transactions/<id>
+    POST   /transactions            {"date", "description", "amount", "type"}
+    PUT    /transactions/<id>       同上
+    DELETE /transactions/<id>
+    GET    /search?q=&limit=        按描述搜索
+    GET    /categories?type=
+    POST   /categories              {"name", "type"}
+    GET    /summary
+    GET    /daily?from=&to=         每日收支汇总
+    GET    /metrics                 按路由统计的请求耗时
+
+金额以字符串形式的十进制数表示 (如 "12.50")，写入时也接受数字。分页响应中的
+next_cursor 原样作为下一次请求的 cursor 参数。
+
+读请求在有界的读线程池中执行，每个线程持有自己的只读连接；写请求交给单线程
+的写执行器串行处理。与图形界面同时打开同一个数据库是安全的 (WAL + busy_timeout)。
+"""
+import argparse
+import asyncio
+import functools
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from model.exporter import transaction_dict
+from model.importer import ImportRowError, normalize_date
+from model.instrumentation import profiler
+from model.model import DATABASE_FILE, TransactionModel
+from model.money import format_amount, to_minor_units
+
+DEFAULT_PORT = 8765
+MAX_PAGE_SIZE = 1000
+MAX_BODY_BYTES = 1 << 20
+KEEP_ALIVE_TIMEOUT = 30  # 秒，空闲的长连接超过该时间后关闭
+
+STATUS_TEXT = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+TRANSACTION_TYPES = ("收入", "支出")
+
+
+class ApiError(Exception):
+    """以指定 HTTP 状态码返回给客户端的错误。"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_amount(value, field="amount"):
+    try:
+        return to_minor_units(value)
+    except ValueError:
+        raise ApiError(400, f"{field} 不是有效的金额: {value!r}") from None
+
+
+def _parse_date(value, field="date"):
+    try:
+        return normalize_date(value)
+    except (ImportRowError, TypeError):
+        raise ApiError(400, f"{field} 不是有效的日期: {value!r}") from None
+
+
+def _parse_type(value):
+    if value not in TRANSACTION_TYPES:
+        raise ApiError(400, f"type 必须是 {' 或 '.join(TRANSACTION_TYPES)}")
+    return value
+
+
+def _parse_int(value, field, default, maximum=None):
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ApiError(400, f"{field} 必须是整数") from None
+    if number <= 0:
+        raise ApiError(400, f"{field} 必须大于 0")
+    return min(number, maximum) if maximum else number
+
+
+def _parse_transaction_body(body):
+    if not isinstance(body, dict):
+        raise ApiError(400, "请求体必须是 JSON 对象")
+    missing = [field for field in ("date", "amount", "type") if field not in body]
+    if missing:
+        raise ApiError(400, f"缺少字段: {', '.join(missing)}")
+    return (_parse_date(body["date"]), str(body.get("description") or ""),
+            _parse_amount(body["amount"]), _parse_type(body["type"]))
+
+
+class LedgerServer:
+    """把 HTTP 请求分发到 TransactionModel。
+
+    读操作通过 read() 在 readers 个线程中并发执行 (模型为每个线程维护独立的只读连接)，
+    写操作通过 write() 在唯一的写线程中依次执行，避免多个写事务争抢数据库写锁。
+    """
+
+    def __init__(self, model, readers=4):
+        self.model = model
+        self.readers = readers
+        self.read_pool = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="ledger-reader")
+        self.write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ledger-writer")
+        self.started_at = time.time()
+        self.in_flight = 0
+        routes = [
+            ("GET", r"/transactions", self.list_transactions),
+            ("POST", r"/transactions", self.create_transaction),
+            ("GET", r"/transactions/(\d+)", self.get_transaction),
+            ("PUT", r"/transactions/(\d+)", self.update_transaction),
+            ("DELETE", r"/transactions/(\d+)", self.delete_transaction),
+            ("GET", r"/search", self.search),
+            ("GET", r"/categories", self.list_categories),
+            ("POST", r"/categories", self.create_category),
+            ("GET", r"/summary", self.summary),
+            ("GET", r"/daily", self.daily_totals),
+            ("GET", r"/metrics", self.metrics),
+        ]
+        # (方法, 路径正则, 处理函数, 用于统计耗时的路由名，如 "GET /transactions/{id}")
+        self.routes = [(method, re.compile(pattern + "$"), handler, method + " " + pattern.replace(r"(\d+)", "{id}"))
+                       for method, pattern, handler in routes]
+
+    async def read(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.read_pool, functools.partial(fn, *args, **kwargs))
+
+    async def write(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.write_pool, functools.partial(fn, *args, **kwargs))
+
+    def close(self):
+        self.read_pool.shutdown(wait=True)
+        self.write_pool.shutdown(wait=True)
+
+    # --- 路由处理函数: 返回 (状态码, 可 JSON 序列化的响应体) ---
+
+    async def list_transactions(self, query, body):
+        cursor = None
+        if query.get("cursor"):
+            date, _, transaction_id = query["cursor"].rpartition(",")
+            try:
+                cursor = (_parse_date(date, "cursor"), int(transaction_id))
+            except ValueError:
+                raise ApiError(400, "cursor 无效") from None
+        filters = {
+            "date_from": _parse_date(query["from"], "from") if query.get("from") else None,
+            "date_to": _parse_date(query["to"], "to") if query.get("to") else None,
+            "transaction_type": _parse_type(query["type"]) if query.get("type") else None,
+            "min_amount": _parse_amount(query["min"], "min") if query.get("min") else None,
+            "max_amount": _parse_amount(query["max"], "max") if query.get("max") else None,
+            "description": query.get("q") or None,
+        }
+        page_size = _parse_int(query.get("page_size"), "page_size", 100, MAX_PAGE_SIZE)
+        rows, next_cursor = await self.read(self.model.get_transactions_page, cursor, page_size, **filters)
+        return 200, {"items": [transaction_dict(row) for row in rows],
+                     "next_cursor": f"{next_cursor[0]},{next_cursor[1]}" if next_cursor else None}
+
+    async def get_transaction(self, query, body, transaction_id):
+        record = await self.read(self.model.get_transaction_by_id, int(transaction_id))
+        if record is None:
+            raise ApiError(404, f"未找到ID为 {transaction_id} 的交易记录。")
+        return 200, transaction_dict(record)
+
+    async def create_transaction(self, query, body):
+        success, message, change = await self.write(self.model.add_transaction, *_parse_transaction_body(body))
+        if not success:
+            raise ApiError(400, message)
+        return 201, transaction_dict(change[1])
+
+    async def update_transaction(self, query, body, transaction_id):
+        fields = _parse_transaction_body(body)
+        success, message, change = await self.write(self.model.update_transaction, int(transaction_id), *fields)
+        if not success:
+            raise ApiError(400 if await self._exists(transaction_id) else 404, message)
+        return 200, transaction_dict(change[1])
+
+    async def delete_transaction(self, query, body, transaction_id):
+        success, message, change = await self.write(self.model.delete_transaction, int(transaction_id))
+        if not success:
+            raise ApiError(400 if await self._exists(transaction_id) else 404, message)
+        return 200, transaction_dict(change[0])
+
+    async def _exists(self, transaction_id):
+        return await self.read(self.model.get_transaction_by_id, int(transaction_id)) is not None
+
+    async def search(self, query, body):
+        if not query.get("q"):
+            raise ApiError(400, "缺少查询参数 q")
+        limit = _parse_int(query.get("limit"), "limit", 100, MAX_PAGE_SIZE)
+        rows = await self.read(self.model.search, query["q"], limit)
+        return 200, {"items": [transaction_dict(row) for row in rows]}
+
+    async def list_categories(self, query, body):
+        category_type = _parse_type(query["type"]) if query.get("type") else None
+        rows = await self.read(self.model.get_categories, category_type)
+        return 200, {"items": [{"id": category_id, "name": name, "type": type_}
+                               for category_id, name, type_ in rows]}
+
+    async def create_category(self, query, body):
+        if not isinstance(body, dict) or not str(body.get("name") or "").strip():
+            raise ApiError(400, "缺少字段: name")
+        name = str(body["name"]).strip()
+        success, message = await self.write(self.model.add_category, name, _parse_type(body.get("type")))
+        if not success:
+            existing = await self.read(self.model.get_categories)
+            raise ApiError(409 if any(row[1] == name for row in existing) else 400, message)
+        return 201, {"message": message}
+
+    async def summary(self, query, body):
+        total_income, total_expense, net_balance = await self.read(self.model.get_summary_stats)
+        return 200, {"income": format_amount(total_income), "expense": format_amount(total_expense),
+                     "net": format_amount(net_balance)}
+
+    async def daily_totals(self, query, body):
+        if not query.get("from") or not query.get("to"):
+            raise ApiError(400, "缺少查询参数 from 和 to")
+        rows = await self.read(self.model.get_daily_totals,
+                               _parse_date(query["from"], "from"), _parse_date(query["to"], "to"))
+        return 200, {"items": [{"date": date, "income": format_amount(income),
+                                "expense": format_amount(expense), "count": count}
+                               for date, income, expense, count in rows]}
+
+    async def metrics(self, query, body):
+        return 200, {
+            "uptime_seconds": time.time() - self.started_at,
+            "readers": self.readers,
+            "in_flight": self.in_flight,
+            "requests": profiler.snapshot()["requests"],
+        }
+
+    # --- HTTP ---
+
+    async def dispatch(self, method, target, body):
+        """执行一个请求，返回 (状态码, 响应体)；耗时按路由记录到 profiler 的 "request" 类别。"""
+        start = time.perf_counter()
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/") or "/"
+        route_name = "unmatched"
+        self.in_flight += 1
+        try:
+            allowed = False
+            for route_method, pattern, handler, name in self.routes:
+                match = pattern.match(path)
+                if match is None:
+                    continue
+                allowed = True
+                if route_method == method:
+                    route_name = name
+                    query = dict(parse_qsl(parts.query))
+                    return await handler(query, body, *match.groups())
+            if allowed:
+                raise ApiError(405, f"{path} 不支持 {method}")
+            raise ApiError(404, f"未知的路径: {path}")
+        except ApiError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            print(f"处理请求 {method} {target} 时出错: {e!r}", file=sys.stderr)
+            return 500, {"error": "服务器内部错误"}
+        finally:
+            self.in_flight -= 1
+            profiler.record("request", route_name, (time.perf_counter() - start) * 1000)
+
+    async def handle_connection(self, reader, writer):
+        """处理一个 HTTP/1.1 连接，支持 keep-alive；每个连接上的请求依次处理。"""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                try:
+                    # 请求目标应当是百分号编码的 ASCII，按 UTF-8 解码以兼容直接发送中文的客户端
+                    method, target, version = request_line.decode("utf-8", "replace").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "无效的请求行"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1")
+                content_length = headers.get("content-length") or "0"
+                # int() 也接受 "-5"、"+5"、"1_0" 和非 ASCII 数字，只允许十进制 ASCII 数字
+                if not (content_length.isascii() and content_length.isdigit()):
+                    await self._respond(writer, 400, {"error": "无效的 Content-Length"}, keep_alive=False)
+                    break
+                length = int(content_length)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "请求体过大"}, keep_alive=False)
+                    break
+                body = None
+                if length:
+                    raw = await reader.readexactly(length)
+                    try:
+                        body = json.loads(raw)
+                    except ValueError:
+                        await self._respond(writer, 400, {"error": "请求体不是有效的 JSON"}, keep_alive)
+                        if not keep_alive:
+                            break
+                        continue
+                status, payload = await self.dispatch(method.upper(), target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+        )
+        await writer.drain()
+
+
+async def serve(model, host="127.0.0.1", port=DEFAULT_PORT, readers=4, ready=None):
+    """启动服务并一直运行；ready 为 asyncio.Event 时在开始监听后设置。"""
+    ledger_server = LedgerServer(model, readers)
+    server = await asyncio.start_server(ledger_server.handle_connection, host, port)
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        ledger_server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="server.py", description="PocketLedger 本地 HTTP/JSON 接口")
+    parser.add_argument("--db", default=DATABASE_FILE, help=f"数据库文件 (默认 {DATABASE_FILE})")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--readers", type=int, default=4, help="读线程 (只读连接) 数量")
+    args = parser.parse_args(argv)
+    with TransactionModel(args.db) as model:
+        print(f"PocketLedger API 正在监听 http://{args.host}:{args.port}", file=sys.stderr)
+        try:
+            asyncio.run(serve(model, args.host, args.port, args.readers))
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import os
+import random
+import tempfile
+import unittest
+
+from model.archive import MAX_ATTACHED_ARCHIVES
+from model.model import TransactionModel
+
+FIRST_YEAR = 2010
+ARCHIVED_YEARS = MAX_ATTACHED_ARCHIVES + 4
+
+
+class ManyArchivesTest(unittest.TestCase):
+    """归档的年份多于同时附加的上限时，跨归档的查询仍然返回完整且一致的结果。"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.model = TransactionModel(os.path.join(self.directory.name, "ledger.db"))
+        rng = random.Random(7)
+        # 日期随机，ID 与日期交错 (补记的旧交易)，按 ID 归并时各个年份必须同时参与
+        rows = [(f"{rng.randint(FIRST_YEAR, FIRST_YEAR + ARCHIVED_YEARS)}-{rng.randint(1, 12):02d}-"
+                 f"{rng.randint(1, 28):02d}", f"交易{index}", rng.randint(1, 100000), rng.choice(("收入", "支出")))
+                for index in range(3000)]
+        self.assertTrue(self.model.bulk_add_transactions(rows)[0])
+        self.before = self._read_all()
+        for year in range(FIRST_YEAR, FIRST_YEAR + ARCHIVED_YEARS):
+            self.assertTrue(self.model.archive_year(year)[0])
+
+    def tearDown(self):
+        self.model.close()
+        self.directory.cleanup()
+
+    def _read_all(self):
+        return {
+            "all": self.model.get_all_transactions(),
+            "monthly": self.model.get_monthly_totals(),
+            "daily": self.model.get_daily_totals(f"{FIRST_YEAR}-01-01", f"{FIRST_YEAR + ARCHIVED_YEARS}-12-31"),
+            "batches": [row for batch in self.model.iter_transaction_batches(97) for row in batch],
+            "analytics": [row for batch in self.model.iter_analytics_rows(0, 101) for row in batch],
+            "analytics_by_id": sorted(self.model.get_analytics_rows(range(1, 3001, 3))),
+        }
+
+    def test_reads_span_more_archives_than_can_be_attached(self):
+        self.assertEqual(len(self.model.get_archives()), ARCHIVED_YEARS)
+        self.assertGreater(ARCHIVED_YEARS, MAX_ATTACHED_ARCHIVES)
+        after = self._read_all()
+        for name, rows in self.before.items():
+            self.assertEqual(after[name], rows, name)
+        self.assertEqual(len(after["all"]), 3000)
+
+    def test_queries_between_batches_of_an_open_export(self):
+        expected = self.before["batches"]
+        batches = self.model.iter_transaction_batches(50)
+        rows = list(next(batches))
+        # 导出生成器尚未读完时，同一线程中的其他查询会附加别的年份
+        self.assertEqual(self.model.get_monthly_totals(), self.before["monthly"])
+        self.assertEqual(len(self.model.get_all_transactions()), len(expected))
+        rows.extend(row for batch in batches for row in batch)
+        self.assertEqual(rows, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from model.backup import create_snapshot, list_snapshots, restore_snapshot
+from model.model import TransactionModel
+
+
+class SnapshotTest(unittest.TestCase):
+    """连续创建的快照各自独立，恢复时另存的快照不会与已有的快照重名。"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.directory.name, "ledger.db")
+        self.model = TransactionModel(self.database_file)
+
+    def tearDown(self):
+        self.model.close()
+        self.directory.cleanup()
+
+    def _descriptions(self):
+        return sorted(row[2] for row in self.model.get_all_transactions())
+
+    def test_back_to_back_snapshots_then_restore(self):
+        self.assertTrue(self.model.add_transaction("2024-05-01", "午餐", 3250, "支出")[0])
+        ok, message, first = create_snapshot(self.database_file, keep=None)
+        self.assertTrue(ok, message)
+        self.assertTrue(self.model.add_transaction("2024-05-02", "晚餐", 4800, "支出")[0])
+        ok, message, second = create_snapshot(self.database_file, keep=None)
+        self.assertTrue(ok, message)
+        self.assertNotEqual(first, second)
+        self.assertEqual([snapshot[0] for snapshot in list_snapshots(self.database_file)], [second, first])
+
+        # 恢复前另存的快照紧接着上面两个快照创建
+        ok, message = restore_snapshot(self.model, first)
+        self.assertTrue(ok, message)
+        self.assertEqual(self._descriptions(), ["午餐"])
+        self.assertEqual(len(list_snapshots(self.database_file)), 3)
+
+        safety = list_snapshots(self.database_file)[0][0]
+        ok, message = restore_snapshot(self.model, safety)
+        self.assertTrue(ok, message)
+        self.assertEqual(self._descriptions(), ["午餐", "晚餐"])
+
+    def test_restore_is_reported_only_to_other_connections(self):
+        other = TransactionModel(self.database_file)
+        self.addCleanup(other.close)
+        self.assertTrue(self.model.add_transaction("2024-05-01", "午餐", 3250, "支出")[0])
+        ok, message, snapshot = create_snapshot(self.database_file, keep=None)
+        self.assertTrue(ok, message)
+        self.assertTrue(self.model.add_transaction("2024-05-02", "晚餐", 4800, "支出")[0])
+        self.model.poll_changes()
+        other.poll_changes()
+
+        ok, message = restore_snapshot(self.model, snapshot)
+        self.assertTrue(ok, message)
+        # 恢复的一方已经刷新过，不应再把自己的恢复当作外部修改
+        self.assertEqual(self.model.poll_changes(), set())
+        self.assertIn("transactions", other.poll_changes())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from model.daily_totals import DailyTotalsCache, contiguous_runs
+from model.model import TransactionModel
+
+
+class DailyTotalsCacheTest(unittest.TestCase):
+    """只查询未缓存的月份，夹在中间的已缓存月份不会被重新读取。"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.model = TransactionModel(os.path.join(self.directory.name, "ledger.db"))
+        for month in range(1, 13):
+            self.assertTrue(self.model.add_transaction(f"2024-{month:02d}-15", f"交易{month}", month * 100, "支出")[0])
+        self.queries = []
+        get_daily_totals = self.model.get_daily_totals
+
+        def counting(date_from, date_to):
+            self.queries.append((date_from, date_to))
+            return get_daily_totals(date_from, date_to)
+
+        self.model.get_daily_totals = counting
+        self.cache = DailyTotalsCache(self.model)
+
+    def tearDown(self):
+        self.model.close()
+        self.directory.cleanup()
+
+    def test_contiguous_runs(self):
+        self.assertEqual(contiguous_runs([(2024, 3), (2023, 12), (2024, 1), (2024, 5), (2024, 4)]),
+                         [((2023, 12), (2024, 1)), ((2024, 3), (2024, 5))])
+        self.assertEqual(contiguous_runs([]), [])
+
+    def test_only_missing_runs_are_queried(self):
+        self.cache.load_months([(2024, month) for month in range(4, 9)])
+        self.queries.clear()
+        blocks = self.cache.load_months([(2024, month) for month in range(3, 10)])
+        self.assertEqual(self.queries, [("2024-03-01", "2024-03-31"), ("2024-09-01", "2024-09-31")])
+        self.assertEqual(blocks[(2024, 3)], {"2024-03-15": (0, 300, 1)})
+        self.assertEqual(blocks[(2024, 6)], {"2024-06-15": (0, 600, 1)})
+        self.assertEqual(blocks[(2024, 9)], {"2024-09-15": (0, 900, 1)})
+
+    def test_adjacent_missing_months_share_one_query(self):
+        self.cache.load_months([(2023, 12), (2024, 1), (2024, 2)])
+        self.assertEqual(self.queries, [("2023-12-01", "2024-02-31")])
+        self.assertEqual(self.cache.cached(2024, 2), {"2024-02-15": (0, 200, 1)})
+        self.assertEqual(self.cache.cached(2023, 12), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
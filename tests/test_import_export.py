@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from model.exporter import export_ledger
+from model.importer import import_statement
+from model.model import TransactionModel
+
+
+class ExportRoundTripTest(unittest.TestCase):
+    """导出的 CSV / JSON Lines 文件 (包括 gzip 压缩的) 可以原样导入另一个账本。"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = TransactionModel(self._path("source.db"))
+        self.assertTrue(self.source.add_category("餐饮", "支出")[0])
+        self.assertTrue(self.source.add_category("工资", "收入")[0])
+        categories = {name: category_id for category_id, name, _ in self.source.get_categories()}
+        rows = [
+            ("2024-05-01", "午餐", 3250, "支出", "CNY", categories["餐饮"]),
+            ("2024-05-02", "寿司", 1800, "支出", "JPY", categories["餐饮"]),
+            ("2024-05-10", "工资", 1234567, "收入", "USD", categories["工资"]),
+            ("2024-05-11", "杂项, \"引号\"", 99, "支出", "CNY", None),
+        ]
+        for date, description, amount, transaction_type, currency, category_id in rows:
+            self.assertTrue(self.source.add_transaction(date, description, amount, transaction_type,
+                                                        currency=currency, category_id=category_id)[0])
+
+    def tearDown(self):
+        self.source.close()
+        self.directory.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    @staticmethod
+    def _records(model):
+        """返回不含ID的交易: (date, description, amount, type, currency, 类别名)。"""
+        records = []
+        for batch in model.iter_transaction_batches(100, detailed=True):
+            for _, date, description, amount, transaction_type, currency, _, category in batch:
+                records.append((date, description, amount, transaction_type, currency, category))
+        return sorted(records)
+
+    def test_round_trip(self):
+        expected = self._records(self.source)
+        for name in ("ledger.csv", "ledger.csv.gz", "ledger.jsonl", "ledger.jsonl.gz"):
+            with self.subTest(name):
+                path = self._path(name)
+                self.assertTrue(export_ledger(self.source, path)[0])
+                with TransactionModel(self._path(name + ".db")) as target:
+                    success, message, errors = import_statement(target, path)
+                    self.assertTrue(success, message)
+                    self.assertEqual(errors, [])
+                    self.assertEqual(self._records(target), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
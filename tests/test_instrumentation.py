@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from model.instrumentation import profiler
+from model.model import TransactionModel
+
+
+class SqlProfilingTest(unittest.TestCase):
+    """连接和游标执行的所有 SQL (包括迁移和 executescript) 都出现在统计中。"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        profiler.reset()
+        self.model = TransactionModel(os.path.join(self.directory.name, "ledger.db"))
+
+    def tearDown(self):
+        self.model.close()
+        self.directory.cleanup()
+        profiler.reset()
+
+    def _sql_counts(self):
+        return {name: stats["count"] for name, stats in profiler.snapshot()["sql"].items()}
+
+    def test_migrations_run_through_cursors_are_timed(self):
+        self.assertTrue(any(name.startswith("CREATE TABLE IF NOT EXISTS transactions") for name in self._sql_counts()))
+
+    def test_cursor_and_script_statements_are_timed(self):
+        cursor = self.model.conn.cursor()
+        cursor.execute("SELECT 42")
+        cursor.executemany("UPDATE categories SET name = name WHERE id = ?", [(1,)])
+        self.model.conn.executescript("SELECT 1; SELECT 2;")
+        with self.assertRaises(sqlite3.OperationalError):
+            self.model.conn.execute("SELECT missing_column")
+        counts = self._sql_counts()
+        for name in ("SELECT 42", "UPDATE categories SET name = name WHERE id = ?", "SELECT 1; SELECT 2;", "SELECT missing_column"):
+            self.assertEqual(counts.get(name), 1, name)
+
+    def test_disabled_profiler_records_nothing(self):
+        profiler.enabled = False
+        try:
+            self.model.conn.cursor().execute("SELECT 43")
+        finally:
+            profiler.enabled = True
+        self.assertNotIn("SELECT 43", self._sql_counts())
+
+
+if __name__ == "__main__":
+    unittest.main()
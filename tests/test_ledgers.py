@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from model.ledgers import consolidate
+from model.model import TransactionModel
+
+
+class ConsolidateTest(unittest.TestCase):
+    """合并汇总以只读方式打开账本，不会修改界面或其他进程正在使用的账本。"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.paths = [os.path.join(self.directory.name, name) for name in ("home.db", "studio.db")]
+        self.models = [TransactionModel(path) for path in self.paths]
+        self.assertTrue(self.models[0].add_transaction("2024-05-01", "工资", 500000, "收入")[0])
+        self.assertTrue(self.models[0].add_transaction("2024-05-02", "午餐", 3250, "支出")[0])
+        self.assertTrue(self.models[1].add_transaction("2024-06-01", "设备", 120000, "支出")[0])
+
+    def tearDown(self):
+        for model in self.models:
+            model.close()
+        self.directory.cleanup()
+
+    def test_consolidate_leaves_open_ledgers_untouched(self):
+        live = self.models[0]
+        data_version = live.conn.execute("PRAGMA data_version").fetchone()[0]
+        wal_size = os.path.getsize(self.paths[0] + "-wal")
+        self.assertGreater(wal_size, 0)
+
+        report = consolidate(self.paths)
+        self.assertEqual(report["errors"], [])
+        self.assertEqual(report["ledgers"], [("home", 500000, 3250, 2), ("studio", 0, 120000, 1)])
+        self.assertEqual(report["months"], [("2024-05", 500000, 3250, 2), ("2024-06", 0, 120000, 1)])
+
+        # 没有其他连接提交过，WAL 也没有被检查点截断
+        self.assertEqual(live.conn.execute("PRAGMA data_version").fetchone()[0], data_version)
+        self.assertEqual(os.path.getsize(self.paths[0] + "-wal"), wal_size)
+        self.assertEqual(live.poll_changes(), set())
+
+    def test_read_only_model_rejects_writes(self):
+        with TransactionModel(self.paths[1], read_only=True) as model:
+            self.assertEqual(len(model.get_all_transactions()), 1)
+            self.assertFalse(model.add_transaction("2024-06-02", "耗材", 800, "支出")[0])
+        self.assertEqual(len(self.models[1].get_all_transactions()), 1)
+
+    def test_read_only_model_requires_migrated_schema(self):
+        path = os.path.join(self.directory.name, "old.db")
+        sqlite3.connect(path).close()
+        with self.assertRaises(sqlite3.DatabaseError):
+            TransactionModel(path, read_only=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
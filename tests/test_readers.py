@@ -0,0 +1,68 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from model.model import MAX_IDLE_READERS, TransactionModel
+
+TASKS = 50
+
+
+class ReaderPoolTest(unittest.TestCase):
+    """每个任务运行在新线程上时，只读连接在任务结束时交还，连接数不随任务数增长。"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.model = TransactionModel(os.path.join(self.directory.name, "ledger.db"))
+        self.assertTrue(self.model.add_transaction("2024-05-01", "午餐", 3250, "支出")[0])
+
+    def tearDown(self):
+        self.model.close()
+        self.directory.cleanup()
+
+    def _run_task(self, results):
+        # 与 TaskRunner 的 thread_cleanup 相同: 任务结束后交还只读连接
+        try:
+            results.append(len(self.model.get_all_transactions()))
+        finally:
+            self.model.release_reader()
+
+    def _run_in_thread(self, results):
+        thread = threading.Thread(target=self._run_task, args=(results,))
+        thread.start()
+        thread.join()
+
+    def test_sequential_tasks_reuse_one_reader(self):
+        results = []
+        for _ in range(TASKS):
+            self._run_in_thread(results)
+        self.assertEqual(results, [1] * TASKS)
+        self.assertEqual(len(self.model._readers), 1)
+
+    def test_concurrent_tasks_keep_reader_count_bounded(self):
+        results = []
+        barrier = threading.Barrier(8)
+
+        def task():
+            barrier.wait()
+            self._run_task(results)
+
+        for _ in range(TASKS // 8):
+            threads = [threading.Thread(target=task) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(results), TASKS // 8 * 8)
+        self.assertLessEqual(len(self.model._readers), MAX_IDLE_READERS)
+
+    def test_reused_reader_sees_new_writes(self):
+        results = []
+        self._run_in_thread(results)
+        self.assertTrue(self.model.add_transaction("2024-05-02", "晚餐", 4800, "支出")[0])
+        self._run_in_thread(results)
+        self.assertEqual(results, [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
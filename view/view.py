@@ -1,14 +1,263 @@
 from PySide6.QtWidgets import (
     QMainWindow, QLabel, QWidget, QVBoxLayout, QHBoxLayout,
     QLineEdit, QPushButton, QComboBox, QDateEdit, QFormLayout,
-    QTableWidget, QTableWidgetItem, QHeaderView, QFrame, QMessageBox,
-    QTabWidget, QScrollArea, QGridLayout, QDialog
+    QTableView, QAbstractItemView, QHeaderView, QFrame, QMessageBox,
+    QTabWidget, QListView, QStyledItemDelegate, QTableWidget, QTableWidgetItem,
+    QGroupBox, QCheckBox, QDoubleSpinBox, QSpinBox, QCalendarWidget
 )
-from PySide6.QtCore import Qt, QDate
-from PySide6.QtGui import QFont
+from PySide6.QtCore import Qt, Signal, QTimer, QDate, QDateTime, QSize, QRectF, QPointF, QAbstractTableModel, QAbstractListModel, QModelIndex
+from PySide6.QtGui import QFont, QPainter, QPen, QBrush, QColor, QPalette, QKeySequence
+from collections import OrderedDict
+import bisect
+import os
+
+from model.money import format_amount, to_minor_units
+
+class TransactionTableModel(QAbstractTableModel):
+    """按需分块加载交易记录的表格模型。
+
+    行数随滚动通过 canFetchMore/fetchMore 逐块增长；内存中只缓存最近访问的
+    若干块，被淘汰的块在再次显示时用记录下的块起始游标和块大小重新查询。
+    单条记录的增删改通过 insert_record/remove_record/update_record 就地修补，
+    只影响所在的块，无需重新加载整个表格。
+    """
+    HEADERS = ["ID", "日期", "描述", "金额", "类型"]
+    CHUNK_SIZE = 256
+    MAX_CACHED_CHUNKS = 16
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._fetch_page = None
+        self._chunk_cursors = []  # 每块的起始游标 (不含)，第 0 块为 None
+        self._chunk_sizes = []  # 每块当前的行数，修补后不再等于 CHUNK_SIZE
+        self._chunk_offsets = []  # 每块第一行的行号
+        self._chunks = OrderedDict()  # 块序号 -> 行数据 (LRU)
+        self._row_count = 0
+        self._next_cursor = None
+        self._has_more = False
+
+    def set_source(self, fetch_page):
+        """设置数据源并从头重新加载。fetch_page(cursor, page_size) 返回 (rows, next_cursor)。"""
+        self.beginResetModel()
+        self._fetch_page = fetch_page
+        self._chunk_cursors = []
+        self._chunk_sizes = []
+        self._chunk_offsets = []
+        self._chunks.clear()
+        self._row_count = 0
+        self._next_cursor = None
+        self._has_more = fetch_page is not None
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self._has_more:
+            return
+        rows, next_cursor = self._fetch_page(self._next_cursor, self.CHUNK_SIZE)
+        self._has_more = next_cursor is not None
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), self._row_count, self._row_count + len(rows) - 1)
+        self._append_chunk(self._next_cursor, list(rows))
+        self._next_cursor = next_cursor
+        self.endInsertRows()
+
+    def _append_chunk(self, cursor, rows):
+        chunk_index = len(self._chunk_cursors)
+        self._chunk_cursors.append(cursor)
+        self._chunk_sizes.append(len(rows))
+        self._chunk_offsets.append(self._row_count)
+        self._store_chunk(chunk_index, rows)
+        self._row_count += len(rows)
+
+    def _store_chunk(self, chunk_index, rows):
+        self._chunks[chunk_index] = rows
+        self._chunks.move_to_end(chunk_index)
+        while len(self._chunks) > self.MAX_CACHED_CHUNKS:
+            self._chunks.popitem(last=False)
+
+    def _chunk_rows(self, chunk_index):
+        rows = self._chunks.get(chunk_index)
+        if rows is None:
+            size = self._chunk_sizes[chunk_index]
+            rows = list(self._fetch_page(self._chunk_cursors[chunk_index], size)[0]) if size else []
+            self._store_chunk(chunk_index, rows)
+        else:
+            self._chunks.move_to_end(chunk_index)
+        return rows
+
+    def _shift_offsets(self, chunk_index, delta):
+        self._chunk_sizes[chunk_index] += delta
+        for index in range(chunk_index + 1, len(self._chunk_offsets)):
+            self._chunk_offsets[index] += delta
+        self._row_count += delta
+
+    @staticmethod
+    def _sort_key(record):
+        return record[1], record[0]  # (date, id)，表格按此降序排列
+
+    def _chunk_for_key(self, key):
+        """返回应包含 key 的块序号：最后一个起始游标大于 key 的块。"""
+        low, high = 1, len(self._chunk_cursors)
+        while low < high:
+            middle = (low + high) // 2
+            if self._chunk_cursors[middle] > key:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+
+    def row_data(self, row):
+        """返回指定行的原始记录 (id, date, description, amount, type)。"""
+        if row < 0 or row >= self._row_count:
+            return None
+        chunk_index = bisect.bisect_right(self._chunk_offsets, row) - 1
+        rows = self._chunk_rows(chunk_index)
+        offset = row - self._chunk_offsets[chunk_index]
+        return rows[offset] if offset < len(rows) else None
+
+    def _chunk_lower_bound(self, chunk_index):
+        """块中最后一行的排序键下界；最后一块在数据全部加载后没有下界。"""
+        if chunk_index + 1 < len(self._chunk_cursors):
+            return self._chunk_cursors[chunk_index + 1]
+        return self._next_cursor if self._has_more else None
+
+    def _locate_key(self, key):
+        """返回包含 key 的已加载块序号；key 位于尚未加载的范围时返回 None。"""
+        if not self._chunk_cursors:
+            return None
+        chunk_index = self._chunk_for_key(key)
+        lower_bound = self._chunk_lower_bound(chunk_index)
+        if lower_bound is not None and key < lower_bound:
+            return None
+        return chunk_index
+
+    # 修补时数据库已经包含这次修改：块在缓存中时直接修改缓存的行；
+    # 块已被淘汰时按调整后的块大小重新读取，再据此计算受影响的行号。
+
+    def insert_record(self, record):
+        """把一条新记录插入到排序位置；位于尚未加载的范围时忽略，之后滚动时自然会取到。"""
+        if self._fetch_page is None:
+            return
+        if not self._chunk_cursors and not self._has_more:
+            self._append_chunk(None, [])
+        key = self._sort_key(record)
+        chunk_index = self._locate_key(key)
+        if chunk_index is None:
+            return
+        rows = self._chunks.get(chunk_index)
+        if rows is None:
+            rows = list(self._fetch_page(self._chunk_cursors[chunk_index], self._chunk_sizes[chunk_index] + 1)[0])
+            position = next((i for i, existing in enumerate(rows) if existing[0] == record[0]), None)
+            if position is None:
+                return
+        else:
+            position = 0
+            while position < len(rows) and self._sort_key(rows[position]) > key:
+                position += 1
+            rows.insert(position, record)
+        row = self._chunk_offsets[chunk_index] + position
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._store_chunk(chunk_index, rows)
+        self._shift_offsets(chunk_index, 1)
+        self.endInsertRows()
+
+    def remove_record(self, record):
+        """移除一条已加载的记录；不在已加载范围内时忽略。"""
+        key = self._sort_key(record)
+        chunk_index = self._locate_key(key)
+        if chunk_index is None:
+            return
+        rows = self._chunks.get(chunk_index)
+        if rows is None:
+            size = self._chunk_sizes[chunk_index] - 1
+            rows = list(self._fetch_page(self._chunk_cursors[chunk_index], size)[0]) if size > 0 else []
+            position = sum(1 for existing in rows if self._sort_key(existing) > key)
+        else:
+            position = next((i for i, existing in enumerate(rows) if existing[0] == record[0]), None)
+            if position is None:
+                return
+            del rows[position]
+        row = self._chunk_offsets[chunk_index] + position
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self._store_chunk(chunk_index, rows)
+        self._shift_offsets(chunk_index, -1)
+        self.endRemoveRows()
+
+    def update_record(self, old_record, new_record):
+        """用新记录替换旧记录；排序键 (日期) 改变时移动到新位置。"""
+        if self._sort_key(old_record) != self._sort_key(new_record):
+            self.remove_record(old_record)
+            self.insert_record(new_record)
+            return
+        chunk_index = self._locate_key(self._sort_key(old_record))
+        # 未缓存的块再次显示时会从数据库读到新值
+        rows = self._chunks.get(chunk_index) if chunk_index is not None else None
+        if rows is None:
+            return
+        for position, existing in enumerate(rows):
+            if existing[0] == old_record[0]:
+                rows[position] = new_record
+                row = self._chunk_offsets[chunk_index] + position
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+                return
+
+    def replace_record(self, transaction_id, new_record):
+        """在已缓存的行中按ID替换记录，new_record 为 None 时移除该行，不改变其他行的顺序。
+
+        用于不按日期排序的搜索结果；返回是否找到了该记录。
+        """
+        for chunk_index, rows in self._chunks.items():
+            position = next((i for i, existing in enumerate(rows) if existing[0] == transaction_id), None)
+            if position is None:
+                continue
+            row = self._chunk_offsets[chunk_index] + position
+            if new_record is None:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del rows[position]
+                self._shift_offsets(chunk_index, -1)
+                self.endRemoveRows()
+            else:
+                rows[position] = new_record
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+            return True
+        return False
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        column = index.column()
+        if role == Qt.DisplayRole:
+            record = self.row_data(index.row())
+            if record is None:
+                return None
+            value = record[column]
+            if column == 3:
+                return format_amount(value)
+            return str(value)
+        if role == Qt.TextAlignmentRole and column == 3:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
 
 class DetailsTab(QWidget):
     """包含交易明细、输入表单和汇总统计的标签页内容。"""
+    # 搜索框内容稳定后发出，参数为去掉首尾空白的查询文本 (可能为空)
+    search_requested = Signal(str)
+    SEARCH_DEBOUNCE_MS = 200
+
     def __init__(self):
         super().__init__()
         self.editing_transaction_id = None # 用于存储正在编辑的交易ID
@@ -28,6 +277,12 @@ class DetailsTab(QWidget):
         self.type_combo = QComboBox()
         self.type_combo.addItems(["支出", "收入"])
         input_form_layout.addRow("类型:", self.type_combo)
+        # 类别下拉框只列出与所选类型相同的类别，第一项 "无类别" 的数据为 None
+        self._categories = []  # [(id, name, type), ...]
+        self.category_combo = QComboBox()
+        self.category_combo.addItem("无类别", None)
+        self.type_combo.currentTextChanged.connect(lambda _: self._fill_category_combo())
+        input_form_layout.addRow("类别:", self.category_combo)
         self.submit_button = QPushButton("添加交易")
         input_form_layout.addRow(self.submit_button)
         input_widget = QWidget()
@@ -39,23 +294,56 @@ class DetailsTab(QWidget):
         self.edit_button = QPushButton("编辑选定交易")
         table_actions_layout.addWidget(self.edit_button)
         self.delete_button = QPushButton("删除选定交易")
+        self.change_type_button = QPushButton("更改选定类型")
+        table_actions_layout.addWidget(self.change_type_button)
+        # 撤销 / 重做最近的修改 (Ctrl+Z / Ctrl+Shift+Z)，没有可撤销的修改时禁用
+        self.undo_button = QPushButton("撤销")
+        self.undo_button.setShortcut(QKeySequence(QKeySequence.Undo))
+        self.undo_button.setEnabled(False)
+        table_actions_layout.addWidget(self.undo_button)
+        self.redo_button = QPushButton("重做")
+        self.redo_button.setShortcut(QKeySequence(QKeySequence.Redo))
+        self.redo_button.setEnabled(False)
+        table_actions_layout.addWidget(self.redo_button)
+        self.import_button = QPushButton("导入账单")
+        table_actions_layout.addWidget(self.import_button)
+        self.export_button = QPushButton("导出账本")
+        table_actions_layout.addWidget(self.export_button)
         table_actions_layout.addStretch(1)
+        # 描述搜索框: 停止输入 SEARCH_DEBOUNCE_MS 毫秒后才发出 search_requested
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索描述...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setMinimumWidth(200)
+        table_actions_layout.addWidget(self.search_edit)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        self.search_timer.timeout.connect(lambda: self.search_requested.emit(self.search_query()))
         table_actions_layout.addWidget(self.delete_button)
         main_layout.addLayout(table_actions_layout)
 
         # 交易显示区域
-        self.transactions_table = QTableWidget()
-        self.transactions_table.setColumnCount(5)
-        self.transactions_table.setHorizontalHeaderLabels(["ID", "日期", "描述", "金额", "类型"])
+        self.transactions_model = TransactionTableModel(self)
+        self.transactions_table = QTableView()
+        self.transactions_table.setModel(self.transactions_model)
         self.transactions_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.transactions_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.transactions_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.transactions_table.verticalHeader().setVisible(False)
+        # 固定行高，避免视图为计算行高而遍历所有行
+        self.transactions_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.transactions_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.transactions_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        # 按住 Ctrl / Shift 可以选择多行，删除和更改类型作用于全部选中的行
+        self.transactions_table.setSelectionMode(QAbstractItemView.ExtendedSelection)
         main_layout.addWidget(self.transactions_table)
 
         # 汇总统计区域
         summary_group_layout = QHBoxLayout()
         summary_widget = QWidget()
         summary_widget.setLayout(summary_group_layout)
+        # 当前显示的 (总收入, 总支出)，用于按差额更新；汇总尚未加载 (或正在重新加载) 时为 None
+        self._summary_totals = None
         self.total_income_label = QLabel("总收入: 0.00")
         self.total_expense_label = QLabel("总支出: 0.00")
         self.net_balance_label = QLabel("净额: 0.00")
@@ -78,29 +366,93 @@ class DetailsTab(QWidget):
         self.description_edit.clear()
         self.amount_edit.clear()
         self.type_combo.setCurrentIndex(0) # 默认为支出
+        self.category_combo.setCurrentIndex(0)
         self.submit_button.setText("添加交易")
         self.editing_transaction_id = None
 
-    def populate_transaction_table(self, transactions):
-        self.transactions_table.setRowCount(0)
-        for row_index, row_data in enumerate(transactions):
-            self.transactions_table.insertRow(row_index)
-            for col_index, data in enumerate(row_data):
-                item_text = str(data)
-                if col_index == 3:
-                    try:
-                        item_text = f"{float(data):.2f}"
-                    except ValueError:
-                        pass
-                item = QTableWidgetItem(item_text)
-                if col_index == 3:
-                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                self.transactions_table.setItem(row_index, col_index, item)
+    def set_categories(self, categories):
+        """更新类别下拉框的候选项 (id, name, type, ...)，尽量保留当前选中的类别。"""
+        self._categories = [tuple(category[:3]) for category in categories]
+        self._fill_category_combo(self.selected_category_id())
+
+    def _fill_category_combo(self, selected_id=None):
+        transaction_type = self.type_combo.currentText()
+        self.category_combo.blockSignals(True)
+        self.category_combo.clear()
+        self.category_combo.addItem("无类别", None)
+        for category_id, name, category_type in self._categories:
+            if category_type == transaction_type:
+                self.category_combo.addItem(name, category_id)
+        index = self.category_combo.findData(selected_id) if selected_id is not None else 0
+        self.category_combo.setCurrentIndex(max(index, 0))
+        self.category_combo.blockSignals(False)
+
+    def selected_category_id(self):
+        return self.category_combo.currentData()
+
+    def populate_transaction_table(self, fetch_page):
+        """以分页函数 fetch_page(cursor, page_size) 作为数据源重新加载表格，行在滚动时按需获取。"""
+        self.transactions_model.set_source(fetch_page)
+
+    def search_query(self):
+        return self.search_edit.text().strip()
+
+    def show_search_results(self, rows):
+        """在表格中显示搜索结果 (已按相关度排序的完整结果列表)。"""
+        self.transactions_model.set_source(
+            lambda cursor, page_size: (rows[:page_size], None) if cursor is None else ([], None)
+        )
+
+    def _matches_search(self, record):
+        """记录的描述是否包含搜索框中的每个词 (不区分大小写，与 TransactionModel.search 一致)。"""
+        description = (record[2] or "").casefold()
+        return all(term.casefold() in description for term in self.search_query().split())
+
+    def apply_transaction_change(self, old_record, new_record):
+        """把单条交易的增删改同步到表格和汇总标签，不重新查询。
+
+        显示搜索结果时表格按相关度排序: 已显示的行就地更新，被删除或不再匹配的行直接移除；
+        新增的或改为匹配的交易不知道应排在哪里，此时返回 True，由调用方重新执行搜索。
+        汇总尚未加载时不按差额更新，由调用方重新获取汇总 (见 has_summary)。
+        """
+        needs_search = False
+        if self.search_query():
+            still_matches = new_record is not None and self._matches_search(new_record)
+            shown = old_record is not None and self.transactions_model.replace_record(
+                old_record[0], new_record if still_matches else None)
+            needs_search = still_matches and not shown
+        elif old_record is None:
+            self.transactions_model.insert_record(new_record)
+        elif new_record is None:
+            self.transactions_model.remove_record(old_record)
+        else:
+            self.transactions_model.update_record(old_record, new_record)
+        if self._summary_totals is None:
+            return needs_search
+        total_income, total_expense = self._summary_totals
+        for record, sign in ((old_record, -1), (new_record, 1)):
+            if record is None:
+                continue
+            if record[4] == "收入":
+                total_income += sign * record[3]
+            else:
+                total_expense += sign * record[3]
+        self.update_summary_labels(total_income, total_expense, total_income - total_expense)
+        return needs_search
+
+    def has_summary(self):
+        """汇总标签是否显示着已加载的汇总，可以按差额更新。"""
+        return self._summary_totals is not None
+
+    def invalidate_summary(self):
+        """汇总正在重新加载: 在新结果到达前不再按差额更新 (标签保持原样)。"""
+        self._summary_totals = None
 
     def update_summary_labels(self, total_income, total_expense, net_balance):
-        self.total_income_label.setText(f"总收入: {total_income:.2f}")
-        self.total_expense_label.setText(f"总支出: {total_expense:.2f}")
-        self.net_balance_label.setText(f"净额: {net_balance:.2f}")
+        self._summary_totals = (total_income, total_expense)
+        self.total_income_label.setText(f"总收入: {format_amount(total_income)}")
+        self.total_expense_label.setText(f"总支出: {format_amount(total_expense)}")
+        self.net_balance_label.setText(f"净额: {format_amount(net_balance)}")
 
     def get_selected_transaction_id(self):
         selected_rows = self.transactions_table.selectionModel().selectedRows()
@@ -109,12 +461,26 @@ class DetailsTab(QWidget):
             # Controller 会处理消息显示，或 MainWindow 提供一个全局消息接口
             QMessageBox.information(self, "提示", "请先在表格中选择一条交易记录。")
             return None
-        selected_row_index = selected_rows[0].row()
-        transaction_id_item = self.transactions_table.item(selected_row_index, 0)
-        if not transaction_id_item:
+        record = self.transactions_model.row_data(selected_rows[0].row())
+        if not record:
             QMessageBox.critical(self, "错误", "无法获取选中交易的ID。")
             return None
-        return transaction_id_item.text()
+        return record[0]
+
+    def get_selected_transaction_ids(self):
+        """返回所有选中行的交易ID (按表格顺序)，未选中时提示并返回空列表。"""
+        selected_rows = sorted(index.row() for index in self.transactions_table.selectionModel().selectedRows())
+        records = [self.transactions_model.row_data(row) for row in selected_rows]
+        transaction_ids = [record[0] for record in records if record]
+        if not transaction_ids:
+            QMessageBox.information(self, "提示", "请先在表格中选择交易记录。")
+        return transaction_ids
+
+    def set_undo_state(self, undo_label, redo_label):
+        """更新撤销 / 重做按钮，label 为 None 时禁用对应按钮。"""
+        for button, text, label in ((self.undo_button, "撤销", undo_label), (self.redo_button, "重做", redo_label)):
+            button.setEnabled(label is not None)
+            button.setToolTip(f"{text}: {label}" if label else "")
 
     def get_input_data(self):
         date = self.date_edit.date().toString("yyyy-MM-dd")
@@ -125,7 +491,7 @@ class DetailsTab(QWidget):
             QMessageBox.warning(self, "输入错误", "金额不能为空。")
             return None
         try:
-            amount = float(amount_text)
+            amount = to_minor_units(amount_text)
         except ValueError:
             QMessageBox.warning(self, "输入错误", "金额必须是有效的数字。")
             return None
@@ -133,17 +499,132 @@ class DetailsTab(QWidget):
             "date": date,
             "description": description,
             "amount": amount,
-            "type": transaction_type
+            "type": transaction_type,
+            "category_id": self.selected_category_id()
         }
 
-    def populate_form_for_edit(self, transaction_data):
+    def populate_form_for_edit(self, transaction_data, category_id=None):
         self.editing_transaction_id = transaction_data[0]
         self.date_edit.setDate(QDate.fromString(transaction_data[1], "yyyy-MM-dd"))
         self.description_edit.setText(transaction_data[2])
-        self.amount_edit.setText(str(transaction_data[3]))
+        self.amount_edit.setText(format_amount(transaction_data[3]))
         self.type_combo.setCurrentText(transaction_data[4])
+        self._fill_category_combo(category_id)
         self.submit_button.setText("更新交易")
 
+class CategoryListModel(QAbstractListModel):
+    """一种类型 (收入/支出) 的类别列表，按类别 ID 增量同步。
+
+    记录为 (id, name, type, 本月金额, 本月笔数)，金额或笔数变化时只刷新对应的卡片。
+    """
+    RecordRole = Qt.UserRole + 1
+
+    def __init__(self, category_type, parent=None):
+        super().__init__(parent)
+        self.category_type = category_type
+        self._categories = []  # [(id, name, type, total, count), ...]，顺序与数据库查询结果一致
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._categories)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self._categories[index.row()]
+        if role == Qt.DisplayRole:
+            return record[1]
+        if role == self.RecordRole:
+            return record
+        return None
+
+    def set_categories(self, categories):
+        """与当前列表逐项比较，只对新增、删除、移动或改名的类别发出相应的行变化。"""
+        if not self._categories:
+            self.beginResetModel()
+            self._categories = list(categories)
+            self.endResetModel()
+            return
+
+        new_ids = {record[0] for record in categories}
+        for row in range(len(self._categories) - 1, -1, -1):
+            if self._categories[row][0] not in new_ids:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._categories[row]
+                self.endRemoveRows()
+
+        current_ids = {record[0] for record in self._categories}
+        for row, record in enumerate(categories):
+            current = self._categories[row] if row < len(self._categories) else None
+            if current is not None and current[0] == record[0]:
+                if current != record:
+                    self._categories[row] = record
+                    self.dataChanged.emit(self.index(row), self.index(row))
+                continue
+            if record[0] not in current_ids:
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._categories.insert(row, record)
+                self.endInsertRows()
+                current_ids.add(record[0])
+                continue
+            # 已存在但位置变化 (例如改名后重新排序)，移动到当前位置
+            old_row = next(index for index in range(row + 1, len(self._categories))
+                           if self._categories[index][0] == record[0])
+            self.beginMoveRows(QModelIndex(), old_row, old_row, QModelIndex(), row)
+            del self._categories[old_row]
+            self._categories.insert(row, record)
+            self.endMoveRows()
+
+
+class CategoryCardDelegate(QStyledItemDelegate):
+    """把类别绘制成圆角卡片，名称下方是本月的金额和笔数。所有卡片共用同一组字体和画笔，不使用逐卡片的样式表。"""
+    CARD_SIZE = QSize(120, 120)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.name_font = QFont()
+        self.name_font.setPointSize(12)
+        self.name_font.setBold(True)
+        self.section_font = QFont()
+        self.section_font.setPointSize(16)
+        self.section_font.setBold(True)
+        self.totals_font = QFont()
+        self.totals_font.setPointSize(9)
+        self.totals_pen = QPen(QColor("#606060"))
+        self.border_pen = QPen(QColor("#d0d0d0"))
+        self._brushes = {}
+
+    def _brush(self, color):
+        brush = self._brushes.get(color)
+        if brush is None:
+            brush = self._brushes[color] = QBrush(QColor(color))
+        return brush
+
+    def sizeHint(self, option, index):
+        return self.CARD_SIZE
+
+    def paint(self, painter, option, index):
+        view = option.widget
+        color = view.property("card_color") if view is not None else None
+        rect = option.rect.adjusted(2, 2, -2, -2)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self.border_pen)
+        painter.setBrush(self._brush(color or "#f0f0f0"))
+        painter.drawRoundedRect(rect, 10, 10)
+        text_rect = rect.adjusted(10, 10, -10, -10)
+        painter.setFont(self.name_font)
+        painter.setPen(option.palette.color(QPalette.Text))
+        painter.drawText(text_rect.adjusted(0, 0, 0, -text_rect.height() // 3), Qt.AlignCenter | Qt.TextWordWrap,
+                         index.data(Qt.DisplayRole))
+        record = index.data(CategoryListModel.RecordRole)
+        if record is not None and len(record) >= 5:
+            painter.setFont(self.totals_font)
+            painter.setPen(self.totals_pen)
+            painter.drawText(text_rect, Qt.AlignHCenter | Qt.AlignBottom,
+                             f"本月 {format_amount(record[3])}\n{record[4]} 笔")
+        painter.restore()
+
+
 class HomeTab(QWidget):
     """首页标签页，将包含类别卡片和增加类别的功能。"""
     def __init__(self):
@@ -152,7 +633,7 @@ class HomeTab(QWidget):
         main_layout.setContentsMargins(10, 10, 10, 10) # 添加一些边距
         main_layout.setSpacing(15) # 控件间的间距
 
-        # 顶部标题
+        # 顶部标题，卡片上显示各类别本月的金额和笔数
         title_label = QLabel("我的类别")
         font = QFont()
         font.setPointSize(18)
@@ -161,18 +642,29 @@ class HomeTab(QWidget):
         title_label.setAlignment(Qt.AlignCenter)
         main_layout.addWidget(title_label)
 
-        # 类别卡片区域 - 使用 QScrollArea
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setStyleSheet("QScrollArea { border: none; }") # 可选：移除边框
+        # 类别卡片区域: 支出、收入各一个 IconMode 的 QListView，卡片由委托绘制，
+        # 不为每个类别创建控件，只有可见的卡片才会被绘制
+        self.category_delegate = CategoryCardDelegate(self)
+        self.expense_categories_model = CategoryListModel("支出", self)
+        self.income_categories_model = CategoryListModel("收入", self)
+        self.category_sections = {}
+        for title, model, bg_color in (
+            ("支出类别", self.expense_categories_model, "#e6f3ff"), # 淡蓝色背景
+            ("收入类别", self.income_categories_model, "#fff0e6"), # 淡橙色背景
+        ):
+            section_title = QLabel(title)
+            section_title.setFont(self.category_delegate.section_font)
+            section_view = self._create_category_view(model, bg_color)
+            main_layout.addWidget(section_title)
+            main_layout.addWidget(section_view, 1) # 占据主要空间
+            self.category_sections[model.category_type] = (section_title, section_view)
+            section_title.hide() # 有数据后才显示
+            section_view.hide()
 
-        self.categories_widget = QWidget() # 滚动区域内的实际内容Widget
-        self.categories_container_layout = QVBoxLayout(self.categories_widget) # 主容器，用于放置支出和收入部分
-        self.categories_container_layout.setAlignment(Qt.AlignTop)
-        self.categories_container_layout.setSpacing(20) # 支出和收入部分之间的间距
-        
-        self.scroll_area.setWidget(self.categories_widget)
-        main_layout.addWidget(self.scroll_area, 1) # 占据主要空间
+        self.no_categories_label = QLabel("暂无类别，请点击下方按钮添加新类别。")
+        self.no_categories_label.setAlignment(Qt.AlignCenter)
+        self.no_categories_label.hide()
+        main_layout.addWidget(self.no_categories_label, 1)
 
         # 底部区域: 增加类别按钮
         self.add_category_button = QPushButton("➕ 增加类别")
@@ -198,121 +690,455 @@ class HomeTab(QWidget):
 
         self.setLayout(main_layout)
 
+    def _create_category_view(self, model, bg_color):
+        view = QListView()
+        view.setModel(model)
+        view.setItemDelegate(self.category_delegate)
+        view.setProperty("card_color", bg_color)
+        view.setViewMode(QListView.IconMode)
+        view.setResizeMode(QListView.Adjust)
+        view.setMovement(QListView.Static)
+        view.setUniformItemSizes(True)
+        view.setSpacing(5) # 卡片之间的间距
+        view.setSelectionMode(QAbstractItemView.NoSelection)
+        view.setFrameShape(QFrame.NoFrame)
+        return view
+
     def update_category_cards(self, categories_data):
-        """根据提供的类别数据更新首页的类别卡片显示。"""
-        # 清除旧的内容 (整个 categories_container_layout)
-        while self.categories_container_layout.count():
-            child = self.categories_container_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-            elif child.layout(): # 清理可能的子布局
-                # Implement recursive clearing if layouts can contain other layouts
-                pass # For now, assuming only widgets or simple section layouts
-
-        if not categories_data:
-            no_categories_label = QLabel("暂无类别，请点击下方按钮添加新类别。")
-            no_categories_label.setAlignment(Qt.AlignCenter)
-            self.categories_container_layout.addWidget(no_categories_label)
+        """根据提供的类别数据 (id, name, type, 本月金额, 本月笔数) 更新首页的类别卡片显示。
+
+        两个列表模型按类别 ID 比较新旧数据，只插入、删除或移动变化的卡片。
+        """
+        self.expense_categories_model.set_categories([cat for cat in categories_data if cat[2] == '支出'])
+        self.income_categories_model.set_categories([cat for cat in categories_data if cat[2] == '收入'])
+        for model in (self.expense_categories_model, self.income_categories_model):
+            has_categories = model.rowCount() > 0
+            for widget in self.category_sections[model.category_type]:
+                widget.setVisible(has_categories)
+        self.no_categories_label.setVisible(not categories_data)
+
+
+class DailyTotalsCalendar(QCalendarWidget):
+    """在日期格子中绘制当天收入、支出和笔数的日历。"""
+    INCOME_COLOR = QColor("#2e7d32")
+    EXPENSE_COLOR = QColor("#c62828")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._day_totals = {}
+        self.detail_font = QFont()
+        self.detail_font.setPointSize(8)
+        self.setVerticalHeaderFormat(QCalendarWidget.NoVerticalHeader)
+        self.setGridVisible(True)
+
+    def set_day_totals(self, day_totals):
+        """day_totals 为 {yyyy-MM-dd: (收入, 支出, 笔数)}，只需包含当前显示的月份。"""
+        self._day_totals = day_totals
+        self.updateCells()
+
+    def day_totals(self, date):
+        return self._day_totals.get(date.toString("yyyy-MM-dd"))
+
+    def paintCell(self, painter, rect, date):
+        super().paintCell(painter, rect, date)
+        totals = self.day_totals(date)
+        if totals is None:
             return
+        income, expense, count = totals
+        painter.save()
+        painter.setFont(self.detail_font)
+        text_rect = rect.adjusted(3, 0, -3, -2)
+        lines = [(f"{count} 笔", None)]
+        if income:
+            lines.append((f"+{format_amount(income)}", self.INCOME_COLOR))
+        if expense:
+            lines.append((f"-{format_amount(expense)}", self.EXPENSE_COLOR))
+        line_height = painter.fontMetrics().height()
+        for index, (text, color) in enumerate(reversed(lines)):
+            painter.setPen(color if color is not None else self.palette().color(QPalette.Text))
+            painter.drawText(text_rect.adjusted(0, 0, 0, -index * line_height),
+                             Qt.AlignRight | Qt.AlignBottom, text)
+        painter.restore()
 
-        expense_categories = [cat for cat in categories_data if cat[2] == '支出']
-        income_categories = [cat for cat in categories_data if cat[2] == '收入']
 
-        # Helper function to create a grid section for categories
-        def create_category_section(title, categories, base_bg_color):
-            if not categories:
-                return
+class CalendarTab(QWidget):
+    """日历标签页: 按天显示收支汇总，下方显示所选月份和日期的合计。"""
+
+    def __init__(self):
+        super().__init__()
+        main_layout = QVBoxLayout(self)
+        self.calendar = DailyTotalsCalendar()
+        main_layout.addWidget(self.calendar, 1)
+        self.month_summary_label = QLabel("")
+        self.day_summary_label = QLabel("")
+        main_layout.addWidget(self.month_summary_label)
+        main_layout.addWidget(self.day_summary_label)
+        self.setLayout(main_layout)
+        self.calendar.selectionChanged.connect(self._update_day_summary)
+
+    def shown_month(self):
+        """返回当前显示的 (year, month)。"""
+        return self.calendar.yearShown(), self.calendar.monthShown()
+
+    def show_month_totals(self, year, month, day_totals):
+        """显示某个月的每日汇总；不是当前显示的月份时忽略 (例如翻页后才返回的查询结果)。"""
+        if (year, month) != self.shown_month():
+            return
+        self.calendar.set_day_totals(day_totals)
+        income = sum(totals[0] for totals in day_totals.values())
+        expense = sum(totals[1] for totals in day_totals.values())
+        count = sum(totals[2] for totals in day_totals.values())
+        self.month_summary_label.setText(
+            f"{year} 年 {month} 月: 收入 {format_amount(income)}，支出 {format_amount(expense)}，"
+            f"净额 {format_amount(income - expense)}，共 {count} 笔")
+        self._update_day_summary()
+
+    def _update_day_summary(self):
+        date = self.calendar.selectedDate()
+        income, expense, count = self.calendar.day_totals(date) or (0, 0, 0)
+        self.day_summary_label.setText(
+            f"{date.toString('yyyy-MM-dd')}: 收入 {format_amount(income)}，支出 {format_amount(expense)}，共 {count} 笔")
+
+
+class ReportChart(QWidget):
+    """按期间绘制收入/支出柱状图和余额折线。数据点较多时柱宽收窄，不做逐项绘制对象。"""
+    INCOME_COLOR = QColor("#4caf50")
+    EXPENSE_COLOR = QColor("#e57373")
+    BALANCE_COLOR = QColor("#1e88e5")
+    MARGIN = 30
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(220)
+        self._periods = []  # [(标签, 收入, 支出, 余额)]
+        self.balance_pen = QPen(self.BALANCE_COLOR, 2)
+        self.axis_pen = QPen(QColor("#b0b0b0"))
+
+    def set_periods(self, periods):
+        self._periods = periods
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        area = self.rect().adjusted(self.MARGIN, 10, -10, -self.MARGIN)
+        painter.setPen(self.axis_pen)
+        painter.drawLine(area.bottomLeft(), area.bottomRight())
+        if not self._periods or area.width() <= 0 or area.height() <= 0:
+            painter.end()
+            return
+        peak = max(max(income, expense) for _, income, expense, _ in self._periods) or 1
+        slot = area.width() / len(self._periods)
+        bar = max(slot * 0.4, 1.0)
+        painter.setPen(Qt.NoPen)
+        for index, (_, income, expense, _) in enumerate(self._periods):
+            left = area.left() + index * slot
+            for offset, value, color in ((0, income, self.INCOME_COLOR), (bar, expense, self.EXPENSE_COLOR)):
+                height = area.height() * value / peak
+                painter.fillRect(QRectF(left + offset, area.bottom() - height, bar, height), color)
+        balances = [balance for _, _, _, balance in self._periods]
+        low, high = min(balances), max(balances)
+        span = (high - low) or 1
+        points = [QPointF(area.left() + (index + 0.5) * slot,
+                          area.bottom() - area.height() * (balance - low) / span)
+                  for index, balance in enumerate(balances)]
+        painter.setPen(self.balance_pen)
+        painter.drawPolyline(points)
+        painter.setPen(self.palette().color(QPalette.Text))
+        painter.drawText(QRectF(area.left(), area.bottom() + 4, area.width(), self.MARGIN - 4),
+                         Qt.AlignLeft | Qt.AlignTop, self._periods[0][0])
+        painter.drawText(QRectF(area.left(), area.bottom() + 4, area.width(), self.MARGIN - 4),
+                         Qt.AlignRight | Qt.AlignTop, self._periods[-1][0])
+        painter.end()
+
+
+class ReportsTab(QWidget):
+    """报表标签页: 按月或按周的收支汇总、余额走势和支出最多的类别。
+
+    报表数据由 model.analytics.LedgerAnalytics.report() 在后台计算，金额以分为单位，只在显示时格式化。
+    """
+    # 统计区间改变时发出，控制器据此重新计算报表
+    range_changed = Signal()
+    RANGES = ["最近12个月", "今年", "去年", "最近3年", "全部"]
+    PERIOD_HEADERS = ["期间", "收入", "支出", "净额", "余额"]
+    CATEGORY_HEADERS = ["类别", "支出", "笔数"]
+
+    def __init__(self):
+        super().__init__()
+        self._report = None
+        main_layout = QVBoxLayout(self)
+
+        controls_layout = QHBoxLayout()
+        controls_layout.addWidget(QLabel("区间:"))
+        self.range_combo = QComboBox()
+        self.range_combo.addItems(self.RANGES)
+        controls_layout.addWidget(self.range_combo)
+        self.granularity_combo = QComboBox()
+        self.granularity_combo.addItems(["按月", "按周"])
+        controls_layout.addWidget(self.granularity_combo)
+        controls_layout.addStretch(1)
+        self.status_label = QLabel("")
+        controls_layout.addWidget(self.status_label)
+        self.refresh_button = QPushButton("刷新")
+        controls_layout.addWidget(self.refresh_button)
+        main_layout.addLayout(controls_layout)
+
+        totals_layout = QHBoxLayout()
+        self.income_label = QLabel("收入: 0.00")
+        self.expense_label = QLabel("支出: 0.00")
+        self.net_label = QLabel("净额: 0.00")
+        self.balance_label = QLabel("期末余额: 0.00")
+        for label in (self.income_label, self.expense_label, self.net_label, self.balance_label):
+            totals_layout.addWidget(label)
+        main_layout.addLayout(totals_layout)
+
+        self.chart = ReportChart()
+        main_layout.addWidget(self.chart)
+
+        tables_layout = QHBoxLayout()
+        self.periods_table = self._create_table(self.PERIOD_HEADERS)
+        self.categories_table = self._create_table(self.CATEGORY_HEADERS)
+        tables_layout.addWidget(self.periods_table, 3)
+        tables_layout.addWidget(self.categories_table, 2)
+        main_layout.addLayout(tables_layout)
+        self.setLayout(main_layout)
+
+        self.range_combo.currentIndexChanged.connect(self.range_changed)
+        self.refresh_button.clicked.connect(self.range_changed)
+        self.granularity_combo.currentIndexChanged.connect(self._show_periods)
+
+    def _create_table(self, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.verticalHeader().setVisible(False)
+        return table
 
-            section_widget = QWidget()
-            section_layout = QVBoxLayout(section_widget)
-            section_layout.setContentsMargins(0,0,0,0)
-            section_layout.setSpacing(10)
-
-            title_label = QLabel(title)
-            title_font = QFont()
-            title_font.setPointSize(16)
-            title_font.setBold(True)
-            title_label.setFont(title_font)
-            title_label.setStyleSheet("margin-bottom: 5px;")
-            section_layout.addWidget(title_label)
-
-            grid_widget = QWidget()
-            grid_layout = QGridLayout(grid_widget)
-            grid_layout.setSpacing(10) # 卡片之间的间距
-            grid_layout.setContentsMargins(0,0,0,0)
-            
-            row, col = 0, 0
-            for cat_id, name, cat_type in categories:
-                card_frame = QFrame()
-                card_frame.setFrameShape(QFrame.StyledPanel)
-                card_frame.setFrameShadow(QFrame.Raised)
-                card_frame.setMinimumSize(100, 100) # 更接近方形
-                card_frame.setMaximumSize(130, 130)
-                # 简单的颜色区分，可以根据图片进一步细化
-                bg_color = base_bg_color
-                card_frame.setStyleSheet(f"""
-                    QFrame {{
-                        background-color: {bg_color};
-                        border: 1px solid #d0d0d0;
-                        border-radius: 10px;
-                        padding: 10px;
-                    }}
-                """)
-
-                card_content_layout = QVBoxLayout(card_frame)
-                card_content_layout.setAlignment(Qt.AlignCenter) # 内容居中
-
-                # 以后可以加图标 QLabel
-                # icon_label = QLabel("ICON") 
-                # icon_label.setAlignment(Qt.AlignCenter)
-
-                name_label = QLabel(name)
-                name_font = QFont()
-                name_font.setPointSize(12)
-                name_font.setBold(True)
-                name_label.setFont(name_font)
-                name_label.setAlignment(Qt.AlignCenter)
-                name_label.setWordWrap(True)
-
-                # type_label = QLabel(cat_type) # 类型已在分组标题中体现，卡片内可省略
-                # type_label.setAlignment(Qt.AlignCenter)
-
-                # card_content_layout.addWidget(icon_label)
-                card_content_layout.addWidget(name_label)
-                # card_content_layout.addWidget(type_label)
-                card_frame.setLayout(card_content_layout)
-
-                grid_layout.addWidget(card_frame, row, col)
-                col += 1
-                if col >= 3:
-                    col = 0
-                    row += 1
-            
-            # 确保网格填满，即使最后一行的卡片不足3个
-            # 如果需要，可以添加空的 QSpacerItem 来填充，但通常 QGridLayout 会自动处理对齐
-            grid_widget.setLayout(grid_layout)
-            section_layout.addWidget(grid_widget)
-            self.categories_container_layout.addWidget(section_widget)
-
-        # 创建支出部分
-        create_category_section("支出类别", expense_categories, "#e6f3ff") # 淡蓝色背景
-        # 创建收入部分
-        create_category_section("收入类别", income_categories, "#fff0e6") # 淡橙色背景
-
-        # 如果没有任何类别被实际添加到布局中（例如，只有支出或只有收入，但另一方为空）
-        # 并且最初 categories_data 不为空，则不需要再添加“暂无类别”标签
-        if self.categories_container_layout.count() == 0 and categories_data:
-             # This case should ideally not happen if categories_data is not empty and create_category_section handles it.
-             # However, if both expense_categories and income_categories are empty (which means categories_data was empty initially)
-             # The initial check for not categories_data already handles it.
-             pass
-        elif self.categories_container_layout.count() == 0 and not categories_data: # Redundant due to initial check
-            no_categories_label = QLabel("暂无类别，请点击下方按钮添加新类别。")
-            no_categories_label.setAlignment(Qt.AlignCenter)
-            self.categories_container_layout.addWidget(no_categories_label)
+    def selected_range(self):
+        """返回当前区间的 (date_from, date_to)，yyyy-MM-dd 字符串，不限时为 None。"""
+        today = QDate.currentDate()
+        text = self.range_combo.currentText()
+        if text == "最近12个月":
+            start = today.addMonths(-11)
+            return QDate(start.year(), start.month(), 1).toString("yyyy-MM-dd"), None
+        if text == "今年":
+            return QDate(today.year(), 1, 1).toString("yyyy-MM-dd"), None
+        if text == "去年":
+            return QDate(today.year() - 1, 1, 1).toString("yyyy-MM-dd"), QDate(today.year() - 1, 12, 31).toString("yyyy-MM-dd")
+        if text == "最近3年":
+            return QDate(today.year() - 2, 1, 1).toString("yyyy-MM-dd"), None
+        return None, None
+
+    def show_status(self, text):
+        self.status_label.setText(text)
+
+    def show_report(self, report):
+        """显示 LedgerAnalytics.report() 的结果。"""
+        self._report = report
+        totals = report["totals"]
+        self.income_label.setText(f"收入: {format_amount(totals['income'])}")
+        self.expense_label.setText(f"支出: {format_amount(totals['expense'])}")
+        self.net_label.setText(f"净额: {format_amount(totals['income'] - totals['expense'])}")
+        self.balance_label.setText(f"期末余额: {format_amount(totals['closing_balance'])}")
+        self.status_label.setText(f"共 {totals['count']} 笔")
+        self._fill_table(self.categories_table, [
+            (name or "(无描述)", expense, count) for name, expense, count in report["top_categories"]
+        ], money_columns=(1,))
+        self._show_periods()
+
+    def _show_periods(self):
+        if self._report is None:
+            return
+        periods = self._report["weeks" if self.granularity_combo.currentText() == "按周" else "months"]
+        self.chart.set_periods(periods)
+        self._fill_table(self.periods_table, [
+            (label, income, expense, income - expense, balance)
+            for label, income, expense, balance in reversed(periods)
+        ], money_columns=(1, 2, 3, 4))
+
+    @staticmethod
+    def _fill_table(table, rows, money_columns=()):
+        table.setRowCount(len(rows))
+        for row_index, values in enumerate(rows):
+            for col_index, value in enumerate(values):
+                if col_index in money_columns:
+                    text = format_amount(value)
+                else:
+                    text = str(value)
+                item = QTableWidgetItem(text)
+                if col_index > 0:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row_index, col_index, item)
+
+
+class SettingsTab(QWidget):
+    """设置标签页，包含备份、冷数据归档和性能分析面板。"""
+    SNAPSHOT_HEADERS = ["时间", "文件", "大小 (MB)"]
+    ARCHIVE_HEADERS = ["年份", "文件", "收入", "支出", "笔数"]
+    STAT_HEADERS = ["名称", "次数", "平均 (ms)", "P50 (ms)", "P95 (ms)", "最大 (ms)", "行数"]
+    SLOW_HEADERS = ["时间", "类别", "名称", "耗时 (ms)", "行数"]
+
+    def __init__(self):
+        super().__init__()
+        main_layout = QVBoxLayout(self)
+
+        backup_group = QGroupBox("备份")
+        backup_layout = QVBoxLayout(backup_group)
+        backup_controls_layout = QHBoxLayout()
+        self.auto_backup_checkbox = QCheckBox("自动备份")
+        backup_controls_layout.addWidget(self.auto_backup_checkbox)
+        backup_controls_layout.addWidget(QLabel("间隔 (小时):"))
+        self.backup_interval_spin = QSpinBox()
+        self.backup_interval_spin.setRange(1, 24 * 30)
+        backup_controls_layout.addWidget(self.backup_interval_spin)
+        backup_controls_layout.addWidget(QLabel("保留份数:"))
+        self.backup_keep_spin = QSpinBox()
+        self.backup_keep_spin.setRange(1, 365)
+        backup_controls_layout.addWidget(self.backup_keep_spin)
+        backup_controls_layout.addStretch(1)
+        self.backup_now_button = QPushButton("立即备份")
+        backup_controls_layout.addWidget(self.backup_now_button)
+        backup_layout.addLayout(backup_controls_layout)
+        self.snapshots_table = self._create_table(self.SNAPSHOT_HEADERS, stretch_column="文件")
+        self.snapshots_table.setMaximumHeight(140)
+        self._snapshot_paths = []
+        backup_layout.addWidget(self.snapshots_table)
+        restore_layout = QHBoxLayout()
+        self.backup_status_label = QLabel()
+        restore_layout.addWidget(self.backup_status_label, 1)
+        self.restore_button = QPushButton("恢复所选快照")
+        restore_layout.addWidget(self.restore_button)
+        backup_layout.addLayout(restore_layout)
+        main_layout.addWidget(backup_group)
+
+        archive_group = QGroupBox("冷数据归档")
+        archive_layout = QVBoxLayout(archive_group)
+        archive_controls_layout = QHBoxLayout()
+        archive_controls_layout.addWidget(QLabel("把已经结束的年份移到单独的归档文件:"))
+        self.archive_year_combo = QComboBox()
+        archive_controls_layout.addWidget(self.archive_year_combo)
+        self.archive_button = QPushButton("归档")
+        archive_controls_layout.addWidget(self.archive_button)
+        archive_controls_layout.addStretch(1)
+        archive_layout.addLayout(archive_controls_layout)
+        self.archives_table = self._create_table(self.ARCHIVE_HEADERS, stretch_column="文件")
+        self.archives_table.setMaximumHeight(140)
+        archive_layout.addWidget(self.archives_table)
+        main_layout.addWidget(archive_group)
+
+        profiling_group = QGroupBox("性能分析")
+        profiling_layout = QVBoxLayout(profiling_group)
+
+        controls_layout = QHBoxLayout()
+        self.profiling_enabled_checkbox = QCheckBox("记录耗时")
+        self.profiling_enabled_checkbox.setChecked(True)
+        controls_layout.addWidget(self.profiling_enabled_checkbox)
+        controls_layout.addWidget(QLabel("慢查询阈值 (ms):"))
+        self.slow_threshold_spin = QDoubleSpinBox()
+        self.slow_threshold_spin.setRange(0.1, 60000)
+        self.slow_threshold_spin.setDecimals(1)
+        self.slow_threshold_spin.setValue(50.0)
+        controls_layout.addWidget(self.slow_threshold_spin)
+        controls_layout.addStretch(1)
+        self.profiling_refresh_button = QPushButton("刷新")
+        self.profiling_reset_button = QPushButton("清空")
+        self.profiling_export_button = QPushButton("导出 JSON")
+        controls_layout.addWidget(self.profiling_refresh_button)
+        controls_layout.addWidget(self.profiling_reset_button)
+        controls_layout.addWidget(self.profiling_export_button)
+        profiling_layout.addLayout(controls_layout)
+
+        self.profiling_tabs = QTabWidget()
+        self.methods_table = self._create_table(self.STAT_HEADERS)
+        self.sql_table = self._create_table(self.STAT_HEADERS)
+        self.slow_table = self._create_table(self.SLOW_HEADERS)
+        self.profiling_tabs.addTab(self.methods_table, "方法")
+        self.profiling_tabs.addTab(self.sql_table, "SQL")
+        self.profiling_tabs.addTab(self.slow_table, "慢查询")
+        profiling_layout.addWidget(self.profiling_tabs)
+
+        main_layout.addWidget(profiling_group)
+        self.setLayout(main_layout)
+
+    def _create_table(self, headers, stretch_column="名称"):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        table.horizontalHeader().setSectionResizeMode(headers.index(stretch_column), QHeaderView.Stretch)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.verticalHeader().setVisible(False)
+        return table
+
+    @staticmethod
+    def _fill_table(table, rows):
+        table.setRowCount(len(rows))
+        for row_index, values in enumerate(rows):
+            for col_index, value in enumerate(values):
+                if isinstance(value, float):
+                    item = QTableWidgetItem(f"{value:.3f}")
+                else:
+                    item = QTableWidgetItem("" if value is None else str(value))
+                if col_index > 0 and not isinstance(value, str):
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row_index, col_index, item)
+
+    def set_snapshots(self, snapshots):
+        """显示 model.backup.list_snapshots() 返回的快照 [(路径, 创建时间, 字节数)]。"""
+        self._snapshot_paths = [path for path, _, _ in snapshots]
+        self._fill_table(self.snapshots_table, [
+            (created.strftime("%Y-%m-%d %H:%M:%S"), os.path.basename(path), size / 1e6)
+            for path, created, size in snapshots
+        ])
+
+    def selected_snapshot_path(self):
+        """返回选中的快照路径，未选中时返回 None。"""
+        rows = self.snapshots_table.selectionModel().selectedRows()
+        return self._snapshot_paths[rows[0].row()] if rows else None
+
+    def set_backup_busy(self, busy, status=""):
+        """备份或恢复进行中时禁用相关按钮，并显示状态文本。"""
+        self.backup_now_button.setEnabled(not busy)
+        self.restore_button.setEnabled(not busy)
+        self.backup_status_label.setText(status)
+
+    def set_archive_state(self, archivable_years, archives):
+        """显示可以归档的年份 (最早的在前) 和 TransactionModel.get_archives() 返回的已归档年份。"""
+        self.archive_year_combo.clear()
+        for year in archivable_years:
+            self.archive_year_combo.addItem(str(year), year)
+        self.archive_button.setEnabled(bool(archivable_years))
+        self._fill_table(self.archives_table, [
+            (str(year), file_name, format_amount(income), format_amount(expense), income_count + expense_count)
+            for year, file_name, income, income_count, expense, expense_count in archives
+        ])
+
+    def selected_archive_year(self):
+        """返回下拉框中选中的年份，没有可归档的年份时返回 None。"""
+        return self.archive_year_combo.currentData()
+
+    def update_profile(self, snapshot):
+        """用 Profiler.snapshot() 的结果刷新面板，各表按总耗时降序排列。"""
+        for table, stats in ((self.methods_table, snapshot["methods"]), (self.sql_table, snapshot["sql"])):
+            ordered = sorted(stats.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+            self._fill_table(table, [
+                (name, s["count"], s["mean_ms"], s["p50_ms"], s["p95_ms"], s["max_ms"], s["rows"])
+                for name, s in ordered
+            ])
+        self._fill_table(self.slow_table, [
+            (QDateTime.fromMSecsSinceEpoch(int(entry["timestamp"] * 1000)).toString("HH:mm:ss"),
+             entry["kind"], entry["name"], entry["duration_ms"], entry["rows"])
+            for entry in reversed(snapshot["slow_queries"])
+        ])
 
 
 class MainWindow(QMainWindow):
+    # 某个延迟创建的标签页内容刚被创建，参数为属性名 (如 "details_tab")
+    tab_created = Signal(str)
+    # 用户在账本下拉框中选择了另一个账本，参数为账本文件路径
+    ledger_selected = Signal(str)
+
     def __init__(self):
         super().__init__()
         # self.editing_transaction_id = None # 移至 DetailsTab
@@ -320,35 +1146,77 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("PocketLedger")
         self.setGeometry(100, 100, 850, 800) # 稍微增大窗口以适应标签页
 
+        central_widget = QWidget()
+        central_layout = QVBoxLayout(central_widget)
+        ledger_layout = QHBoxLayout()
+        ledger_layout.addWidget(QLabel("账本:"))
+        self.ledger_combo = QComboBox()
+        self.ledger_combo.setMinimumWidth(160)
+        self.ledger_combo.activated.connect(self._on_ledger_activated)
+        ledger_layout.addWidget(self.ledger_combo)
+        self.new_ledger_button = QPushButton("新建账本")
+        ledger_layout.addWidget(self.new_ledger_button)
+        ledger_layout.addStretch(1)
+        self.consolidate_button = QPushButton("合并汇总")
+        ledger_layout.addWidget(self.consolidate_button)
+        central_layout.addLayout(ledger_layout)
+
         self.tab_widget = QTabWidget()
-        self.setCentralWidget(self.tab_widget)
+        central_layout.addWidget(self.tab_widget)
+        self.setCentralWidget(central_widget)
 
-        # 创建各个标签页
+        # 首页随窗口一起创建；其余标签页先放一个空容器，第一次切换到该页时才创建内容，
+        # 在此之前对应属性 (如 self.details_tab) 为 None
         self.home_tab = HomeTab() # 使用新的 HomeTab 类
-        self.details_tab = DetailsTab() # 包含原UI的标签页
-        self.calendar_tab = QWidget() # 占位符
-        self.reports_tab = QWidget() # 占位符
-        self.settings_tab = QWidget() # 占位符
-
-        # 添加标签页到 QTabWidget
         self.tab_widget.addTab(self.home_tab, "首页")
-        self.tab_widget.addTab(self.details_tab, "明细")
-        self.tab_widget.addTab(self.calendar_tab, "日历")
-        self.tab_widget.addTab(self.reports_tab, "报表")
-        self.tab_widget.addTab(self.settings_tab, "设置")
-
-        # 为占位符标签页添加简单内容，以便区分
-        calendar_layout = QVBoxLayout(self.calendar_tab)
-        calendar_layout.addWidget(QLabel("日历功能 (功能开发中)"))
-        self.calendar_tab.setLayout(calendar_layout)
-
-        reports_layout = QVBoxLayout(self.reports_tab)
-        reports_layout.addWidget(QLabel("报表功能 (功能开发中)"))
-        self.reports_tab.setLayout(reports_layout)
-
-        settings_layout = QVBoxLayout(self.settings_tab)
-        settings_layout.addWidget(QLabel("设置功能 (功能开发中)"))
-        self.settings_tab.setLayout(settings_layout)
+        self._tab_names = {self.home_tab: "home_tab"}
+        self._tab_factories = {}
+        self._tab_containers = {}
+        for name, title, factory in (
+            ("details_tab", "明细", DetailsTab), # 包含原UI的标签页
+            ("calendar_tab", "日历", CalendarTab),
+            ("reports_tab", "报表", ReportsTab),
+            ("settings_tab", "设置", SettingsTab),
+        ):
+            setattr(self, name, None)
+            container = QWidget()
+            container_layout = QVBoxLayout(container)
+            container_layout.setContentsMargins(0, 0, 0, 0)
+            self.tab_widget.addTab(container, title)
+            self._tab_names[container] = name
+            self._tab_factories[name] = factory
+            self._tab_containers[name] = container
+        self.tab_widget.currentChanged.connect(self._on_current_tab_changed)
+
+    def _on_current_tab_changed(self, index):
+        name = self._tab_names.get(self.tab_widget.widget(index))
+        if name in self._tab_factories:
+            self.ensure_tab(name)
+
+    def ensure_tab(self, name):
+        """返回标签页内容，尚未创建时立即创建并发出 tab_created。"""
+        widget = getattr(self, name)
+        if widget is None:
+            widget = self._tab_factories[name]()
+            self._tab_containers[name].layout().addWidget(widget)
+            setattr(self, name, widget)
+            self.tab_created.emit(name)
+        return widget
+
+    def set_ledgers(self, ledgers, current_path):
+        """用 [(名称, 路径)] 填充账本下拉框并选中 current_path，不发出 ledger_selected。"""
+        self.ledger_combo.clear()
+        for name, path in ledgers:
+            self.ledger_combo.addItem(name, path)
+        self.ledger_combo.setCurrentIndex(self.ledger_combo.findData(current_path))
+        self.setWindowTitle(f"PocketLedger - {self.ledger_combo.currentText()}" if ledgers else "PocketLedger")
+
+    def _on_ledger_activated(self, index):
+        self.ledger_selected.emit(self.ledger_combo.itemData(index))
+
+    def current_tab_name(self):
+        """返回当前标签页的属性名，如 "home_tab"、"settings_tab"。"""
+        return self._tab_names.get(self.tab_widget.currentWidget())
 
     # --- MainWindow 现在主要负责整体窗口和消息显示/确认 ---
     # clear_input_fields 等方法已移至 DetailsTab